@@ -0,0 +1,14 @@
+from django.db import connections
+from django.urls import get_resolver
+
+
+def preload():
+    """
+    Do the work every worker would otherwise repeat on its first request, so it happens once in the gunicorn master
+    (--preload) and is shared with the forked workers.
+    """
+    # Resolving the URLconf imports every view, serializer and service module.
+    get_resolver().url_patterns
+
+    # Forked workers must not share the master's database sockets.
+    connections.close_all()
@@ -13,13 +13,16 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 import os
 from datetime import timedelta
 
-from dotenv import load_dotenv
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
-load_dotenv()
+# Workers started with the environment already set (containers, systemd) skip importing python-dotenv entirely.
+if (BASE_DIR / '.env').exists():
+    from dotenv import load_dotenv
+
+    load_dotenv(BASE_DIR / '.env')
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -50,6 +53,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'optika.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     "corsheaders.middleware.CorsMiddleware",
@@ -58,6 +62,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'optika.audit.AuditMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -145,6 +150,15 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 5,
+    'DEFAULT_RENDERER_CLASSES': [
+        'optika.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'optika.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework_simplejwt.authentication.JWTAuthentication',
         # 'rest_framework.authentication.BasicAuthentication',
@@ -180,9 +194,68 @@ SIMPLE_JWT = {
 
 CORS_ALLOWED_ORIGINS = os.getenv("CORS_ALLOWED_ORIGINS").split(',')
 
-# CACHES = {
-#     "default": {
-#         "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
-#         "LOCATION": "unique-snowflake"
-#     }
-# }
\ No newline at end of file
+# The stock cache and the lookup cache are invalidated through version keys in this cache, which only reaches every
+# worker when they all share it, e.g. CACHE_BACKEND=django.core.cache.backends.redis.RedisCache and
+# CACHE_LOCATION=redis://127.0.0.1:6379/1. The in-process default is only correct with a single worker process.
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        "LOCATION": os.getenv('CACHE_LOCATION', 'optika'),
+    }
+}
+
+# Location used for stock, orders and purchases that do not name one
+OPTIKA_DEFAULT_LOCATION = os.getenv('DEFAULT_LOCATION', 'MAIN')
+
+
+# Stored responses of POSTs sent with an Idempotency-Key header, and how long a duplicate waits for the first one
+OPTIKA_IDEMPOTENCY_TTL = timedelta(hours=int(os.getenv('IDEMPOTENCY_TTL_HOURS', '24')))
+OPTIKA_IDEMPOTENCY_WAIT = 10
+# A key still pending after this long is taken over by a retry: its request died without an outcome. Keep it above
+# the worker timeout, so a request that is merely slow is never run twice.
+OPTIKA_IDEMPOTENCY_PENDING_TIMEOUT = timedelta(seconds=int(os.getenv('IDEMPOTENCY_PENDING_TIMEOUT', '60')))
+
+
+# Files produced by background tasks (python manage.py run_tasks)
+OPTIKA_EXPORT_DIR = os.getenv('EXPORT_DIR', str(BASE_DIR / 'exports'))
+
+# Uploads waiting for the import_products task (POST /api/optika/products/import/); removed once imported
+OPTIKA_IMPORT_DIR = os.getenv('IMPORT_DIR', str(BASE_DIR / 'imports'))
+
+
+# Stock change outbox relay (python manage.py relay_stock_events)
+OPTIKA_OUTBOX_SINK = os.getenv('OUTBOX_SINK', 'log')
+OPTIKA_OUTBOX_SINK_OPTIONS = {key: value for key, value in {
+    'path': os.getenv('OUTBOX_FILE'),
+    'url': os.getenv('OUTBOX_WEBHOOK_URL'),
+}.items() if value}
+# How long a relay may take to send a claimed batch before another relay sends it again
+OPTIKA_OUTBOX_CLAIM_TIMEOUT = timedelta(seconds=int(os.getenv('OUTBOX_CLAIM_TIMEOUT', '300')))
+
+
+# Inventory valuation method: 'AVERAGE' (weighted-average cost) or 'FIFO'
+OPTIKA_VALUATION_METHOD = os.getenv('VALUATION_METHOD', 'AVERAGE')
+
+
+# Soft-deleted products and customers are purged after this long, unless orders or purchases still refer to them
+OPTIKA_PURGE_AFTER = timedelta(days=int(os.getenv('PURGE_AFTER_DAYS', '30')))
+
+
+# Field-level audit trail of products, customers, orders and purchases (AuditLog)
+OPTIKA_AUDIT_ENABLED = os.getenv('AUDIT_ENABLED', 'True') == 'True'
+
+
+# Entries of the in-process SKU/barcode lookup cache (GET /api/optika/products/lookup/)
+OPTIKA_LOOKUP_CACHE_SIZE = int(os.getenv('LOOKUP_CACHE_SIZE', '10000'))
+# Seconds a lookup cache entry lives; bounds how stale a price or stock read from another worker's change can be
+OPTIKA_LOOKUP_CACHE_TTL = int(os.getenv('LOOKUP_CACHE_TTL', '10'))
+
+
+# Catalog snapshots downloaded by POS terminals (GET /api/optika/products/snapshot/)
+OPTIKA_CATALOG_DIR = os.getenv('CATALOG_DIR', str(BASE_DIR / 'catalog'))
+
+
+# Access to GET /metrics: a bearer token Prometheus must send, and/or addresses or networks allowed to scrape.
+# With neither set, only this host may scrape.
+OPTIKA_METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+OPTIKA_METRICS_ALLOWED_IPS = [ip.strip() for ip in os.getenv('METRICS_ALLOWED_IPS', '').split(',') if ip.strip()]
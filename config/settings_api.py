@@ -0,0 +1,42 @@
+"""
+Lean settings for API-only workers.
+
+Everything comes from config.settings, minus the admin, sessions, messages, static files and template machinery the
+JSON API never uses. Run API workers with DJANGO_SETTINGS_MODULE=config.settings_api and keep one regular
+deployment for the admin site.
+"""
+
+from config.settings import *  # noqa: F401,F403
+from config.settings import INSTALLED_APPS, MIDDLEWARE, REST_FRAMEWORK
+
+INSTALLED_APPS = [
+    app for app in INSTALLED_APPS
+    if app not in (
+        'django.contrib.admin',
+        'django.contrib.sessions',
+        'django.contrib.messages',
+        'django.contrib.staticfiles',
+    )
+]
+
+MIDDLEWARE = [
+    middleware for middleware in MIDDLEWARE
+    if middleware not in (
+        'django.contrib.sessions.middleware.SessionMiddleware',
+        'django.middleware.csrf.CsrfViewMiddleware',
+        'django.contrib.auth.middleware.AuthenticationMiddleware',
+        'django.contrib.messages.middleware.MessageMiddleware',
+        'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    )
+]
+
+TEMPLATES = []
+
+ROOT_URLCONF = 'config.urls_api'
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_RENDERER_CLASSES': [
+        'optika.renderers.FastJSONRenderer',
+    ],
+}
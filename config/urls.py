@@ -3,16 +3,21 @@ from django.http import HttpResponse
 from django.urls import path, include
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
-from optika.models import Order
+from optika.metrics import liveness_view, readiness_view, metrics_view
+from optika.receipts import get_receipt, PDF, TEXT
 
 
 def print_order(request, pk):
-    order = Order.objects.get(pk=pk)
-    # logic print / pdf / dll
-    return HttpResponse("Printed!")
+    fmt = PDF if request.GET.get('format') == PDF else TEXT
+    receipt = get_receipt(pk, fmt)
+    content_type = 'application/pdf' if fmt == PDF else 'text/plain; charset=utf-8'
+    return HttpResponse(receipt, content_type=content_type)
 
 
 urlpatterns = [
+    path('healthz', liveness_view, name='liveness'),
+    path('readyz', readiness_view, name='readiness'),
+    path('metrics', metrics_view, name='metrics'),
     path('admin/', admin.site.urls),
     path('order/<int:pk>/print/', admin.site.admin_view(print_order), name='order_print'),
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
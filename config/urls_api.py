@@ -0,0 +1,14 @@
+from django.urls import path, include
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+
+from optika.metrics import liveness_view, readiness_view, metrics_view
+
+# Same API as config.urls without the admin site, for config.settings_api.
+urlpatterns = [
+    path('healthz', liveness_view, name='liveness'),
+    path('readyz', readiness_view, name='readiness'),
+    path('metrics', metrics_view, name='metrics'),
+    path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('api/optika/', include('optika.urls', namespace='optika')),
+]
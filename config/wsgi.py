@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+# Under gunicorn --preload this runs once in the master process before the workers are forked.
+if os.getenv('WSGI_PRELOAD', 'True') == 'True':
+    from config.preload import preload
+
+    preload()
@@ -1,4 +1,6 @@
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.forms.models import BaseInlineFormSet
 
 from optika.models import (
     Customer,
@@ -7,27 +9,133 @@ from optika.models import (
     Purchase,
     PurchaseItem, Product
 )
+from optika.audit import record_create, record_delete, record_update, snapshot
+from optika.paginations import EstimatedCountPaginator
+from optika.pricing import refresh_effective_prices
+from optika.soft_delete import soft_delete, delete_product
+from optika.stock_cache import invalidate
+
+
+class AuditedAdmin(admin.ModelAdmin):
+    # Admin edits land in the same audit trail as the API's.
+
+    def save_model(self, request, obj, form, change):
+        before = snapshot(type(obj)._base_manager.get(pk=obj.pk)) if change else None
+        super().save_model(request, obj, form, change)
+
+        if change:
+            record_update(obj, before, request.user)
+        else:
+            record_create(obj, request.user)
+
+    def delete_model(self, request, obj):
+        record_delete(obj, request.user)
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            record_delete(obj, request.user)
+        super().delete_queryset(request, queryset)
+
+
+class SoftDeleteAdmin(AuditedAdmin):
+    # Deleting from the admin only hides the row, as the API does; nothing cascades, so the confirmation page lists
+    # the selected rows alone.
+
+    def delete_row(self, obj):
+        soft_delete(obj)
+
+    def delete_model(self, request, obj):
+        self.delete_row(obj)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            self.delete_row(obj)
+
+    def get_deleted_objects(self, objs, request):
+        objs = list(objs)
+        return [str(obj) for obj in objs], {self.model._meta.verbose_name_plural: len(objs)}, set(), []
 
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(SoftDeleteAdmin):
     list_display = ('id', 'name', 'stock', 'unit', 'price')
     search_fields = ('name',)
     list_filter = ('unit',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+
+        if change:
+            invalidate([obj.pk])
+            if 'price' in form.changed_data:
+                # Percentage rules follow the base price, as on the API.
+                refresh_effective_prices([obj.pk])
+
+    def delete_row(self, obj):
+        delete_product(obj)
 
 
 @admin.register(Customer)
-class CustomerAdmin(admin.ModelAdmin):
+class CustomerAdmin(SoftDeleteAdmin):
     list_display = ("id", "name", "phone", "email", "user", "created_at")
-    search_fields = ("name", "phone", "email")
-    list_filter = ("user",)
+    list_select_related = ("user",)
+    search_fields = ("name", "phone", "email", "user__username")
+    raw_id_fields = ("user",)
     ordering = ("-created_at",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class ProductAutocompleteSelect(AutocompleteSelect):
+    # Renders the selected product from the row the inline already loaded, instead of one SELECT per inline row.
+    selected_product = None
 
+    def optgroups(self, name, value, attrs=None):
+        product = self.selected_product
 
-class OrderItemInline(admin.TabularInline):
+        if product is None or [str(v) for v in value if v] != [str(product.pk)]:
+            return super().optgroups(name, value, attrs)
+
+        option = self.create_option(name, product.pk, self.choices.field.label_from_instance(product), True, 0)
+        return [(None, [option], 0)]
+
+
+class ProductItemFormSet(BaseInlineFormSet):
+
+    def _construct_form(self, i, **kwargs):
+        form = super()._construct_form(i, **kwargs)
+        widget = form.fields['product'].widget
+
+        # The parent form only sets the foreign key id; hand over the parent itself so item __str__ needs no query.
+        setattr(form.instance, self.fk.name, self.instance)
+
+        if form.instance.pk and isinstance(getattr(widget, 'widget', None), ProductAutocompleteSelect):
+            widget.widget.selected_product = form.instance.product
+
+        return form
+
+
+class ProductItemInline(admin.TabularInline):
+    formset = ProductItemFormSet
+    autocomplete_fields = ["product"]
+
+    def get_queryset(self, request):
+        # Item __str__ and the product widget both read the product; load it with the rows.
+        return super().get_queryset(request).select_related('product')
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'product':
+            kwargs['widget'] = ProductAutocompleteSelect(db_field, self.admin_site, using=kwargs.get('using'))
+
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+class OrderItemInline(ProductItemInline):
     model = OrderItem
     extra = 2
-    autocomplete_fields = ["product"]
     fields = ["product", "quantity", "price", "subtotal"]
 
     class Media:
@@ -35,28 +143,46 @@ class OrderItemInline(admin.TabularInline):
 
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(AuditedAdmin):
+    list_display = ("order_number", "date", "customer", "total", "location", "user", "created_at")
+    list_select_related = ("customer", "location", "user")
+    search_fields = ("order_number",)
+    list_filter = ("date",)
+    ordering = ("-date", "-id")
+    autocomplete_fields = ("customer",)
+    raw_id_fields = ("user",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
     inlines = [OrderItemInline]
 
 
-class PurchaseItemInline(admin.TabularInline):
+class PurchaseItemInline(ProductItemInline):
     model = PurchaseItem
     extra = 0
-    fields = ("product", "quantity")
+    fields = ("product", "quantity", "received_quantity", "outstanding_quantity")
+    # Only receipts move these, together with the stock.
+    readonly_fields = ("received_quantity", "outstanding_quantity")
 
 
 @admin.register(Purchase)
-class PurchaseAdmin(admin.ModelAdmin):
+class PurchaseAdmin(AuditedAdmin):
     list_display = (
         "purchase_number",
         "date",
+        "status",
+        "location",
         "user",
         "created_at",
     )
+    list_select_related = ("location", "user")
 
     search_fields = ("purchase_number",)
-    list_filter = ("date", "user")
+    list_filter = ("status", "date")
     ordering = ("-date",)
+    raw_id_fields = ("user",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     inlines = [PurchaseItemInline]
 
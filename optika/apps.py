@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class OptikaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'optika'
+
+    def ready(self):
+        from optika import checks  # noqa: F401
@@ -0,0 +1,77 @@
+from datetime import datetime, time
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from optika.models import StockMovement, StockMovementArchive
+from optika.services import signed_quantity
+
+ARCHIVE_BATCH_SIZE = 1000
+
+ARCHIVE_FIELDS = ['id', 'product_id', 'movement_type', 'quantity', 'source_doc', 'note', 'date', 'location_id',
+                  'user_id', 'created_at', 'updated_at']
+
+
+@transaction.atomic
+def _archive_batch(cutoff, after_id, batch_size):
+    """
+    Move the first ``batch_size`` movements dated before ``cutoff`` with an id above ``after_id`` to
+    StockMovementArchive and add their sum to the OPENING movement of their product and location dated ``cutoff``,
+    creating it when missing, so calculate_current_stock() keeps returning the same value once the batch commits.
+    Return the number of rows moved and the last id.
+    """
+    rows = list(StockMovement.objects.filter(date__lt=cutoff, id__gt=after_id).select_for_update().order_by('id')
+                .values(*ARCHIVE_FIELDS)[:batch_size])
+    if not rows:
+        return 0, after_id
+
+    ids = [row['id'] for row in rows]
+    batch = StockMovement.objects.filter(id__in=ids)
+    balances = list(batch.values('product_id', 'location_id').annotate(balance=Sum(signed_quantity()))
+                    .order_by('product_id', 'location_id'))
+    owners = {row['product_id']: row['user_id'] for row in rows}
+
+    StockMovementArchive.objects.bulk_create([
+        StockMovementArchive(original_id=row.pop('id'), **row) for row in rows
+    ])
+
+    batch.delete()
+
+    now = timezone.now()
+    for balance in balances:
+        # Dated at the cutoff itself, the opening movement is never picked up by a later batch of the same run.
+        opening = StockMovement.objects.filter(product_id=balance['product_id'], location_id=balance['location_id'],
+                                               movement_type=StockMovement.OPENING, date=cutoff)
+
+        if not opening.update(quantity=F('quantity') + (balance['balance'] or 0), updated_at=now):
+            StockMovement.objects.create(product_id=balance['product_id'], movement_type=StockMovement.OPENING,
+                                         quantity=balance['balance'] or 0, source_doc='Opening Balance', date=cutoff,
+                                         note=f'Opening balance as of {cutoff:%Y-%m-%d}',
+                                         location_id=balance['location_id'], user_id=owners[balance['product_id']])
+
+    return len(rows), ids[-1]
+
+
+def archive_stock_movements(cutoff, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Archive everything before ``cutoff`` in id order, ``batch_size`` movements per transaction, and return the rows
+    moved. Each batch carries its sum into the opening balances before it commits, so the ledger is right between
+    batches and an interrupted run is finished by running it again.
+    """
+    archived = after_id = 0
+
+    while True:
+        moved, after_id = _archive_batch(cutoff, after_id, batch_size)
+        if not moved:
+            return archived
+
+        archived += moved
+
+
+def archived_stock_movements(date_from, date_to):
+    """Archived movements from ``date_from`` through ``date_to``; both bounds keep the scan on the date index."""
+    start = timezone.make_aware(datetime.combine(date_from, time.min))
+    end = timezone.make_aware(datetime.combine(date_to, time.max))
+
+    return StockMovementArchive.objects.filter(date__gte=start, date__lte=end)
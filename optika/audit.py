@@ -0,0 +1,122 @@
+import contextvars
+import logging
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from optika.models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+# Bookkeeping columns every save touches; they never make a change on their own.
+IGNORED_FIELDS = {'id', 'created_at', 'updated_at'}
+
+_buffer = contextvars.ContextVar('audit_buffer', default=None)
+
+
+def snapshot(instance):
+    """Field values of ``instance`` (foreign keys as ids), taken before a change to diff against afterwards."""
+    return {field.attname: field.value_from_object(instance) for field in instance._meta.concrete_fields
+            if field.attname not in IGNORED_FIELDS}
+
+
+def diff(before, after):
+    return {name: [before.get(name), value] for name, value in after.items() if before.get(name) != value}
+
+
+def _request_user_id(buffer):
+    # DRF authenticates inside the view and sets the user on the underlying request, so it is known by now.
+    user = getattr(buffer['request'], 'user', None)
+    return user.pk if user is not None and user.is_authenticated else None
+
+
+def record(instance, action, changes, user=None):
+    """
+    Queue one audit entry for ``instance``. The entry only joins the request's buffer once the surrounding transaction
+    commits, so rolled-back changes leave no trace; outside a request it is written on its own at commit.
+
+    Entries are written right after the transaction that made the changes commits, one INSERT per transaction, in a
+    statement of their own: a crash between the two, or a failed INSERT (logged with the entries), loses the entries
+    but never the changes.
+    """
+    if not settings.OPTIKA_AUDIT_ENABLED:
+        return
+
+    entry = AuditLog(model=instance._meta.model_name, object_id=instance.pk, action=action, changes=changes,
+                     user_id=user.pk if user is not None else None, created_at=timezone.now())
+    buffer = _buffer.get()
+
+    if buffer is None:
+        transaction.on_commit(lambda: AuditLog.objects.bulk_create([entry]))
+        return
+
+    if entry.user_id is None:
+        entry.user_id = _request_user_id(buffer)
+
+    buffer['last'] = entry
+    transaction.on_commit(lambda: _commit(buffer, entry))
+
+
+def _commit(buffer, entry):
+    buffer['entries'].append(entry)
+
+    # Commit hooks run in order, so the transaction's last entry writes the batch. When that entry was rolled back
+    # with a savepoint, the batch waits for the end of the request instead.
+    if buffer['last'] is entry:
+        flush(buffer)
+
+
+def record_create(instance, user=None):
+    changes = {name: [None, value] for name, value in snapshot(instance).items() if value is not None}
+    record(instance, AuditLog.CREATE, changes, user)
+
+
+def record_update(instance, before, user=None):
+    changes = diff(before, snapshot(instance))
+    if changes:
+        record(instance, AuditLog.UPDATE, changes, user)
+
+
+def record_delete(instance, user=None):
+    record(instance, AuditLog.DELETE, {}, user)
+
+
+def flush(buffer):
+    entries, buffer['entries'] = buffer['entries'], []
+    if not entries:
+        return
+
+    try:
+        AuditLog.objects.bulk_create(entries, batch_size=1000)
+    except DatabaseError:
+        # The changes themselves are committed already; a lost audit batch must not turn them into an error, but the
+        # log keeps enough to restore it.
+        logger.exception('Failed to write %s audit entries: %s', len(entries), [
+            {'model': entry.model, 'object_id': entry.object_id, 'action': entry.action, 'changes': entry.changes,
+             'user_id': entry.user_id, 'created_at': entry.created_at.isoformat()} for entry in entries])
+
+
+@contextmanager
+def audit_buffer(request=None):
+    """Collect the audit entries committed inside the block and write them with one bulk INSERT per transaction."""
+    buffer = {'request': request, 'entries': [], 'last': None}
+    token = _buffer.set(buffer)
+
+    try:
+        yield buffer
+    finally:
+        _buffer.reset(token)
+        flush(buffer)
+
+
+class AuditMiddleware:
+    # One audit INSERT per committed transaction, however many products, customers, orders or purchases it changed.
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with audit_buffer(request):
+            return self.get_response(request)
@@ -0,0 +1,95 @@
+import gzip
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from optika.models import Product, StockChangeEvent, Tombstone
+from optika.renderers import dumps
+from optika.sync import SYNC_SETTLE_TIME, encode_watermark
+
+CATALOG_FIELDS = ['id', 'sku', 'name', 'unit', 'price', 'stock']
+
+
+def catalog_version():
+    """
+    Fingerprint of everything the snapshot contains: product edits, inserts and deletes, and stock changes (every
+    stock change writes a StockChangeEvent). Three index-only aggregates, no product rows are read.
+    """
+    products = Product.objects.aggregate(updated_at=Max('updated_at'), last_id=Max('id'), count=Count('id'))
+    tombstone = Tombstone.objects.filter(model='product').aggregate(last_id=Max('id'))['last_id']
+    stock_event = StockChangeEvent.objects.aggregate(last_id=Max('id'))['last_id']
+
+    raw = f'{products["updated_at"]}|{products["last_id"]}|{products["count"]}|{tombstone}|{stock_event}'
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+def _settled_watermark():
+    """
+    Watermark for /products/changes/ that the snapshot already covers; later edits and stock changes (which bump
+    updated_at) arrive through the feed.
+    """
+    settled = timezone.now() - SYNC_SETTLE_TIME
+
+    last = (Product.objects.filter(updated_at__lt=settled).order_by('-updated_at', '-id')
+            .values_list('updated_at', 'id').first())
+    tombstone_id = (Tombstone.objects.filter(model='product', created_at__lt=settled).order_by('-id')
+                    .values_list('id', flat=True).first())
+
+    updated_at, pk = last or (None, 0)
+    return encode_watermark(updated_at, pk, tombstone_id or 0)
+
+
+def _write_snapshot(path, version):
+    since = _settled_watermark()
+    rows = Product.objects.order_by('id').values_list(*CATALOG_FIELDS)
+
+    # Written next to the final file and renamed into place, so readers never see a partial snapshot and two workers
+    # building the same version at once just overwrite each other with identical content.
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6, mtime=0) as f:
+            f.write(dumps({'version': version, 'since': since, 'fields': CATALOG_FIELDS,
+                           'generated_at': timezone.now()}) + b'\n')
+            for row in rows.iterator(chunk_size=2000):
+                f.write(dumps(row) + b'\n')
+
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _prune(directory, current):
+    for entry in os.scandir(directory):
+        if entry.name.startswith('catalog-') and entry.path != current:
+            try:
+                os.unlink(entry.path)
+            except OSError:
+                # Already removed by another worker, or still open for a download on a platform that cannot
+                # unlink open files; the next rebuild retries.
+                pass
+
+
+def get_snapshot():
+    """
+    Return ``(path, version)`` of the current catalog snapshot, building it first if the catalog changed since the
+    last one.
+
+    The snapshot is gzip'd NDJSON: a header line with the version, the field names and the ``since`` watermark to
+    continue with /products/changes/, then one JSON array per product in id order.
+    """
+    directory = settings.OPTIKA_CATALOG_DIR
+    os.makedirs(directory, exist_ok=True)
+
+    version = catalog_version()
+    path = os.path.join(directory, f'catalog-{version}.ndjson.gz')
+
+    if not os.path.exists(path):
+        _write_snapshot(path, version)
+        _prune(directory, path)
+
+    return path, version
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    if settings.CACHES['default']['BACKEND'] not in LOCAL_CACHE_BACKENDS:
+        return []
+
+    return [Warning(
+        'The default cache is local to each process.',
+        hint='Stock cache and lookup cache invalidations only reach the worker that made the change; set '
+             'CACHE_BACKEND and CACHE_LOCATION to a shared cache (Redis, Memcached) when running several workers.',
+        id='optika.W001',
+    )]
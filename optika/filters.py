@@ -0,0 +1,109 @@
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+
+from django.utils import timezone
+from django_filters import rest_framework as filters
+from django_filters.constants import EMPTY_VALUES
+
+from optika.models import StockMovement, OrderSummary, Purchase, AuditLog, PurchaseItem
+
+# Limits no stored value passes on any backend (MySQL DATE starts at year 1000; totals are int columns).
+DATE_MIN, DATE_MAX = date(1000, 1, 1), date(9999, 12, 31)
+DATETIME_MIN, DATETIME_MAX = (datetime.combine(day, time.min, dt_timezone.utc) for day in (DATE_MIN, DATE_MAX))
+TOTAL_MAX = 2147483647
+
+
+class ClosedRangeMixin:
+    """
+    ``gte``/``lte`` filter run as a range closed at ``bound`` on its other end, which changes no result. SQLite keeps
+    no statistics on value ranges: it guesses an open range matches a quarter of the table and walks the list's
+    updated_at index instead, while a closed range is guessed small enough to search the filtered column's index.
+    """
+
+    def __init__(self, *args, bound, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.bound = bound
+
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+
+        limits = (value, self.bound) if self.lookup_expr == 'gte' else (self.bound, value)
+        return self.get_method(qs)(**{f'{self.field_name}__range': limits})
+
+
+class ClosedDateFilter(ClosedRangeMixin, filters.DateFilter):
+    pass
+
+
+class ClosedNumberFilter(ClosedRangeMixin, filters.NumberFilter):
+    pass
+
+
+class StockMovementFilter(filters.FilterSet):
+    product = filters.NumberFilter(field_name='product_id')
+    movement_type = filters.ChoiceFilter(choices=StockMovement.MOVEMENT_CHOICES)
+    source_doc = filters.CharFilter()
+    date_from = filters.DateFilter(method='filter_date_from')
+    date_to = filters.DateFilter(method='filter_date_to')
+
+    class Meta:
+        model = StockMovement
+        fields = ['product', 'movement_type', 'source_doc', 'date_from', 'date_to']
+
+    # StockMovement.date is a datetime: compare it against day boundaries instead of date__date, which wraps the
+    # column in a function and cannot use the date indexes. Both ends are bounded, as in ClosedRangeMixin.
+
+    def filter_date_from(self, queryset, name, value):
+        return queryset.filter(date__gte=timezone.make_aware(datetime.combine(value, time.min)),
+                               date__lte=DATETIME_MAX)
+
+    def filter_date_to(self, queryset, name, value):
+        return queryset.filter(date__gte=DATETIME_MIN,
+                               date__lt=timezone.make_aware(datetime.combine(value + timedelta(days=1), time.min)))
+
+
+class OrderFilter(filters.FilterSet):
+    # The order list is served from OrderSummary, which carries the same date, customer and total as Order.
+    date_from = ClosedDateFilter(field_name='date', lookup_expr='gte', bound=DATE_MAX)
+    date_to = ClosedDateFilter(field_name='date', lookup_expr='lte', bound=DATE_MIN)
+    customer = filters.NumberFilter(field_name='customer_id')
+    min_total = ClosedNumberFilter(field_name='total', lookup_expr='gte', bound=TOTAL_MAX)
+    max_total = ClosedNumberFilter(field_name='total', lookup_expr='lte', bound=0)
+
+    class Meta:
+        model = OrderSummary
+        fields = ['date_from', 'date_to', 'customer', 'min_total', 'max_total']
+
+
+class PurchaseFilter(filters.FilterSet):
+    date_from = ClosedDateFilter(field_name='date', lookup_expr='gte', bound=DATE_MAX)
+    date_to = ClosedDateFilter(field_name='date', lookup_expr='lte', bound=DATE_MIN)
+    location = filters.NumberFilter(field_name='location_id')
+    status = filters.ChoiceFilter(choices=Purchase.STATUS_CHOICES)
+
+    class Meta:
+        model = Purchase
+        fields = ['date_from', 'date_to', 'location', 'status']
+
+
+class PurchaseItemFilter(filters.FilterSet):
+    # product walks purchase_item_outstanding_idx together with the outstanding_quantity > 0 of the view.
+    product = filters.NumberFilter(field_name='product_id')
+    purchase = filters.CharFilter(field_name='purchase__purchase_number')
+
+    class Meta:
+        model = PurchaseItem
+        fields = ['product', 'purchase']
+
+
+class AuditLogFilter(filters.FilterSet):
+    # model + object_id walks audit_entity_idx and user walks audit_user_idx, both in id order.
+    model = filters.ChoiceFilter(choices=[(name, name) for name in ('product', 'customer', 'order', 'purchase',
+                                                                    'purchaseitem')])
+    object_id = filters.NumberFilter()
+    user = filters.NumberFilter(field_name='user_id')
+    action = filters.ChoiceFilter(choices=AuditLog.ACTION_CHOICES)
+
+    class Meta:
+        model = AuditLog
+        fields = ['model', 'object_id', 'user', 'action']
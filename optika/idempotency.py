@@ -0,0 +1,124 @@
+import functools
+import hashlib
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from optika.models import IdempotencyKey
+from optika.renderers import dumps
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+IDEMPOTENCY_POLL_INTERVAL = 0.05
+
+
+def _fingerprint(request):
+    return hashlib.sha256(request.path.encode() + b'\0' + dumps(request.data)).hexdigest()
+
+
+def _claim(request, key, fingerprint):
+    """
+    Insert the pending row for ``key`` and return ``(True, row)``, or return ``(False, row)`` with the row another
+    request already owns.
+
+    A row that is still pending after OPTIKA_IDEMPOTENCY_PENDING_TIMEOUT belongs to a request whose worker died
+    (timeout, OOM, redeploy) before it stored an outcome; it is taken over, so the client's retry runs instead of
+    getting 409 until the key expires.
+    """
+    expires_at = timezone.now() + settings.OPTIKA_IDEMPOTENCY_TTL
+
+    for _ in range(2):
+        try:
+            # A savepoint of its own, so a taken key does not break a transaction the caller may be in.
+            with transaction.atomic():
+                return True, IdempotencyKey.objects.create(key=key, user=request.user, path=request.path,
+                                                           fingerprint=fingerprint, expires_at=expires_at)
+        except IntegrityError:
+            existing = IdempotencyKey.objects.filter(user=request.user, key=key).first()
+            now = timezone.now()
+
+            if existing is None:
+                continue
+
+            if existing.expires_at <= now:
+                # The old key outlived its TTL but was not purged yet: drop it and claim the key again.
+                existing.delete()
+            elif (existing.response_status is None
+                  and existing.created_at <= now - settings.OPTIKA_IDEMPOTENCY_PENDING_TIMEOUT):
+                # Only while it is still pending: the owner may have stored its outcome just now.
+                IdempotencyKey.objects.filter(pk=existing.pk, response_status__isnull=True).delete()
+            else:
+                return False, existing
+
+    return False, IdempotencyKey.objects.filter(user=request.user, key=key).first()
+
+
+def _wait(stored):
+    deadline = time.monotonic() + settings.OPTIKA_IDEMPOTENCY_WAIT
+
+    while stored is not None and stored.response_status is None and time.monotonic() < deadline:
+        time.sleep(IDEMPOTENCY_POLL_INTERVAL)
+        stored = IdempotencyKey.objects.filter(pk=stored.pk).first()
+
+    return stored
+
+
+def idempotent(view):
+    """
+    Replay the stored response of a POST that repeats an ``Idempotency-Key`` header, without running the view again.
+
+    A duplicate that arrives while the first request is still running waits for its outcome. Server errors are not
+    stored, so the client can retry them with the same key; neither is a request that never finished, once its
+    pending row is older than OPTIKA_IDEMPOTENCY_PENDING_TIMEOUT.
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+
+        if request.method != 'POST' or not key:
+            return view(request, *args, **kwargs)
+
+        if len(key) > 255:
+            return Response({'detail': f'{IDEMPOTENCY_HEADER} is too long.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        fingerprint = _fingerprint(request)
+        claimed, stored = _claim(request, key, fingerprint)
+
+        if claimed:
+            # By primary key: if this request outlived the pending timeout, a retry owns the key now.
+            row = IdempotencyKey.objects.filter(pk=stored.pk)
+
+            try:
+                response = view(request, *args, **kwargs)
+            except Exception:
+                row.delete()
+                raise
+
+            if response.status_code >= 500:
+                row.delete()
+            else:
+                row.update(response_status=response.status_code, response_data=response.data)
+
+            return response
+
+        if stored.fingerprint != fingerprint:
+            return Response({'detail': f'{IDEMPOTENCY_HEADER} was already used for a different request.'},
+                            status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+        stored = _wait(stored)
+
+        if stored is None or stored.response_status is None:
+            return Response({'detail': 'A request with this Idempotency-Key is still in progress.'},
+                            status=status.HTTP_409_CONFLICT)
+
+        return Response(stored.response_data, status=stored.response_status, headers={'Idempotent-Replayed': 'true'})
+
+    return wrapper
+
+
+def purge_expired_keys():
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
@@ -0,0 +1,203 @@
+import csv
+import io
+import json
+import os
+import time
+import uuid
+from itertools import islice
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from optika.audit import record_create, record_update, snapshot
+from optika.models import Product, ProductBarcode
+from optika.pricing import refresh_effective_prices
+from optika.services import initialize_stock_by_products
+from optika.stock_cache import invalidate
+
+IMPORT_CHUNK_SIZE = 1000
+IMPORT_MAX_ERRORS = 1000
+
+CSV = 'csv'
+JSONL = 'jsonl'
+FORMATS = (CSV, JSONL)
+
+
+class ProductImportRowSerializer(serializers.Serializer):
+    sku = serializers.CharField(max_length=64)
+    name = serializers.CharField(max_length=200)
+    unit = serializers.CharField(max_length=20)
+    stock = serializers.IntegerField(min_value=0)
+    price = serializers.IntegerField(min_value=1)
+
+
+def iter_csv_rows(f):
+    if isinstance(f.read(0), bytes):
+        f = io.TextIOWrapper(f, encoding='utf-8-sig', newline='')
+
+    yield from csv.DictReader(f)
+
+
+def iter_jsonl_rows(f):
+    for line in f:
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            yield json.loads(line)
+        except ValueError:
+            # Handed on as is, so the row shows up as a per-row validation error instead of aborting the import.
+            yield line
+
+
+READERS = {
+    CSV: iter_csv_rows,
+    JSONL: iter_jsonl_rows,
+}
+
+
+def save_upload(upload, fmt):
+    """Write an uploaded file to OPTIKA_IMPORT_DIR for the import_products task and return its name there."""
+    os.makedirs(settings.OPTIKA_IMPORT_DIR, exist_ok=True)
+    filename = f'products-{timezone.now():%Y%m%d%H%M%S}-{uuid.uuid4().hex}.{fmt}'
+
+    with open(os.path.join(settings.OPTIKA_IMPORT_DIR, filename), 'wb') as f:
+        for chunk in upload.chunks():
+            f.write(chunk)
+
+    return filename
+
+
+def _validate_chunk(rows, first_row_number, errors):
+    valid = {}
+    row_numbers = {}
+    failed = 0
+
+    def fail(row_number, row_errors):
+        nonlocal failed
+        failed += 1
+        if len(errors) < IMPORT_MAX_ERRORS:
+            errors.append({'row': row_number, 'errors': row_errors})
+
+    for row_number, row in enumerate(rows, start=first_row_number):
+        serializer = ProductImportRowSerializer(data=row)
+
+        if not serializer.is_valid():
+            fail(row_number, serializer.errors)
+            continue
+
+        # A later row for the same SKU wins, as it would with one request per row.
+        valid[serializer.validated_data['sku']] = serializer.validated_data
+        row_numbers[serializer.validated_data['sku']] = row_number
+
+    # Deleted products keep their SKU until they are purged; the upsert would silently update the hidden row.
+    for sku in Product.all_objects.filter(sku__in=valid.keys(), deleted_at__isnull=False).values_list('sku',
+                                                                                                      flat=True):
+        del valid[sku]
+        fail(row_numbers[sku], {'sku': ['A deleted product still uses this SKU.']})
+
+    # SKUs and barcodes share one namespace at the counter.
+    for sku in ProductBarcode.objects.filter(barcode__in=valid.keys()).values_list('barcode', flat=True):
+        del valid[sku]
+        fail(row_numbers[sku], {'sku': ['A product barcode already uses this code.']})
+
+    return valid, failed
+
+
+@transaction.atomic
+def _upsert_chunk(rows, user):
+    now = timezone.now()
+
+    while True:
+        # Locked before they are read, so a concurrent import of the same SKUs waits here instead of counting (and
+        # initializing the stock of) the same product as created. Loaded whole, so the audit trail can diff each
+        # updated product against its row before the update.
+        locked = list(Product.all_objects.filter(sku__in=rows.keys()).select_for_update())
+        existing = {product.sku: snapshot(product) for product in locked if product.deleted_at is None}
+
+        # Deleted since _validate_chunk checked the chunk: left alone instead of updating the hidden row.
+        for product in locked:
+            if product.deleted_at is not None:
+                del rows[product.sku]
+
+        # Absent SKUs cannot be locked: an import that inserts them first makes this insert fail, and the retry
+        # finds them locked and existing.
+        try:
+            with transaction.atomic():
+                Product.objects.bulk_create([Product(user=user, updated_at=now, **row) for sku, row in rows.items()
+                                             if sku not in existing])
+            break
+        except IntegrityError:
+            continue
+
+    if existing:
+        # updated_at is part of the update, so delta sync and the catalog snapshot see imported edits. Stock is only
+        # written for new products; existing stock belongs to the ledger and is never overwritten here.
+        options = {'update_conflicts': True, 'update_fields': ['name', 'unit', 'price', 'updated_at']}
+        if connection.features.supports_update_conflicts_with_target:
+            options['unique_fields'] = ['sku']
+
+        Product.objects.bulk_create([Product(user=user, updated_at=now, **rows[sku]) for sku in existing], **options)
+
+    products = Product.objects.filter(sku__in=rows.keys()).select_related('user')
+    created = [product for product in products if product.sku not in existing]
+
+    if created:
+        initialize_stock_by_products(created)
+
+    invalidate(product.id for product in products if product.sku in existing)
+    repriced = [product.id for product in products
+                if product.sku in existing and product.price != existing[product.sku]['price']]
+    if repriced:
+        # Percentage rules follow the base price.
+        refresh_effective_prices(repriced)
+
+    for product in products:
+        if product.sku in existing:
+            record_update(product, existing[product.sku], user)
+        else:
+            record_create(product, user)
+
+    return len(created), len(existing)
+
+
+def import_products(rows, user, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Upsert products by SKU from an iterable of dicts, ``chunk_size`` rows per transaction.
+
+    Rows are consumed lazily, so the whole file is never held in memory. Invalid rows are reported and skipped;
+    valid rows of the same chunk are still imported.
+    """
+    start = time.perf_counter()
+    rows = iter(rows)
+    errors = []
+    total = created = updated = failed = 0
+
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+
+        valid, chunk_failed = _validate_chunk(chunk, total + 1, errors)
+        total += len(chunk)
+        failed += chunk_failed
+
+        if valid:
+            chunk_created, chunk_updated = _upsert_chunk(valid, user)
+            created += chunk_created
+            updated += chunk_updated
+
+    seconds = time.perf_counter() - start
+
+    return {
+        'rows': total,
+        'created': created,
+        'updated': updated,
+        'failed': failed,
+        'errors': errors,
+        'seconds': round(seconds, 3),
+        'rows_per_sec': round(total / seconds) if seconds else total,
+    }
@@ -0,0 +1,161 @@
+import csv
+import os
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework import serializers
+
+from optika.archive import archive_stock_movements
+from optika.idempotency import purge_expired_keys
+from optika.imports import import_products, READERS
+from optika.models import StockMovement
+from optika.pricing import refresh_effective_prices, schedule_price_refresh, REFRESH_JOB
+from optika.receipts import get_receipt, TEXT, FORMATS
+from optika.services import reconcile_stock
+from optika.soft_delete import purge_deleted
+from optika.tasks import job
+
+
+class PrintOrderParams(serializers.Serializer):
+    order_id = serializers.IntegerField(min_value=1)
+    format = serializers.ChoiceField(choices=FORMATS, required=False)
+
+
+class ExportStockMovementsParams(serializers.Serializer):
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+
+
+class ReconcileStockParams(serializers.Serializer):
+    fix = serializers.BooleanField(required=False)
+
+    def validate_fix(self, value):
+        # Checking is harmless; overwriting Product.stock with the ledger is for staff.
+        if value and not self.context['request'].user.is_staff:
+            raise serializers.ValidationError('Only staff can fix stock.')
+
+        return value
+
+
+class ArchiveStockMovementsParams(serializers.Serializer):
+    # An ISO datetime, or a date meaning its midnight; stored normalized so the job never sees one it can't parse.
+    cutoff = serializers.CharField()
+
+    def validate_cutoff(self, value):
+        try:
+            cutoff = parse_datetime(value)
+            if cutoff is None:
+                date = parse_date(value)
+                cutoff = datetime.combine(date, time.min) if date is not None else None
+        except ValueError:
+            cutoff = None
+
+        if cutoff is None:
+            raise serializers.ValidationError('Enter a date (YYYY-MM-DD) or an ISO 8601 datetime.')
+
+        if timezone.is_naive(cutoff):
+            cutoff = timezone.make_aware(cutoff)
+
+        return cutoff.isoformat()
+
+
+class PurgeDeletedParams(serializers.Serializer):
+    days = serializers.IntegerField(min_value=0, required=False)
+
+
+class ImportProductsParams(serializers.Serializer):
+    file = serializers.CharField()
+    format = serializers.ChoiceField(choices=list(READERS))
+    user_id = serializers.IntegerField()
+
+
+class RefreshEffectivePricesParams(serializers.Serializer):
+    user_id = serializers.IntegerField()
+
+
+@job('print_order', params=PrintOrderParams)
+def print_order(order_id, format=TEXT):
+    # Written next to the exports, so the printing client fetches it from the task download endpoint.
+    receipt = get_receipt(order_id, format)
+
+    os.makedirs(settings.OPTIKA_EXPORT_DIR, exist_ok=True)
+    filename = f'receipt-{order_id}-{timezone.now():%Y%m%d%H%M%S%f}.{"txt" if format == TEXT else format}'
+    with open(os.path.join(settings.OPTIKA_EXPORT_DIR, filename), 'wb') as f:
+        f.write(receipt)
+
+    return {'order': order_id, 'format': format, 'file': filename, 'bytes': len(receipt)}
+
+
+@job('export_stock_movements_csv', params=ExportStockMovementsParams)
+def export_stock_movements_csv(date_from=None, date_to=None):
+    stock_movements = StockMovement.objects.order_by('id')
+
+    if date_from:
+        stock_movements = stock_movements.filter(date__date__gte=date_from)
+    if date_to:
+        stock_movements = stock_movements.filter(date__date__lte=date_to)
+
+    rows = stock_movements.values_list('id', 'date', 'product_id', 'product__name', 'movement_type', 'quantity',
+                                       'source_doc', 'user__username')
+
+    os.makedirs(settings.OPTIKA_EXPORT_DIR, exist_ok=True)
+    filename = f'stock-movements-{timezone.now():%Y%m%d%H%M%S%f}.csv'
+    path = os.path.join(settings.OPTIKA_EXPORT_DIR, filename)
+
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['id', 'date', 'product_id', 'product', 'movement_type', 'quantity', 'source_doc', 'user'])
+
+        for row in rows.iterator(chunk_size=2000):
+            writer.writerow(row)
+            count += 1
+
+    return {'file': filename, 'rows': count}
+
+
+@job('reconcile_stock', params=ReconcileStockParams)
+def reconcile_stock_job(fix=False):
+    mismatches = reconcile_stock(fix=fix)
+    return {'mismatches': mismatches, 'fixed': fix}
+
+
+@job('archive_stock_movements', params=ArchiveStockMovementsParams, staff_only=True)
+def archive_stock_movements_job(cutoff):
+    archived = archive_stock_movements(parse_datetime(cutoff))
+    return {'archived': archived, 'cutoff': cutoff}
+
+
+@job('import_products', params=ImportProductsParams, staff_only=True)
+def import_products_job(file, format, user_id):
+    # Queued by POST /products/import/ with the upload it saved. Rows are upserted by SKU, so a retry after a failed
+    # attempt imports the file again without duplicating products.
+    path = os.path.join(settings.OPTIKA_IMPORT_DIR, os.path.basename(file))
+
+    with open(path, 'rb') as f:
+        report = import_products(READERS[format](f), User.objects.get(pk=user_id))
+
+    os.remove(path)
+    return report
+
+
+@job('purge_idempotency_keys', staff_only=True)
+def purge_idempotency_keys():
+    return {'deleted': purge_expired_keys()}
+
+
+@job('purge_deleted', params=PurgeDeletedParams, staff_only=True)
+def purge_deleted_job(days=None):
+    cutoff = timezone.now() - (timedelta(days=days) if days is not None else settings.OPTIKA_PURGE_AFTER)
+    return {**purge_deleted(cutoff), 'cutoff': cutoff.isoformat()}
+
+
+@job(REFRESH_JOB, params=RefreshEffectivePricesParams, staff_only=True)
+def refresh_effective_prices_job(user_id):
+    # Runs when a rule window opens or closes, then queues itself for the next boundary.
+    rows = refresh_effective_prices()
+    schedule_price_refresh(User.objects.get(pk=user_id))
+    return {'rows': rows}
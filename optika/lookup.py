@@ -0,0 +1,116 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import F
+
+from optika.models import Product, ProductBarcode
+from optika.stock_cache import get_versions
+
+FIELDS = ('id', 'sku', 'name', 'unit', 'price', 'stock')
+
+MAX_CODES = 500
+
+
+class LRUCache:
+    """
+    A small thread-safe LRU whose entries also expire ``ttl`` seconds after they were set; the lock only covers the
+    dict operations, never a database or cache call.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._data.get(key)
+                if entry is None:
+                    continue
+
+                expires_at, value = entry
+                if expires_at <= now:
+                    del self._data[key]
+                    continue
+
+                self._data.move_to_end(key)
+                found[key] = value
+
+        return found
+
+    def set_many(self, items):
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for key, value in items.items():
+                self._data[key] = (expires_at, value)
+                self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+# Two kinds of entries: ('code', code) -> product id and ('row', id, version) -> the product's lookup fields.
+_cache = LRUCache(settings.OPTIKA_LOOKUP_CACHE_SIZE, settings.OPTIKA_LOOKUP_CACHE_TTL)
+
+
+def clear_cache():
+    _cache.clear()
+
+
+def _query(codes):
+    """
+    Rows for ``codes`` in one statement: a UNION of an SKU branch and a barcode branch, each an IN on its own unique
+    index, instead of an OR across the join that would scan.
+    """
+    by_sku = Product.objects.filter(sku__in=codes).annotate(code=F('sku')).values_list('code', *FIELDS)
+    by_barcode = (ProductBarcode.objects.filter(barcode__in=codes, product__deleted_at__isnull=True)
+                  .values_list('barcode', *(f'product__{field}' for field in FIELDS)))
+
+    return {row[0]: dict(zip(FIELDS, row[1:])) for row in by_sku.union(by_barcode, all=True)}
+
+
+def lookup_products(codes):
+    """
+    Resolve scanned SKUs and barcodes to ``{code: {id, sku, name, unit, price, stock}}``; unknown codes are left out.
+
+    Entries are stamped with the stock cache version of their product, which every product update, stock movement
+    and barcode change bumps, so a hit costs one cache round trip for the versions and no query. A row is only cached
+    under a version read before it was queried: the first scan of a code learns its product id, the next one caches.
+
+    Versions only reach other workers when CACHES is shared; with the in-process default, a change made by another
+    worker shows once the entry expires after OPTIKA_LOOKUP_CACHE_TTL seconds.
+    """
+    codes = list(dict.fromkeys(codes))
+    ids = {key[1]: pk for key, pk in _cache.get_many([('code', code) for code in codes]).items()}
+    versions = get_versions(set(ids.values()))
+    rows = _cache.get_many([('row', pk, versions[pk]) for pk in set(ids.values())])
+
+    results = {}
+    for code, pk in ids.items():
+        row = rows.get(('row', pk, versions[pk]))
+        if row is not None:
+            results[code] = row
+
+    missing = [code for code in codes if code not in results]
+    if not missing:
+        return results
+
+    found = _query(missing)
+    results.update(found)
+
+    _cache.set_many({
+        **{('code', code): row['id'] for code, row in found.items()},
+        **{('row', row['id'], versions[row['id']]): row for code, row in found.items()
+           if ids.get(code) == row['id']},
+    })
+
+    return results
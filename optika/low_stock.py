@@ -0,0 +1,83 @@
+from datetime import timedelta
+
+from django.db.models import Sum
+from django.utils import timezone
+
+from optika.models import Product, LowStockProduct, LowStockChange, OrderItem, PurchaseItem
+
+
+def is_low(stock, reorder_point):
+    return reorder_point > 0 and stock <= reorder_point
+
+
+def _apply(changes):
+    # changes: (product id, is_low, stock, reorder_point) for products that crossed their reorder point.
+    if not changes:
+        return
+
+    entered = [pk for pk, low, _, _ in changes if low]
+    left = [pk for pk, low, _, _ in changes if not low]
+
+    if entered:
+        LowStockProduct.objects.bulk_create([LowStockProduct(product_id=pk) for pk in entered], ignore_conflicts=True)
+    if left:
+        LowStockProduct.objects.filter(product_id__in=left).delete()
+
+    LowStockChange.objects.bulk_create([
+        LowStockChange(product_id=pk, is_low=low, stock=stock, reorder_point=reorder_point)
+        for pk, low, stock, reorder_point in changes
+    ])
+
+
+def record_stock_crossings(rows):
+    """
+    Update the low-stock set from (product id, old stock, new stock, reorder point) rows of a stock move.
+
+    Only products that crossed their reorder point cause a write, so a normal order costs nothing extra.
+    """
+    _apply([(pk, is_low(new, reorder_point), new, reorder_point)
+            for pk, old, new, reorder_point in rows
+            if is_low(old, reorder_point) != is_low(new, reorder_point)])
+
+
+def sync_low_stock(product_ids):
+    """
+    Recompute membership for ``product_ids``, e.g. after a reorder point changed or products were created or deleted.
+    """
+    product_ids = list(product_ids)
+    current = set(LowStockProduct.objects.filter(product_id__in=product_ids).values_list('product_id', flat=True))
+
+    # Deleted products leave the set whatever their stock.
+    rows = [(pk, deleted_at is None and is_low(stock, reorder_point), stock, reorder_point)
+            for pk, stock, reorder_point, deleted_at in Product.all_objects.filter(id__in=product_ids)
+            .values_list('id', 'stock', 'reorder_point', 'deleted_at')]
+
+    _apply([row for row in rows if row[1] != (row[0] in current)])
+
+
+def suggest_purchases(days=30, cover_days=14):
+    """
+    Suggested purchase quantity per low-stock product: enough to cover ``cover_days`` of the average daily sales of
+    the last ``days`` days on top of the reorder point, less what open purchases still have on order. Sales come from
+    one grouped OrderItem query, quantities on order from the outstanding column of PurchaseItem.
+    """
+    since = timezone.localdate() - timedelta(days=days)
+    products = list(Product.objects.filter(low_stock__isnull=False).order_by('id')
+                    .values('id', 'sku', 'name', 'stock', 'reorder_point'))
+
+    sold = dict(OrderItem.objects.filter(order__date__gte=since, product_id__in=[p['id'] for p in products])
+                .values('product_id').annotate(sold=Sum('quantity')).values_list('product_id', 'sold'))
+
+    on_order = dict(PurchaseItem.objects.filter(product_id__in=[p['id'] for p in products], outstanding_quantity__gt=0)
+                    .values('product_id').annotate(on_order=Sum('outstanding_quantity'))
+                    .values_list('product_id', 'on_order'))
+
+    suggestions = []
+    for product in products:
+        velocity = sold.get(product['id'], 0) / days
+        ordered = on_order.get(product['id'], 0)
+        quantity = max(0, round(velocity * cover_days) + product['reorder_point'] - product['stock'] - ordered)
+        suggestions.append({**product, 'daily_sales': round(velocity, 2), 'on_order': ordered,
+                            'suggested_quantity': quantity})
+
+    return suggestions
@@ -0,0 +1,34 @@
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from optika.archive import archive_stock_movements, ARCHIVE_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Move stock movements older than a cutoff to the archive table, leaving one opening balance per product.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', help='Cutoff date (YYYY-MM-DD); movements dated before it are archived.')
+        parser.add_argument('--days', type=int, help='Archive movements older than this many days.')
+        parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE, help='Movements per transaction.')
+
+    def handle(self, *args, **options):
+        if options['before']:
+            try:
+                date = parse_date(options['before'])
+            except ValueError:
+                date = None
+            if date is None:
+                raise CommandError('--before must be YYYY-MM-DD.')
+            cutoff = timezone.make_aware(datetime.combine(date, time.min))
+        elif options['days']:
+            cutoff = timezone.now() - timedelta(days=options['days'])
+        else:
+            raise CommandError('Pass --before or --days.')
+
+        archived = archive_stock_movements(cutoff, batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(f'Archived {archived} stock movements before {cutoff:%Y-%m-%d %H:%M}.'))
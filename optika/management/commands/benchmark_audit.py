@@ -0,0 +1,59 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from optika.audit import audit_buffer
+from optika.models import Product, AuditLog
+from optika.serializers import ProductUpdateSerializer
+
+
+class Command(BaseCommand):
+    help = ('Measure the cost of the audit trail on the product update path: the same ProductUpdateSerializer saves '
+            'with auditing off and on, one request buffer and transaction per batch. Changes names of existing '
+            'products and puts them back; the audit entries it writes stay.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100)
+        parser.add_argument('--batch', type=int, default=1, help='Updates per transaction (one audit INSERT each).')
+        parser.add_argument('--force', action='store_true', help='Run even with DEBUG off.')
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['force']:
+            raise CommandError('This rewrites product names; pass --force to run it with DEBUG off.')
+
+        products = list(Product.objects.order_by('id')[:options['products']])
+        if not products:
+            raise CommandError('No products to update.')
+
+        results = {}
+        for enabled in (False, True):
+            with override_settings(OPTIKA_AUDIT_ENABLED=enabled):
+                # Rename and rename back, so every save has a real change and the data ends where it started.
+                elapsed, queries = self._run(products, ' *', options['batch'])
+                back_elapsed, back_queries = self._run(products, '', options['batch'])
+
+            updates = len(products) * 2
+            results[enabled] = (elapsed + back_elapsed) / updates
+            self.stdout.write(f'audit {"on " if enabled else "off"}: {1 / results[enabled]:.0f} updates/sec, '
+                              f'{(queries + back_queries) / updates:.2f} queries/update')
+
+        overhead = results[True] - results[False]
+        self.stdout.write(f'overhead: {overhead * 1e6:.0f} us/update ({overhead / results[False] * 100:.1f}%), '
+                          f'{AuditLog.objects.count()} audit entries in total')
+
+    def _run(self, products, suffix, batch):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            for offset in range(0, len(products), batch):
+                with audit_buffer(), transaction.atomic():
+                    for product in products[offset:offset + batch]:
+                        name = product.name.removesuffix(' *') + suffix
+                        serializer = ProductUpdateSerializer(product, data={'name': name}, partial=True)
+                        serializer.is_valid(raise_exception=True)
+                        serializer.save()
+            elapsed = time.perf_counter() - start
+
+        return elapsed, len(queries)
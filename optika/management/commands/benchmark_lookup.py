@@ -0,0 +1,49 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from optika.lookup import clear_cache, lookup_products
+from optika.models import Product, ProductBarcode
+
+
+class Command(BaseCommand):
+    help = ('Measure SKU/barcode lookup latency as the checkout scanner sees it: single-code lookups against a cold '
+            'and a warm in-process cache, and basket lookups. Read only.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--codes', type=int, default=1000, help='Distinct SKUs and barcodes to scan.')
+        parser.add_argument('--lookups', type=int, default=10000)
+        parser.add_argument('--basket', type=int, default=20, help='Codes per batch lookup.')
+
+    def handle(self, *args, **options):
+        codes = list(Product.objects.exclude(sku=None).values_list('sku', flat=True)[:options['codes']])
+        codes += list(ProductBarcode.objects.values_list('barcode', flat=True)[:options['codes'] - len(codes)])
+        if not codes:
+            raise CommandError('No product has an SKU or a barcode to look up.')
+
+        clear_cache()
+        self._report('single, cold', [[code] for code in codes])
+        # The cold pass only learned the product ids; this one caches the rows.
+        self._report('single, warming', [[code] for code in codes])
+        self._report('single, warm', [[random.choice(codes)] for _ in range(options['lookups'])])
+
+        size = min(options['basket'], len(codes))
+        self._report(f'basket of {size}, warm',
+                     [random.sample(codes, size) for _ in range(max(options['lookups'] // size, 1))])
+
+    def _report(self, label, batches):
+        timings = []
+        with CaptureQueriesContext(connection) as queries:
+            for batch in batches:
+                start = time.perf_counter()
+                lookup_products(batch)
+                timings.append(time.perf_counter() - start)
+
+        timings.sort()
+        p99 = timings[min(int(len(timings) * 0.99), len(timings) - 1)]
+        self.stdout.write(f'{label}: {len(batches)} lookups, p50 {statistics.median(timings) * 1e6:.0f} us, '
+                          f'p99 {p99 * 1e6:.0f} us, {len(queries) / len(batches):.2f} queries/lookup')
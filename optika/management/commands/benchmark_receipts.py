@@ -0,0 +1,41 @@
+import time
+import uuid
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from optika.models import Order
+from optika.receipts import get_receipt, receipt_key, receipt_version, FORMATS
+
+
+class Command(BaseCommand):
+    help = 'Measure receipt rendering throughput (receipts/sec) on existing orders, cold and cached.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=200)
+        parser.add_argument('--format', choices=FORMATS, default='text')
+
+    def handle(self, *args, **options):
+        ids = list(Order.objects.order_by('-id').values_list('id', flat=True)[:options['orders']])
+        if not ids:
+            raise CommandError('No orders to render.')
+
+        fmt = options['format']
+        # A prefix of its own makes the first pass cold without touching the receipts, stock cache and lookup
+        # versions the default cache holds for the running app; only this run's entries are deleted afterwards.
+        prefix = f'benchmark-receipt:{uuid.uuid4().hex}'
+
+        try:
+            for label in ('cold', 'cached'):
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    for pk in ids:
+                        get_receipt(pk, fmt, key_prefix=prefix)
+                    elapsed = time.perf_counter() - start
+
+                self.stdout.write(f'{label}: {len(ids) / elapsed:.0f} receipts/sec, '
+                                  f'{len(queries) / len(ids):.1f} queries/receipt')
+        finally:
+            cache.delete_many([receipt_key(pk, fmt, receipt_version(pk), prefix) for pk in ids])
@@ -0,0 +1,50 @@
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from optika.models import Product, StockMovement
+from optika.renderers import FastJSONRenderer, orjson
+from optika.serializers import StockMovementPreviewSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compare JSONRenderer and FastJSONRenderer on a page of stock movements (no database needed).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        repeat = options['repeat']
+
+        user = User(username='bench', email='bench@example.com')
+        product = Product(name='Frame Titanium', unit='pcs', stock=100, price=750000, user=user)
+        now = timezone.now()
+
+        stock_movements = [
+            StockMovement(id=i, product=product, movement_type=StockMovement.OUT, quantity=i % 7 + 1,
+                          source_doc=f'ORD{i:06d}', note=f'Order Number #ORD{i:06d}', date=now - timedelta(minutes=i),
+                          user=user, created_at=now, updated_at=now)
+            for i in range(rows)
+        ]
+        page = {
+            'count': rows,
+            'next': None,
+            'previous': None,
+            'results': StockMovementPreviewSerializer(stock_movements, many=True).data,
+        }
+
+        self.stdout.write(f'orjson available: {orjson is not None}')
+
+        for renderer in (JSONRenderer(), FastJSONRenderer()):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                body = renderer.render(page)
+            elapsed = (time.perf_counter() - start) / repeat
+
+            self.stdout.write(f'{renderer.__class__.__name__}: {elapsed * 1000:.2f} ms/page, {len(body)} bytes')
@@ -0,0 +1,33 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from optika.imports import import_products, READERS, CSV, JSONL, IMPORT_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Upsert products by SKU from a CSV or JSON lines file (columns: sku, name, unit, stock, price).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--user', required=True, help='Username recorded as the owner of new products.')
+        parser.add_argument('--format', choices=list(READERS), default=None)
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist.")
+
+        path = options['path']
+        fmt = options['format'] or (JSONL if path.endswith(('.jsonl', '.ndjson')) else CSV)
+
+        with open(path, 'rb') as f:
+            report = import_products(READERS[fmt](f), user, chunk_size=options['chunk_size'])
+
+        for error in report['errors']:
+            self.stderr.write(f"row {error['row']}: {error['errors']}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['rows']} rows: {report['created']} created, {report['updated']} updated, "
+            f"{report['failed']} failed in {report['seconds']}s ({report['rows_per_sec']} rows/sec)."))
@@ -0,0 +1,80 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter: build the WSGI application, then serve one unauthenticated request through it, which
+# is answered without touching the database.
+FIRST_REQUEST_SCRIPT = '''
+import io, json, sys, time
+start = time.perf_counter()
+from config.wsgi import application
+loaded = time.perf_counter()
+statuses = []
+environ = {
+    'REQUEST_METHOD': 'GET', 'PATH_INFO': sys.argv[1], 'QUERY_STRING': '', 'SERVER_NAME': 'localhost',
+    'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1', 'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(),
+    'wsgi.errors': sys.stderr, 'wsgi.version': (1, 0), 'wsgi.multithread': False, 'wsgi.multiprocess': True,
+    'wsgi.run_once': False,
+}
+b''.join(application(environ, lambda status, headers, exc_info=None: statuses.append(status)))
+done = time.perf_counter()
+print(json.dumps({'import': loaded - start, 'first_request': done - start, 'status': statuses[0]}))
+'''
+
+
+def parse_importtime(output):
+    """Return ``(module, self_us, cumulative_us)`` tuples from ``python -X importtime`` output."""
+    modules = []
+
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+
+        self_us, cumulative_us, module = line[len('import time:'):].split('|')
+        # Nested imports are indented by two spaces per level after the single separator space.
+        modules.append((module[1:].rstrip(), int(self_us), int(cumulative_us)))
+
+    return modules
+
+
+class Command(BaseCommand):
+    help = 'Profile worker cold start: import time per module and time to the first served request, per settings.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', nargs='+', default=['config.settings', 'config.settings_api'],
+                            help='Settings modules to compare.')
+        parser.add_argument('--path', default='/api/optika/products/', help='URL of the first request.')
+        parser.add_argument('--runs', type=int, default=3, help='Cold starts per profile; the best one is reported.')
+        parser.add_argument('--top', type=int, default=15, help='Slowest modules (own import time) to list.')
+
+    def _run(self, profile, *args):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': profile, 'WSGI_PRELOAD': 'True'}
+        result = subprocess.run([sys.executable, *args], env=env, cwd=settings.BASE_DIR, capture_output=True,
+                                text=True)
+        if result.returncode:
+            raise CommandError(f'{profile} failed to start:\n{result.stderr}')
+
+        return result
+
+    def handle(self, *args, **options):
+        for profile in options['profiles']:
+            timings = [
+                json.loads(self._run(profile, '-c', FIRST_REQUEST_SCRIPT, options['path']).stdout)
+                for _ in range(options['runs'])
+            ]
+            best = min(timings, key=lambda timing: timing['first_request'])
+
+            modules = parse_importtime(self._run(profile, '-X', 'importtime', '-c', 'import config.wsgi').stderr)
+
+            self.stdout.write(self.style.MIGRATE_HEADING(profile))
+            self.stdout.write(f'  import: {best["import"] * 1000:.0f} ms, first request: '
+                              f'{best["first_request"] * 1000:.0f} ms ({best["status"]}), '
+                              f'{len(modules)} modules imported')
+
+            for module, self_us, cumulative_us in sorted(modules, key=lambda m: m[1], reverse=True)[:options['top']]:
+                self.stdout.write(f'  {self_us / 1000:8.1f} ms self {cumulative_us / 1000:8.1f} ms total  '
+                                  f'{module.strip()}')
@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from optika.soft_delete import purge_deleted, PURGE_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = ('Hard-delete products and customers soft-deleted before a cutoff, in small batches. Rows that orders or '
+            'purchases refer to are kept.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Purge rows deleted more than this many days ago '
+                                                     '(default: PURGE_AFTER_DAYS).')
+        parser.add_argument('--batch-size', type=int, default=PURGE_BATCH_SIZE, help='Rows per transaction.')
+
+    def handle(self, *args, **options):
+        retention = timedelta(days=options['days']) if options['days'] is not None else settings.OPTIKA_PURGE_AFTER
+        cutoff = timezone.now() - retention
+
+        purged = purge_deleted(cutoff, batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(f'Purged {purged["products"]} products and {purged["customers"]} '
+                                             f'customers deleted before {cutoff:%Y-%m-%d %H:%M}.'))
@@ -0,0 +1,61 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from optika.outbox import get_sink, relay_stock_change_events
+
+logger = logging.getLogger(__name__)
+
+# Longest pause between two attempts of a looping relay whose sink keeps failing.
+MAX_BACKOFF = 60
+
+
+class Command(BaseCommand):
+    help = 'Drain the stock change outbox in batches to a sink (log, file, webhook or a dotted path).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sink', default=None, help='Sink name or dotted path, defaults to OPTIKA_OUTBOX_SINK.')
+        parser.add_argument('--path', default=None, help='Output file for the file sink.')
+        parser.add_argument('--url', default=None, help='Target URL for the webhook sink.')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--partitions', type=int, default=1)
+        parser.add_argument('--partition', type=int, default=0)
+        parser.add_argument('--loop', action='store_true', help='Keep polling instead of exiting when drained.')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds to sleep when the outbox is empty.')
+
+    def handle(self, *args, **options):
+        sink_options = {key: options[key] for key in ('path', 'url') if options[key]}
+        sink = get_sink(options['sink'], **sink_options)
+        total = 0
+        failures = 0
+
+        while True:
+            try:
+                delivered = relay_stock_change_events(sink, batch_size=options['batch_size'],
+                                                      partitions=options['partitions'],
+                                                      partition=options['partition'])
+            except Exception:
+                if not options['loop']:
+                    raise
+
+                # The failed batch keeps its claim and is picked up again once the claim expires; until then the
+                # partition delivers nothing, so back off instead of polling it.
+                failures += 1
+                backoff = min(options['interval'] * 2 ** failures, MAX_BACKOFF)
+                logger.exception('Stock change relay failed, retrying in %.0f seconds', backoff)
+                time.sleep(backoff)
+                continue
+
+            failures = 0
+            total += delivered
+
+            if delivered:
+                continue
+
+            if not options['loop']:
+                break
+
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f'Relayed {total} stock change events.'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from optika.tasks import run_worker
+
+
+class Command(BaseCommand):
+    help = 'Run queued background tasks on a thread or process pool.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--pool', choices=['thread', 'process'], default='thread')
+        parser.add_argument('--once', action='store_true', help='Exit once no task is due.')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds to sleep when the queue is empty.')
+
+    def handle(self, *args, **options):
+        processed = run_worker(workers=options['workers'], pool=options['pool'], once=options['once'],
+                               poll_interval=options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} tasks.'))
@@ -0,0 +1,212 @@
+import random
+import string
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.db.models import Sum
+from django.utils import timezone
+from rest_framework import serializers
+
+from optika.models import Product, Customer, StockMovement, ProductStock, CostLayer
+from optika.services import initialize_stock_by_products, run_with_retries, is_retryable, _stock_mismatches
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run_stress_worker(worker, run, product_ids, prices, customer_id, user_id, options):
+    """
+    Post ``options['iterations']`` random orders and purchases over the shared products through the same serializers
+    as the API, and return what happened. Runs in a thread or a forked process.
+    """
+    from optika.serializers import OrderCreateSerializer, PurchaseCreateSerializer
+
+    rng = random.Random(options['seed'] * 1000 + worker)
+    user = User.objects.get(pk=user_id)
+    today = timezone.localdate().isoformat()
+    result = {'counts': Counter(), 'sold': Counter(), 'purchased': Counter(), 'lines': 0, 'latencies': []}
+
+    def on_retry(exc):
+        result['counts']['retries'] += 1
+
+    for iteration in range(options['iterations']):
+        products = rng.sample(product_ids, rng.randint(1, min(options['max_items'], len(product_ids))))
+        quantities = {pk: rng.randint(1, options['max_quantity']) for pk in products}
+        is_purchase = rng.random() < options['purchase_ratio']
+        number = f'{"P" if is_purchase else "S"}{run}{worker:02d}{iteration:04d}'
+
+        if is_purchase:
+            serializer = PurchaseCreateSerializer(data={
+                'purchase_number': number, 'date': today,
+                'purchase_items': [{'product': pk, 'quantity': quantity, 'unit_cost': prices[pk] // 2}
+                                   for pk, quantity in quantities.items()],
+            })
+        else:
+            total = sum(prices[pk] * quantity for pk, quantity in quantities.items())
+            serializer = OrderCreateSerializer(data={
+                'order_number': number, 'date': today, 'customer': customer_id,
+                'total': total, 'paid_amount': total, 'change_amount': 0,
+                'order_items': [{'product': pk, 'quantity': quantity, 'price': prices[pk],
+                                 'subtotal': prices[pk] * quantity} for pk, quantity in quantities.items()],
+            })
+
+        start = time.perf_counter()
+        try:
+            if not serializer.is_valid():
+                raise serializers.ValidationError(serializer.errors)
+            run_with_retries(lambda: serializer.save(user=user), attempts=options['retries'] + 1, on_retry=on_retry)
+        except serializers.ValidationError as exc:
+            # Orders that outrun the stock are rejected, either by the cached pre-check or the conditional UPDATE.
+            result['counts']['rejected' if 'quantity' in str(exc.detail) else 'invalid'] += 1
+            continue
+        except Exception as exc:
+            result['counts']['deadlocks_exhausted' if is_retryable(exc) else 'errors'] += 1
+            result['counts'][f'error: {type(exc).__name__}: {exc}'[:120]] += 1
+            continue
+        finally:
+            result['latencies'].append(time.perf_counter() - start)
+
+        result['counts']['purchases' if is_purchase else 'orders'] += 1
+        result['lines'] += len(quantities)
+        (result['purchased'] if is_purchase else result['sold']).update(quantities)
+
+    connection.close()
+    return result
+
+
+class Command(BaseCommand):
+    help = ('Fire concurrent orders and purchases at a few shared products from threads or processes, then check the '
+            'stock invariants and report throughput and retries. Writes test data: use a scratch database (a file '
+            'SQLite or a local MySQL).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help='Username the documents are created as.')
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--pool', choices=['thread', 'process'], default='thread')
+        parser.add_argument('--iterations', type=int, default=50, help='Documents per worker.')
+        parser.add_argument('--products', type=int, default=3, help='Shared products; fewer means more contention.')
+        parser.add_argument('--initial-stock', type=int, default=100)
+        parser.add_argument('--purchase-ratio', type=float, default=0.3)
+        parser.add_argument('--max-items', type=int, default=3)
+        parser.add_argument('--max-quantity', type=int, default=3)
+        parser.add_argument('--retries', type=int, default=5, help='Retries per document on deadlocks.')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--force', action='store_true', help='Run even with DEBUG off.')
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['force']:
+            raise CommandError('This writes test orders and purchases; pass --force to run it with DEBUG off.')
+        if not 1 <= options['workers'] <= 99 or not 1 <= options['iterations'] <= 9999:
+            raise CommandError('--workers must be 1-99 and --iterations 1-9999 (document numbers are 10 chars).')
+
+        user = User.objects.filter(username=options['user']).first()
+        if user is None:
+            raise CommandError(f'No user named {options["user"]}.')
+
+        run = ''.join(random.choices(string.ascii_uppercase + string.digits, k=3))
+        products, customer = self._setup(run, user, options)
+        product_ids = [product.id for product in products]
+        prices = {product.id: product.price for product in products}
+
+        worker_options = {key: options[key] for key in ('iterations', 'max_items', 'max_quantity', 'purchase_ratio',
+                                                        'retries', 'seed')}
+
+        # Forked workers must not share the parent's database connection.
+        connections.close_all()
+        executor_class = ProcessPoolExecutor if options['pool'] == 'process' else ThreadPoolExecutor
+
+        start = time.perf_counter()
+        with executor_class(max_workers=options['workers']) as executor:
+            futures = [executor.submit(run_stress_worker, worker, run, product_ids, prices, customer.id, user.id,
+                                       worker_options)
+                       for worker in range(options['workers'])]
+            results = [future.result() for future in futures]
+        elapsed = time.perf_counter() - start
+
+        counts, sold, purchased, latencies, lines = Counter(), Counter(), Counter(), [], 0
+        for result in results:
+            counts.update(result['counts'])
+            sold.update(result['sold'])
+            purchased.update(result['purchased'])
+            latencies.extend(result['latencies'])
+            lines += result['lines']
+
+        documents = counts['orders'] + counts['purchases']
+        self.stdout.write(f'run {run}: {options["workers"]} {options["pool"]} workers, {len(latencies)} documents '
+                          f'in {elapsed:.2f}s on {connection.vendor}')
+        self.stdout.write(f'  committed: {counts["orders"]} orders, {counts["purchases"]} purchases '
+                          f'({documents / elapsed:.1f} docs/sec)')
+        self.stdout.write(f'  rejected for stock: {counts["rejected"]}, invalid: {counts["invalid"]}, '
+                          f'retries: {counts["retries"]}, '
+                          f'deadlocks after all retries: {counts["deadlocks_exhausted"]}, errors: {counts["errors"]}')
+        self.stdout.write(f'  latency p50 {_percentile(latencies, 0.5) * 1000:.0f} ms, '
+                          f'p95 {_percentile(latencies, 0.95) * 1000:.0f} ms')
+        for key, value in counts.items():
+            if key.startswith('error: '):
+                self.stdout.write(f'  {value}x {key[7:]}')
+
+        failures = self._check_invariants(products, sold, purchased, lines, options)
+        for failure in failures:
+            self.stdout.write(self.style.ERROR(f'  FAIL {failure}'))
+
+        if failures:
+            raise CommandError(f'{len(failures)} invariants violated.')
+
+        self.stdout.write(self.style.SUCCESS('  all invariants hold'))
+
+    @transaction.atomic
+    def _setup(self, run, user, options):
+        products = Product.objects.bulk_create([
+            Product(sku=f'STRESS-{run}-{i}', name=f'Stress {run} {i}', unit='pcs', stock=options['initial_stock'],
+                    price=1000 + i, user=user)
+            for i in range(options['products'])
+        ])
+        # bulk_create() does not return ids on MySQL.
+        products = list(Product.objects.filter(sku__startswith=f'STRESS-{run}-').select_related('user').order_by('id'))
+        initialize_stock_by_products(products)
+
+        customer = Customer.objects.create(name=f'Stress {run}', phone='0', email='stress@example.com', address='-',
+                                           user=user)
+
+        return products, customer
+
+    def _check_invariants(self, products, sold, purchased, lines, options):
+        ids = [product.id for product in products]
+        failures = []
+
+        stocks = dict(Product.objects.filter(id__in=ids).values_list('id', 'stock'))
+        for pk, stock in stocks.items():
+            expected = options['initial_stock'] + purchased[pk] - sold[pk]
+            if stock != expected:
+                failures.append(f'product {pk}: stock {stock}, committed documents add up to {expected} '
+                                f'(lost update)')
+            if stock < 0:
+                failures.append(f'product {pk}: negative stock {stock}')
+
+        for mismatch in _stock_mismatches(Product.objects.filter(id__in=ids)):
+            failures.append(f'product {mismatch.id}: stock {mismatch.stock} != ledger {mismatch.ledger_stock}')
+
+        movements = StockMovement.objects.filter(product_id__in=ids).exclude(movement_type=StockMovement.INIT).count()
+        if movements != lines:
+            failures.append(f'{movements} stock movements for {lines} committed document lines')
+
+        balances = dict(ProductStock.objects.filter(product_id__in=ids).values('product_id')
+                        .annotate(total=Sum('stock')).values_list('product_id', 'total'))
+        layers = dict(CostLayer.objects.filter(product_id__in=ids).values('product_id')
+                      .annotate(total=Sum('remaining')).values_list('product_id', 'total'))
+        for pk, stock in stocks.items():
+            if balances.get(pk, 0) != stock:
+                failures.append(f'product {pk}: location balances {balances.get(pk, 0)} != stock {stock}')
+            if (layers.get(pk) or 0) != stock:
+                failures.append(f'product {pk}: open cost layers {layers.get(pk) or 0} != stock {stock}')
+
+        return failures
@@ -0,0 +1,279 @@
+import bisect
+import hmac
+import ipaddress
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+
+REGISTRY = []
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Metric:
+    """
+    Base of the counters below. Every thread writes to its own shard, so recording never takes a lock, even under
+    threaded workers; the lock is only taken when a thread touches the metric for the first time. A scrape sums the
+    shards. Values are per process: each worker of a multi-process server reports its own.
+    """
+
+    type = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._local = threading.local()
+        self._shards = []
+        self._retired = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._retire_dead_shards()
+                self._shards.append((threading.current_thread(), shard))
+            return shard
+
+    def _retire_dead_shards(self):
+        # Under the lock. Shards of finished threads are folded into one total, so a server that keeps replacing its
+        # threads does not grow the list, and their counts are not lost.
+        live = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+            else:
+                self._merge(self._retired, shard)
+        self._shards = live
+
+    @staticmethod
+    def _merge(into, shard):
+        raise NotImplementedError
+
+    def _collect(self):
+        # dict() copies a shard in one step under the GIL, so a thread writing to it meanwhile is harmless.
+        with self._lock:
+            self._retire_dead_shards()
+            shards = [self._merge({}, self._retired)] + [dict(shard) for thread, shard in self._shards]
+        return shards
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def inc(self, *labels, amount=1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def inc_on_commit(self, *labels, amount=1):
+        """Count once the current transaction commits, so rolled-back work is never counted."""
+        transaction.on_commit(lambda: self.inc(*labels, amount=amount))
+
+    @staticmethod
+    def _merge(into, shard):
+        for labels, value in shard.items():
+            into[labels] = into.get(labels, 0) + value
+        return into
+
+    def values(self):
+        totals = {}
+        for shard in self._collect():
+            self._merge(totals, shard)
+        return totals
+
+    def samples(self):
+        values = self.values()
+        if not self.labels and not values:
+            values = {(): 0}
+
+        for labels, value in sorted(values.items()):
+            yield self.name, dict(zip(self.labels, labels)), value
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = buckets
+
+    def observe(self, value, *labels):
+        shard = self._shard()
+        row = shard.get(labels)
+        if row is None:
+            # One slot per bucket plus +Inf, then sum and count.
+            row = shard[labels] = [0] * (len(self.buckets) + 3)
+
+        row[bisect.bisect_left(self.buckets, value)] += 1
+        row[-2] += value
+        row[-1] += 1
+
+    @staticmethod
+    def _merge(into, shard):
+        for labels, row in shard.items():
+            total = into.setdefault(labels, [0] * len(row))
+            for i, value in enumerate(list(row)):
+                total[i] += value
+        return into
+
+    def samples(self):
+        totals = {}
+        for shard in self._collect():
+            self._merge(totals, shard)
+
+        for labels, row in sorted(totals.items()):
+            names = dict(zip(self.labels, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), row):
+                cumulative += count
+                yield f'{self.name}_bucket', {**names, 'le': _format_value(bound)}, cumulative
+            yield f'{self.name}_sum', names, row[-2]
+            yield f'{self.name}_count', names, row[-1]
+
+
+REQUESTS = Counter('optika_http_requests_total', 'HTTP requests by view, method and status.',
+                   ('view', 'method', 'status'))
+REQUEST_LATENCY = Histogram('optika_http_request_duration_seconds', 'HTTP request latency by view.', ('view',))
+DB_QUERIES = Counter('optika_db_queries_total', 'Database queries run while serving requests, by view.', ('view',))
+THROTTLED = Counter('optika_throttled_requests_total', 'Requests rejected by a throttle (HTTP 429), by view.',
+                    ('view',))
+ORDERS_CREATED = Counter('optika_orders_created_total', 'Committed sales orders.')
+PURCHASES_CREATED = Counter('optika_purchases_created_total', 'Committed purchases.')
+STOCK_MOVEMENTS = Counter('optika_stock_movements_total', 'Committed stock movement rows by movement type.',
+                          ('type',))
+STOCK_CACHE = Counter('optika_stock_cache_lookups_total', 'Product lookups of the stock cache, by result.',
+                      ('result',))
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render():
+    """All registered metrics in the Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f'# HELP {metric.name} {metric.help}')
+        lines.append(f'# TYPE {metric.name} {metric.type}')
+        for name, labels, value in metric.samples():
+            label_text = ','.join(f'{key}="{_escape(label)}"' for key, label in labels.items())
+            lines.append(f'{name}{{{label_text}}} {_format_value(value)}' if label_text
+                         else f'{name} {_format_value(value)}')
+
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsMiddleware:
+    # Goes first in MIDDLEWARE so the latency covers the whole stack.
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = [0]
+
+        def count_query(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        with connection.execute_wrapper(count_query):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        # The route name, never the raw path, keeps the label set small.
+        view = match.view_name if match is not None else 'unmatched'
+
+        REQUESTS.inc(view, request.method, str(response.status_code))
+        REQUEST_LATENCY.observe(elapsed, view)
+        DB_QUERIES.inc(view, amount=queries[0])
+        if response.status_code == 429:
+            THROTTLED.inc(view)
+
+        return response
+
+
+def liveness_view(request):
+    # The process is up and serving; deliberately no database access, so a slow database never gets workers killed.
+    return HttpResponse('ok\n', content_type='text/plain')
+
+
+_migrations_applied = False
+
+
+def _pending_migrations():
+    global _migrations_applied
+
+    # Migrations are never unapplied under a running release, so the graph is only loaded until they all are.
+    if _migrations_applied:
+        return []
+
+    executor = MigrationExecutor(connection)
+    plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+    _migrations_applied = not plan
+
+    return [f'{migration.app_label}.{migration.name}' for migration, _ in plan]
+
+
+def readiness_view(request):
+    """Ready once the database answers and every migration of this release is applied; 503 otherwise."""
+    checks = {}
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        checks['database'] = 'ok'
+    except DatabaseError as exc:
+        checks['database'] = f'error: {exc}'
+        return JsonResponse({'status': 'unavailable', 'checks': checks}, status=503)
+
+    pending = _pending_migrations()
+    checks['migrations'] = f'{len(pending)} pending: {", ".join(pending)}' if pending else 'ok'
+
+    if pending:
+        return JsonResponse({'status': 'unavailable', 'checks': checks}, status=503)
+
+    return JsonResponse({'status': 'ok', 'checks': checks})
+
+
+def _allowed(request):
+    """
+    A scrape needs the OPTIKA_METRICS_TOKEN bearer token when one is set, and must come from OPTIKA_METRICS_ALLOWED_IPS;
+    with neither set, only from this host.
+    """
+    token = settings.OPTIKA_METRICS_TOKEN
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return False
+
+    networks = settings.OPTIKA_METRICS_ALLOWED_IPS or ([] if token else ['127.0.0.1', '::1'])
+    if not networks:
+        return True
+
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+
+    return any(address in ipaddress.ip_network(network, strict=False) for network in networks)
+
+
+def metrics_view(request):
+    if not _allowed(request):
+        return HttpResponseForbidden('forbidden\n', content_type='text/plain')
+
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-19 16:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('optika', '0003_purchase_purchaseitem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockChangeEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('movement_type', models.CharField(choices=[('INIT', 'Initial Stock'), ('IN', 'Stock In'), ('OUT', 'Stock Out'), ('ADJUSTMENT', 'Stock Adjustment')], max_length=20)),
+                ('quantity', models.IntegerField()),
+                ('stock', models.IntegerField()),
+                ('source_doc', models.CharField(max_length=100)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('delivered_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='stock_change_events_by_product', to='optika.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['delivered_at', 'id'], name='stock_event_pending_idx')],
+            },
+        ),
+    ]
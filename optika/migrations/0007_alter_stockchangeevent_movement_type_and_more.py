@@ -0,0 +1,46 @@
+# Generated by Django 5.2 on 2026-10-19 16:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('optika', '0006_task'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stockchangeevent',
+            name='movement_type',
+            field=models.CharField(choices=[('INIT', 'Initial Stock'), ('IN', 'Stock In'), ('OUT', 'Stock Out'), ('ADJUSTMENT', 'Stock Adjustment'), ('OPENING', 'Opening Balance')], max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='movement_type',
+            field=models.CharField(choices=[('INIT', 'Initial Stock'), ('IN', 'Stock In'), ('OUT', 'Stock Out'), ('ADJUSTMENT', 'Stock Adjustment'), ('OPENING', 'Opening Balance')], default='IN', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='StockMovementArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_id', models.BigIntegerField(unique=True)),
+                ('movement_type', models.CharField(choices=[('INIT', 'Initial Stock'), ('IN', 'Stock In'), ('OUT', 'Stock Out'), ('ADJUSTMENT', 'Stock Adjustment'), ('OPENING', 'Opening Balance')], max_length=20)),
+                ('quantity', models.IntegerField()),
+                ('source_doc', models.CharField(max_length=100)),
+                ('note', models.TextField()),
+                ('date', models.DateTimeField()),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_stock_movements_by_product', to='optika.product')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_stock_movements_by_user', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date', 'id'], name='archive_date_id_idx'), models.Index(fields=['product', 'date'], name='archive_product_date_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.2 on 2026-10-19 16:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('optika', '0007_alter_stockchangeevent_movement_type_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Location',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=20, unique=True)),
+                ('name', models.CharField(max_length=200)),
+                ('address', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='stockchangeevent',
+            name='movement_type',
+            field=models.CharField(choices=[('INIT', 'Initial Stock'), ('IN', 'Stock In'), ('OUT', 'Stock Out'), ('ADJUSTMENT', 'Stock Adjustment'), ('OPENING', 'Opening Balance'), ('TRANSFER_IN', 'Transfer In'), ('TRANSFER_OUT', 'Transfer Out')], max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='movement_type',
+            field=models.CharField(choices=[('INIT', 'Initial Stock'), ('IN', 'Stock In'), ('OUT', 'Stock Out'), ('ADJUSTMENT', 'Stock Adjustment'), ('OPENING', 'Opening Balance'), ('TRANSFER_IN', 'Transfer In'), ('TRANSFER_OUT', 'Transfer Out')], default='IN', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='stockmovementarchive',
+            name='movement_type',
+            field=models.CharField(choices=[('INIT', 'Initial Stock'), ('IN', 'Stock In'), ('OUT', 'Stock Out'), ('ADJUSTMENT', 'Stock Adjustment'), ('OPENING', 'Opening Balance'), ('TRANSFER_IN', 'Transfer In'), ('TRANSFER_OUT', 'Transfer Out')], max_length=20),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='location',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='orders_by_location', to='optika.location'),
+        ),
+        migrations.AddField(
+            model_name='purchase',
+            name='location',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='purchases_by_location', to='optika.location'),
+        ),
+        migrations.AddField(
+            model_name='stockchangeevent',
+            name='location',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='stock_change_events_by_location', to='optika.location'),
+        ),
+        migrations.AddField(
+            model_name='stockmovement',
+            name='location',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='stock_movements_by_location', to='optika.location'),
+        ),
+        migrations.AddField(
+            model_name='stockmovementarchive',
+            name='location',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='archived_stock_movements_by_location', to='optika.location'),
+        ),
+        migrations.CreateModel(
+            name='ProductStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_stocks_by_location', to='optika.location')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_stocks_by_product', to='optika.product')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('location', 'product'), name='unique_product_stock_location_product')],
+            },
+        ),
+    ]
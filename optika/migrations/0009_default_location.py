@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.db import migrations
+
+
+def create_default_location(apps, schema_editor):
+    Location = apps.get_model('optika', 'Location')
+    Product = apps.get_model('optika', 'Product')
+    ProductStock = apps.get_model('optika', 'ProductStock')
+
+    # The same location optika.services.get_default_location() books stock without a location to.
+    location, _ = Location.objects.get_or_create(code=settings.OPTIKA_DEFAULT_LOCATION,
+                                                 defaults={'name': settings.OPTIKA_DEFAULT_LOCATION})
+
+    for model_name in ('Order', 'Purchase', 'StockMovement', 'StockMovementArchive', 'StockChangeEvent'):
+        apps.get_model('optika', model_name).objects.filter(location__isnull=True).update(location=location)
+
+    ProductStock.objects.bulk_create(
+        [ProductStock(product_id=pk, location=location, stock=stock)
+         for pk, stock in Product.objects.values_list('id', 'stock').iterator(chunk_size=2000)],
+        batch_size=2000,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('optika', '0008_location_productstock'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_default_location, migrations.RunPython.noop),
+    ]
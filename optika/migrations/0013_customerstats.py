@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-19 16:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum, Max
+
+
+def backfill_customer_stats(apps, schema_editor):
+    Order = apps.get_model('optika', 'Order')
+    CustomerStats = apps.get_model('optika', 'CustomerStats')
+
+    totals = Order.objects.values('customer_id').annotate(order_count=Count('id'), total_spent=Sum('total'),
+                                                          last_order_date=Max('date')).order_by()
+
+    CustomerStats.objects.bulk_create([CustomerStats(**row) for row in totals.iterator(chunk_size=2000)],
+                                      batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('optika', '0012_product_reorder_point_lowstockchange_lowstockproduct'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('total_spent', models.PositiveBigIntegerField(default=0)),
+                ('last_order_date', models.DateField(null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='optika.customer')),
+            ],
+        ),
+        migrations.RunPython(backfill_customer_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2 on 2026-10-19 16:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_order_summaries(apps, schema_editor):
+    Order = apps.get_model('optika', 'Order')
+    OrderItem = apps.get_model('optika', 'OrderItem')
+    OrderSummary = apps.get_model('optika', 'OrderSummary')
+
+    orders = Order.objects.select_related('customer', 'user').order_by('id')
+    last_id = 0
+
+    while True:
+        chunk = list(orders.filter(id__gt=last_id)[:2000])
+        if not chunk:
+            break
+        last_id = chunk[-1].id
+
+        names = {}
+        for order_id, name in (OrderItem.objects.filter(order_id__in=[order.id for order in chunk])
+                               .order_by('id').values_list('order_id', 'product__name')):
+            names.setdefault(order_id, []).append(name)
+
+        summaries = []
+        for order in chunk:
+            order_names = names.get(order.id, [])
+            products = ', '.join(order_names[:3])
+            if len(order_names) > 3:
+                products += f' +{len(order_names) - 3}'
+
+            summaries.append(OrderSummary(
+                order=order, order_number=order.order_number, date=order.date, customer_id=order.customer_id,
+                customer_name=order.customer.name, user_name=order.user.username, item_count=len(order_names),
+                products=products[:255], total=order.total, paid_amount=order.paid_amount,
+                change_amount=order.change_amount, created_at=order.created_at, updated_at=order.updated_at,
+            ))
+
+        OrderSummary.objects.bulk_create(summaries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('optika', '0013_customerstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_number', models.CharField(max_length=10, unique=True)),
+                ('date', models.DateField()),
+                ('customer_name', models.CharField(max_length=200)),
+                ('user_name', models.CharField(max_length=150)),
+                ('item_count', models.PositiveIntegerField()),
+                ('products', models.CharField(max_length=255)),
+                ('total', models.PositiveIntegerField()),
+                ('paid_amount', models.PositiveIntegerField()),
+                ('change_amount', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_summaries_by_customer', to='optika.customer')),
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='summary', to='optika.order')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['updated_at', 'id'], name='order_summary_updated_at_idx'), models.Index(fields=['date', 'id'], name='order_summary_date_idx'), models.Index(fields=['customer', 'date'], name='order_summary_customer_idx'), models.Index(fields=['total', 'id'], name='order_summary_total_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_order_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2 on 2026-10-19 16:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def open_cost_layers(apps, schema_editor):
+    # Existing stock has no known purchase cost: give it one zero-cost layer so layers keep summing to the stock.
+    Product = apps.get_model('optika', 'Product')
+    CostLayer = apps.get_model('optika', 'CostLayer')
+
+    products = Product.objects.filter(stock__gt=0).values_list('id', 'stock')
+    CostLayer.objects.bulk_create([
+        CostLayer(product_id=pk, unit_cost=0, quantity=stock, remaining=stock)
+        for pk, stock in products.iterator(chunk_size=2000)
+    ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('optika', '0015_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='cogs',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='inventory_value',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='purchaseitem',
+            name='unit_cost',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='CostLayer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unit_cost', models.PositiveIntegerField()),
+                ('quantity', models.PositiveIntegerField()),
+                ('remaining', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cost_layers_by_product', to='optika.product')),
+                ('purchase_item', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='cost_layers_by_purchase_item', to='optika.purchaseitem')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'remaining', 'id'], name='cost_layer_open_idx')],
+            },
+        ),
+        migrations.RunPython(open_cost_layers, migrations.RunPython.noop),
+    ]
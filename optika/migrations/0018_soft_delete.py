@@ -0,0 +1,41 @@
+# Generated by Django 5.2 on 2026-10-19 16:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('optika', '0017_pricing'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='customer',
+            name='customer_updated_at_id_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_updated_at_id_idx',
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['deleted_at', 'updated_at', 'id'], name='customer_deleted_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['deleted_at', 'updated_at', 'id'], name='product_deleted_updated_idx'),
+        ),
+    ]
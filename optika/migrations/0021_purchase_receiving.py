@@ -0,0 +1,85 @@
+# Generated by Django 5.2 on 2026-10-19 17:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_existing_received(apps, schema_editor):
+    # Purchases made before receiving existed posted all their stock on creation.
+    apps.get_model('optika', 'Purchase').objects.update(status='RECEIVED')
+    apps.get_model('optika', 'PurchaseItem').objects.update(received_quantity=F('quantity'), outstanding_quantity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('optika', '0020_product_barcode'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PurchaseReceipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('receipt_number', models.CharField(max_length=20, unique=True)),
+                ('date', models.DateField()),
+                ('note', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PurchaseReceiptItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='purchase',
+            name='status',
+            field=models.CharField(choices=[('ORDERED', 'Ordered'), ('PARTIAL', 'Partially Received'), ('RECEIVED', 'Received')], default='ORDERED', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='purchaseitem',
+            name='outstanding_quantity',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='purchaseitem',
+            name='received_quantity',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='purchase',
+            index=models.Index(fields=['status', 'date', 'id'], name='purchase_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaseitem',
+            index=models.Index(fields=['product', 'outstanding_quantity'], name='purchase_item_outstanding_idx'),
+        ),
+        migrations.AddField(
+            model_name='purchasereceipt',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='purchase_receipts_by_user', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='purchasereceiptitem',
+            name='purchase_item',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='receipt_items_by_purchase_item', to='optika.purchaseitem'),
+        ),
+        migrations.AddField(
+            model_name='purchasereceiptitem',
+            name='receipt',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='receipt_items_by_receipt', to='optika.purchasereceipt'),
+        ),
+        migrations.AddConstraint(
+            model_name='purchasereceiptitem',
+            constraint=models.UniqueConstraint(fields=('receipt', 'purchase_item'), name='unique_receipt_item_receipt_purchase_item'),
+        ),
+        migrations.RunPython(mark_existing_received, migrations.RunPython.noop),
+    ]
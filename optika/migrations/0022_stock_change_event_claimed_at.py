@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 17:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('optika', '0021_purchase_receiving'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockchangeevent',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
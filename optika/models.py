@@ -1,34 +1,120 @@
 from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.utils import timezone
+
+
+class ActiveManager(models.Manager):
+    # Default manager of soft-deleted models: hides rows with deleted_at set. all_objects still returns them.
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
+class Location(models.Model):
+    code = models.CharField(max_length=20, unique=True)
+    name = models.CharField(max_length=200)
+    address = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
 
 
 class Product(models.Model):
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)
     name = models.CharField(max_length=200)
     unit = models.CharField(max_length=20)
     stock = models.PositiveIntegerField()
     price = models.PositiveIntegerField()
+    reorder_point = models.PositiveIntegerField(default=0)
+    # Cost of the stock on hand, kept up to date by optika.valuation on every purchase and order.
+    inventory_value = models.BigIntegerField(default=0)
 
     user = models.ForeignKey(User, related_name='products_by_user', on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Set by optika.soft_delete; the row stays for the ledger and documents until the purge removes it.
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    objects = ActiveManager()
+    all_objects = models.Manager()
 
     def __str__(self):
         return f'{self.name} - {self.stock}'
 
+    @property
+    def average_cost(self):
+        return round(self.inventory_value / self.stock) if self.stock else 0
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at', 'updated_at', 'id'], name='product_deleted_updated_idx'),
+        ]
+
+
+class ProductBarcode(models.Model):
+    # Extra codes a product scans as (supplier EAN, old labels), next to its SKU. Codes are unique across both.
+    product = models.ForeignKey(Product, related_name='barcodes_by_product', on_delete=models.CASCADE)
+    barcode = models.CharField(max_length=64, unique=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.barcode
+
+
+class CustomerGroup(models.Model):
+    # Customers sharing a price list, e.g. members or partner clinics.
+    code = models.CharField(max_length=20, unique=True)
+    name = models.CharField(max_length=100)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
+
 
 class Customer(models.Model):
     name = models.CharField(max_length=200)
     phone = models.CharField(max_length=16)
     email = models.EmailField(max_length=100)
     address = models.TextField()
+    group = models.ForeignKey(CustomerGroup, related_name='customers_by_group', on_delete=models.SET_NULL, null=True,
+                              blank=True)
 
     user = models.ForeignKey(User, related_name='customers_by_user', on_delete=models.RESTRICT)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    objects = ActiveManager()
+    all_objects = models.Manager()
 
     def __str__(self):
         return self.name
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at', 'updated_at', 'id'], name='customer_deleted_updated_idx'),
+        ]
+
+
+class CustomerStats(models.Model):
+    # Lifetime order totals of a customer, bumped by OrderCreateSerializer.create so profiles never aggregate Order.
+    customer = models.OneToOneField(Customer, related_name='stats', on_delete=models.CASCADE)
+    order_count = models.PositiveIntegerField(default=0)
+    total_spent = models.PositiveBigIntegerField(default=0)
+    last_order_date = models.DateField(null=True)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.customer_id} ({self.order_count})'
+
 
 class Order(models.Model):
     order_number = models.CharField(max_length=10, unique=True)
@@ -37,6 +123,7 @@ class Order(models.Model):
     total = models.PositiveIntegerField()
     paid_amount = models.PositiveIntegerField()
     change_amount = models.PositiveIntegerField()
+    location = models.ForeignKey(Location, related_name='orders_by_location', on_delete=models.PROTECT, null=True)
 
     user = models.ForeignKey(User, related_name='orders_by_user', on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -52,6 +139,8 @@ class OrderItem(models.Model):
     quantity = models.PositiveIntegerField()
     price = models.PositiveIntegerField()
     subtotal = models.PositiveIntegerField()
+    # Cost of goods sold for the whole line, set by optika.valuation when the stock goes out.
+    cogs = models.PositiveBigIntegerField(default=0)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -68,9 +157,51 @@ class OrderItem(models.Model):
         ]
 
 
+class OrderSummary(models.Model):
+    # Read model of the order list: one row per order with the customer and user names and an item summary already
+    # resolved, written with the order by OrderCreateSerializer.create.
+    order = models.OneToOneField(Order, related_name='summary', on_delete=models.CASCADE)
+    order_number = models.CharField(max_length=10, unique=True)
+    date = models.DateField()
+    customer = models.ForeignKey(Customer, related_name='order_summaries_by_customer', on_delete=models.CASCADE)
+    customer_name = models.CharField(max_length=200)
+    user_name = models.CharField(max_length=150)
+    item_count = models.PositiveIntegerField()
+    products = models.CharField(max_length=255)
+    total = models.PositiveIntegerField()
+    paid_amount = models.PositiveIntegerField()
+    change_amount = models.PositiveIntegerField()
+
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        return self.order_number
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='order_summary_updated_at_idx'),
+            models.Index(fields=['date', 'id'], name='order_summary_date_idx'),
+            models.Index(fields=['customer', 'date'], name='order_summary_customer_idx'),
+            models.Index(fields=['total', 'id'], name='order_summary_total_idx'),
+        ]
+
+
 class Purchase(models.Model):
+    ORDERED = 'ORDERED'
+    PARTIAL = 'PARTIAL'
+    RECEIVED = 'RECEIVED'
+
+    STATUS_CHOICES = (
+        (ORDERED, 'Ordered'),
+        (PARTIAL, 'Partially Received'),
+        (RECEIVED, 'Received'),
+    )
+
     purchase_number = models.CharField(max_length=10, unique=True)
     date = models.DateField()
+    location = models.ForeignKey(Location, related_name='purchases_by_location', on_delete=models.PROTECT, null=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=ORDERED)
 
     user = models.ForeignKey(User, related_name='purchases_by_user', on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -79,11 +210,24 @@ class Purchase(models.Model):
     def __str__(self):
         return self.purchase_number
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='purchase_updated_at_id_idx'),
+            models.Index(fields=['date', 'id'], name='purchase_date_id_idx'),
+            models.Index(fields=['location', 'date'], name='purchase_location_date_idx'),
+            models.Index(fields=['status', 'date', 'id'], name='purchase_status_date_idx'),
+        ]
+
 
 class PurchaseItem(models.Model):
     purchase = models.ForeignKey(Purchase, related_name='purchase_items_by_order', on_delete=models.CASCADE)
     product = models.ForeignKey(Product, related_name='purchase_items_by_product', on_delete=models.CASCADE)
+    # Ordered quantity. Receipts move received_quantity up and outstanding_quantity down in the same UPDATE, so what
+    # is still on order never has to be summed from receipt rows.
     quantity = models.PositiveIntegerField()
+    received_quantity = models.PositiveIntegerField(default=0)
+    outstanding_quantity = models.PositiveIntegerField(default=0)
+    unit_cost = models.PositiveIntegerField(default=0)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -98,6 +242,40 @@ class PurchaseItem(models.Model):
                 name='unique_purchase_item_purchase_product'
             )
         ]
+        indexes = [
+            models.Index(fields=['product', 'outstanding_quantity'], name='purchase_item_outstanding_idx'),
+        ]
+
+
+class PurchaseReceipt(models.Model):
+    # One supplier delivery; its lines may settle items of several purchases at once.
+    receipt_number = models.CharField(max_length=20, unique=True)
+    date = models.DateField()
+    note = models.CharField(max_length=255, blank=True)
+
+    user = models.ForeignKey(User, related_name='purchase_receipts_by_user', on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.receipt_number
+
+
+class PurchaseReceiptItem(models.Model):
+    receipt = models.ForeignKey(PurchaseReceipt, related_name='receipt_items_by_receipt', on_delete=models.CASCADE)
+    purchase_item = models.ForeignKey(PurchaseItem, related_name='receipt_items_by_purchase_item',
+                                      on_delete=models.PROTECT)
+    quantity = models.PositiveIntegerField()
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['receipt', 'purchase_item'],
+                name='unique_receipt_item_receipt_purchase_item'
+            )
+        ]
 
 
 class StockMovement(models.Model):
@@ -105,12 +283,18 @@ class StockMovement(models.Model):
     IN = 'IN'
     OUT = 'OUT'
     ADJUSTMENT = 'ADJUSTMENT'
+    OPENING = 'OPENING'
+    TRANSFER_IN = 'TRANSFER_IN'
+    TRANSFER_OUT = 'TRANSFER_OUT'
 
     MOVEMENT_CHOICES = (
         (INIT, 'Initial Stock'),
         (IN, 'Stock In'),
         (OUT, 'Stock Out'),
         (ADJUSTMENT, 'Stock Adjustment'),
+        (OPENING, 'Opening Balance'),
+        (TRANSFER_IN, 'Transfer In'),
+        (TRANSFER_OUT, 'Transfer Out'),
     )
 
     product = models.ForeignKey(Product, related_name='stock_movements_by_product', on_delete=models.CASCADE)
@@ -119,6 +303,8 @@ class StockMovement(models.Model):
     source_doc = models.CharField(max_length=100)
     note = models.TextField()
     date = models.DateTimeField()
+    location = models.ForeignKey(Location, related_name='stock_movements_by_location', on_delete=models.PROTECT,
+                                 null=True)
 
     user = models.ForeignKey(User, related_name='stock_movements_by_user', on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -127,6 +313,84 @@ class StockMovement(models.Model):
     def __str__(self):
         return self.product.name
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='movement_updated_at_id_idx'),
+            models.Index(fields=['date', 'id'], name='movement_date_id_idx'),
+            models.Index(fields=['product', 'date'], name='movement_product_date_idx'),
+            models.Index(fields=['movement_type', 'date'], name='movement_type_date_idx'),
+            models.Index(fields=['source_doc'], name='movement_source_doc_idx'),
+        ]
+
+
+class StockMovementArchive(models.Model):
+    # Movements moved out of StockMovement by optika.archive; they are replaced there by one OPENING row per product.
+    original_id = models.BigIntegerField(unique=True)
+    product = models.ForeignKey(Product, related_name='archived_stock_movements_by_product', on_delete=models.CASCADE)
+    movement_type = models.CharField(max_length=20, choices=StockMovement.MOVEMENT_CHOICES)
+    quantity = models.IntegerField()
+    source_doc = models.CharField(max_length=100)
+    note = models.TextField()
+    date = models.DateTimeField()
+    location = models.ForeignKey(Location, related_name='archived_stock_movements_by_location',
+                                 on_delete=models.PROTECT, null=True)
+
+    user = models.ForeignKey(User, related_name='archived_stock_movements_by_user', on_delete=models.CASCADE)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.product.name
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'id'], name='archive_date_id_idx'),
+            models.Index(fields=['product', 'date'], name='archive_product_date_idx'),
+        ]
+
+
+class ProductStock(models.Model):
+    # Current stock of a product at one location, kept in step with the ledger by optika.services. Product.stock stays
+    # the total over all locations.
+    product = models.ForeignKey(Product, related_name='product_stocks_by_product', on_delete=models.CASCADE)
+    location = models.ForeignKey(Location, related_name='product_stocks_by_location', on_delete=models.CASCADE)
+    stock = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.product_id} @ {self.location_id} - {self.stock}'
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['location', 'product'],
+                name='unique_product_stock_location_product'
+            )
+        ]
+
+
+class CostLayer(models.Model):
+    # Quantity of a product received at one unit cost and not sold yet. Sales consume layers oldest first, which is the
+    # FIFO cost; the weighted-average method keeps consuming them too, so the method can be switched at any time.
+    product = models.ForeignKey(Product, related_name='cost_layers_by_product', on_delete=models.CASCADE)
+    purchase_item = models.ForeignKey(PurchaseItem, related_name='cost_layers_by_purchase_item',
+                                      on_delete=models.SET_NULL, null=True)
+    unit_cost = models.PositiveIntegerField()
+    quantity = models.PositiveIntegerField()
+    remaining = models.PositiveIntegerField()
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.product_id} {self.remaining}/{self.quantity} @ {self.unit_cost}'
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'remaining', 'id'], name='cost_layer_open_idx'),
+        ]
+
 
 class StockAdjustment(models.Model):
     product = models.ForeignKey(Product, related_name='stock_adjustments_by_product', on_delete=models.CASCADE)
@@ -137,4 +401,214 @@ class StockAdjustment(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return self.product.name
\ No newline at end of file
+        return self.product.name
+
+
+class StockChangeEvent(models.Model):
+    # Outbox row written in the same transaction as the stock change it describes. The product is referenced without
+    # a database constraint so events survive a product delete and can still be relayed.
+    product = models.ForeignKey(Product, related_name='stock_change_events_by_product', on_delete=models.DO_NOTHING,
+                                db_constraint=False)
+    movement_type = models.CharField(max_length=20, choices=StockMovement.MOVEMENT_CHOICES)
+    quantity = models.IntegerField()
+    stock = models.IntegerField()
+    source_doc = models.CharField(max_length=100)
+    location = models.ForeignKey(Location, related_name='stock_change_events_by_location', on_delete=models.DO_NOTHING,
+                                 db_constraint=False, null=True)
+
+    attempts = models.PositiveIntegerField(default=0)
+    # Set by the relay while it sends the event outside any transaction; an old claim is a relay that died.
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.movement_type} {self.product_id} ({self.quantity})'
+
+    def to_payload(self):
+        return {
+            'id': self.id,
+            'product': self.product_id,
+            'location': self.location_id,
+            'type': self.movement_type,
+            'quantity': self.quantity,
+            'stock': self.stock,
+            'source_doc': self.source_doc,
+            'created_at': self.created_at,
+        }
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['delivered_at', 'id'], name='stock_event_pending_idx'),
+        ]
+
+
+class Tombstone(models.Model):
+    # Trace of a deleted row so sync clients can drop it from their local copy.
+    model = models.CharField(max_length=50)
+    object_id = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.model} #{self.object_id}'
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['model', 'id'], name='tombstone_model_id_idx'),
+        ]
+
+
+class AuditLog(models.Model):
+    # Field-level change of a product, customer, order or purchase, written in bulk by optika.audit.
+    CREATE = 'CREATE'
+    UPDATE = 'UPDATE'
+    DELETE = 'DELETE'
+
+    ACTION_CHOICES = (
+        (CREATE, 'Create'),
+        (UPDATE, 'Update'),
+        (DELETE, 'Delete'),
+    )
+
+    model = models.CharField(max_length=50)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    # {field: [old, new]}; old is null on create.
+    changes = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+
+    user = models.ForeignKey(User, related_name='audit_logs_by_user', on_delete=models.SET_NULL, null=True)
+    # Time of the change, not of the flush.
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f'{self.action} {self.model} #{self.object_id}'
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['model', 'object_id', 'id'], name='audit_entity_idx'),
+            models.Index(fields=['user', 'id'], name='audit_user_idx'),
+        ]
+
+
+class Task(models.Model):
+    PENDING = 'PENDING'
+    RUNNING = 'RUNNING'
+    DONE = 'DONE'
+    FAILED = 'FAILED'
+
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    name = models.CharField(max_length=100)
+    kwargs = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField()
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    user = models.ForeignKey(User, related_name='tasks_by_user', on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.name} #{self.pk} ({self.status})'
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after', 'id'], name='task_queue_idx'),
+        ]
+
+
+class PriceRule(models.Model):
+    # A fixed price or a percentage off Product.price, optionally limited to a customer group, a minimum quantity
+    # (quantity break) and a time window (promotion). Checkout never evaluates rules; see EffectivePrice.
+    product = models.ForeignKey(Product, related_name='price_rules_by_product', on_delete=models.CASCADE)
+    group = models.ForeignKey(CustomerGroup, related_name='price_rules_by_group', on_delete=models.CASCADE, null=True,
+                              blank=True)
+    min_quantity = models.PositiveIntegerField(default=1)
+    price = models.PositiveIntegerField(null=True, blank=True)
+    discount_percent = models.PositiveSmallIntegerField(null=True, blank=True)
+    starts_at = models.DateTimeField(null=True, blank=True)
+    ends_at = models.DateTimeField(null=True, blank=True)
+    is_active = models.BooleanField(default=True)
+
+    user = models.ForeignKey(User, related_name='price_rules_by_user', on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.product_id} x{self.min_quantity} ({self.group_id or "all"})'
+
+
+class EffectivePrice(models.Model):
+    # Best price per product, customer group (null: everyone) and quantity break among the rules in effect, rebuilt
+    # by optika.pricing whenever a rule changes or a rule window opens or closes.
+    product = models.ForeignKey(Product, related_name='effective_prices_by_product', on_delete=models.CASCADE)
+    group = models.ForeignKey(CustomerGroup, related_name='effective_prices_by_group', on_delete=models.CASCADE,
+                              null=True)
+    min_quantity = models.PositiveIntegerField()
+    price = models.PositiveIntegerField()
+    # End of the window of the rule this price comes from; checkout ignores the row past it even before the rebuild.
+    ends_at = models.DateTimeField(null=True)
+
+    def __str__(self):
+        return f'{self.product_id} x{self.min_quantity} ({self.group_id or "all"}) = {self.price}'
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'group', 'min_quantity'], name='effective_price_lookup_idx'),
+        ]
+
+
+class IdempotencyKey(models.Model):
+    # Stored outcome of a POST sent with an Idempotency-Key header; response_status stays null while the first
+    # request is still running.
+    key = models.CharField(max_length=255)
+    path = models.CharField(max_length=200)
+    fingerprint = models.CharField(max_length=64)
+    response_status = models.PositiveSmallIntegerField(null=True)
+    response_data = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+
+    user = models.ForeignKey(User, related_name='idempotency_keys_by_user', on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.key
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'key'],
+                name='unique_idempotency_key_user_key'
+            )
+        ]
+
+
+class LowStockProduct(models.Model):
+    # Products whose stock is at or below their reorder point, maintained by optika.low_stock.
+    product = models.OneToOneField(Product, related_name='low_stock', on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return str(self.product_id)
+
+
+class LowStockChange(models.Model):
+    # Change feed of the low-stock set: one row each time a product enters or leaves it.
+    product = models.ForeignKey(Product, related_name='low_stock_changes_by_product', on_delete=models.DO_NOTHING,
+                                db_constraint=False)
+    is_low = models.BooleanField()
+    stock = models.PositiveIntegerField()
+    reorder_point = models.PositiveIntegerField()
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.product_id} {"low" if self.is_low else "ok"}'
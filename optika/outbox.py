@@ -0,0 +1,125 @@
+import logging
+import urllib.request
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Mod
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from optika.models import StockChangeEvent
+from optika.renderers import dumps
+
+logger = logging.getLogger(__name__)
+
+
+class LogSink:
+    """Local stand-in: writes every event to the log."""
+
+    def __init__(self, **options):
+        self.options = options
+
+    def send(self, payloads):
+        for payload in payloads:
+            logger.info('stock change %s', dumps(payload).decode())
+
+
+class FileSink:
+    """Appends events as JSON lines to a file."""
+
+    def __init__(self, path='stock_events.ndjson', **options):
+        self.path = path
+
+    def send(self, payloads):
+        with open(self.path, 'ab') as f:
+            f.write(b''.join(dumps(payload) + b'\n' for payload in payloads))
+
+
+class WebhookSink:
+    """POSTs a batch of events as one JSON array; any non-2xx response fails the batch."""
+
+    def __init__(self, url, timeout=10, **options):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, payloads):
+        request = urllib.request.Request(self.url, data=dumps(payloads), method='POST',
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            if not 200 <= response.status < 300:
+                raise IOError(f'Webhook responded with {response.status}')
+
+
+SINKS = {
+    'log': LogSink,
+    'file': FileSink,
+    'webhook': WebhookSink,
+}
+
+
+def get_sink(name=None, **options):
+    name = name or getattr(settings, 'OPTIKA_OUTBOX_SINK', 'log')
+    options = {**getattr(settings, 'OPTIKA_OUTBOX_SINK_OPTIONS', {}), **options}
+    sink_class = SINKS[name] if name in SINKS else import_string(name)
+    return sink_class(**options)
+
+
+def pending_events(partitions=1, partition=0):
+    events = StockChangeEvent.objects.filter(delivered_at__isnull=True).order_by('id')
+
+    if partitions > 1:
+        # Every product always lands in the same partition, so parallel relays still deliver one product in order.
+        events = events.alias(partition=Mod('product_id', partitions)).filter(partition=partition)
+
+    return events
+
+
+def _claim(batch_size, partitions, partition):
+    """
+    Claim the next batch of the partition in a short transaction and return it, or [] when another relay holds a live
+    claim on it. Batches are always the oldest pending events, so a live claim in the batch means an earlier batch is
+    still being sent and sending this one now would overtake it.
+    """
+    now = timezone.now()
+
+    with transaction.atomic():
+        events = list(pending_events(partitions, partition).select_for_update()[:batch_size])
+
+        if any(event.claimed_at and event.claimed_at > now - settings.OPTIKA_OUTBOX_CLAIM_TIMEOUT for event in events):
+            return []
+
+        StockChangeEvent.objects.filter(id__in=[event.id for event in events]).update(claimed_at=now)
+
+    return events
+
+
+def relay_stock_change_events(sink, batch_size=500, partitions=1, partition=0):
+    """
+    Deliver one batch of pending events and return how many were delivered.
+
+    The batch is claimed and committed first, so the sink is called without holding a transaction or row locks open,
+    and only marked delivered after the sink accepted it: a crash in between re-sends the batch once its claim is
+    older than OPTIKA_OUTBOX_CLAIM_TIMEOUT (at-least-once). A batch the sink rejects keeps its claim too, so it is
+    retried after the same timeout, and the error is raised instead of skipping ahead, which keeps per-product
+    ordering. Run at most one relay per partition: a second one finds the batch claimed and
+    delivers nothing rather than overtake the first.
+    """
+    events = _claim(batch_size, partitions, partition)
+
+    if not events:
+        return 0
+
+    ids = [event.id for event in events]
+
+    try:
+        sink.send([event.to_payload() for event in events])
+    except Exception as exc:
+        logger.error('Failed to relay %s stock change events: %s', len(ids), exc)
+        StockChangeEvent.objects.filter(id__in=ids).update(attempts=F('attempts') + 1)
+        raise
+
+    StockChangeEvent.objects.filter(id__in=ids).update(claimed_at=None, delivered_at=timezone.now(),
+                                                       attempts=F('attempts') + 1)
+
+    return len(ids)
@@ -1,6 +1,11 @@
-from rest_framework.pagination import PageNumberPagination
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.pagination import PageNumberPagination, CursorPagination
 from rest_framework.response import Response
 
+ESTIMATED_COUNT_THRESHOLD = 100_000
+
 
 class CustomPagination(PageNumberPagination):
 
@@ -18,4 +23,56 @@ class CustomPagination(PageNumberPagination):
             'search': search,        # ← custom field
             'page': page,        # ← custom field
             'results': data
-        })
\ No newline at end of file
+        })
+
+
+class KeysetPagination(CursorPagination):
+    # Seeks on the primary key instead of counting and offsetting, so deep pages cost the same as the first one.
+
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    ordering = '-id'
+
+    def get_paginated_response(self, data, **extra):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            **extra,
+            'results': data
+        })
+
+
+def estimated_row_count(model, using='default'):
+    """The planner's row estimate for the table of ``model``, or None where the backend keeps none (SQLite)."""
+    connection = connections[using]
+    table = model._meta.db_table
+
+    if connection.vendor == 'mysql':
+        sql = 'SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s'
+    elif connection.vendor == 'postgresql':
+        sql = 'SELECT reltuples::bigint FROM pg_class WHERE relname = %s'
+    else:
+        return None
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [table])
+        row = cursor.fetchone()
+
+    return row[0] if row and row[0] and row[0] > 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    # Admin paginator: an unfiltered changelist of a large table shows the planner's row estimate instead of running
+    # COUNT(*) over the whole table; filtered and small lists keep the exact count.
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+
+        return super().count
@@ -0,0 +1,103 @@
+from django.db import transaction
+from django.db.models import FilteredRelation, Min, Q
+from django.utils import timezone
+
+from optika.models import EffectivePrice, PriceRule, Product, Task
+from optika.tasks import enqueue
+
+REFRESH_JOB = 'refresh_effective_prices'
+
+
+def rule_price(rule, base_price):
+    if rule.price is not None:
+        return rule.price
+
+    return (base_price * (100 - rule.discount_percent) + 50) // 100
+
+
+def refresh_effective_prices(product_ids=None):
+    """
+    Rebuild the EffectivePrice rows of ``product_ids`` (all products when None) from the rules in effect right now,
+    keeping the lowest price per product, customer group and quantity break. Returns the number of rows written.
+    """
+    now = timezone.now()
+    rules = PriceRule.objects.filter(Q(starts_at__isnull=True) | Q(starts_at__lte=now),
+                                     Q(ends_at__isnull=True) | Q(ends_at__gt=now), is_active=True,
+                                     product__deleted_at__isnull=True)
+    if product_ids is not None:
+        product_ids = list(product_ids)
+        rules = rules.filter(product_id__in=product_ids)
+
+    rules = list(rules)
+    base_prices = dict(Product.objects.filter(id__in={rule.product_id for rule in rules}).values_list('id', 'price'))
+
+    best = {}
+    for rule in rules:
+        key = (rule.product_id, rule.group_id, rule.min_quantity)
+        price = rule_price(rule, base_prices[rule.product_id])
+
+        if key not in best or price < best[key].price:
+            best[key] = EffectivePrice(product_id=rule.product_id, group_id=rule.group_id,
+                                       min_quantity=rule.min_quantity, price=price, ends_at=rule.ends_at)
+
+    with transaction.atomic():
+        stale = EffectivePrice.objects.all()
+        if product_ids is not None:
+            stale = stale.filter(product_id__in=product_ids)
+
+        stale.delete()
+        EffectivePrice.objects.bulk_create(best.values(), batch_size=1000)
+
+    return len(best)
+
+
+def schedule_price_refresh(user):
+    """Queue a full rebuild for the next moment a rule window opens or closes, unless one is already due by then."""
+    now = timezone.now()
+    active = PriceRule.objects.filter(is_active=True)
+    boundaries = [
+        active.filter(starts_at__gt=now).aggregate(at=Min('starts_at'))['at'],
+        active.filter(ends_at__gt=now).aggregate(at=Min('ends_at'))['at'],
+    ]
+    boundaries = [boundary for boundary in boundaries if boundary is not None]
+
+    if not boundaries:
+        return None
+
+    boundary = min(boundaries)
+    if Task.objects.filter(name=REFRESH_JOB, status=Task.PENDING, run_after__lte=boundary).exists():
+        return None
+
+    return enqueue(REFRESH_JOB, user, {'user_id': user.pk}, run_after=boundary)
+
+
+def quote_prices(quantities, group_id=None):
+    """
+    Price every line of ``quantities`` (product id -> quantity) for a customer of ``group_id`` with one query: the
+    product rows joined to their precomputed prices, so the base price comes from the database along with the rules.
+    Returns product id -> (base price, price), the price being the lowest one whose quantity break the line reaches,
+    else the base price. Products that do not exist (or are deleted) are left out.
+    """
+    groups = Q(effective_prices_by_product__group__isnull=True)
+    if group_id is not None:
+        groups |= Q(effective_prices_by_product__group_id=group_id)
+
+    in_effect = Q(effective_prices_by_product__ends_at__isnull=True) | Q(
+        effective_prices_by_product__ends_at__gt=timezone.now())
+    rows = (Product.objects.filter(id__in=quantities.keys())
+            .annotate(rule=FilteredRelation('effective_prices_by_product', condition=groups & in_effect))
+            .values_list('id', 'price', 'rule__min_quantity', 'rule__price'))
+
+    prices = {}
+    for pk, base_price, min_quantity, price in rows:
+        best = prices.get(pk, (base_price, base_price))[1]
+        if price is not None and min_quantity <= quantities[pk] and price < best:
+            best = price
+        prices[pk] = (base_price, best)
+
+    return prices
+
+
+def get_effective_prices(quantities, group_id=None):
+    """Product id -> price of every line of ``quantities``, as quote_prices() prices it."""
+    return {pk: price for pk, (_, price) in quote_prices(quantities, group_id).items()}
@@ -0,0 +1,145 @@
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import Count, Max, Prefetch
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+
+from optika.models import Order, OrderItem
+
+RECEIPT_WIDTH = 42
+RECEIPT_CACHE_TIMEOUT = 60 * 60 * 24
+
+TEXT = 'text'
+PDF = 'pdf'
+FORMATS = (TEXT, PDF)
+
+# Templates are plain format strings bound once at import, so rendering a receipt is only string formatting.
+_header = '{:^42.42}'.format
+_pair = '{:<20.20}{:>22.22}'.format
+_item_name = '{:<42.42}'.format
+_item_line = '  {:>4} x {:>12} {:>20}'.format
+_rule = '-' * RECEIPT_WIDTH
+
+
+def _money(value):
+    return f'{value:,}'.replace(',', '.')
+
+
+def load_order(pk):
+    """Order, customer, user, items and products in two queries, whatever the number of items."""
+    items = OrderItem.objects.select_related('product').order_by('id')
+    queryset = Order.objects.select_related('customer', 'user') \
+        .prefetch_related(Prefetch('order_items_by_order', queryset=items))
+
+    return get_object_or_404(queryset, pk=pk)
+
+
+def render_text(order):
+    lines = [
+        _header('OPTIKA'),
+        _header(f'Order #{order.order_number}'),
+        _rule,
+        _pair('Date', order.date.isoformat()),
+        _pair('Customer', order.customer.name),
+        _pair('Cashier', order.user.username),
+        _rule,
+    ]
+
+    for order_item in order.order_items_by_order.all():
+        lines.append(_item_name(order_item.product.name))
+        lines.append(_item_line(order_item.quantity, _money(order_item.price), _money(order_item.subtotal)))
+
+    lines += [
+        _rule,
+        _pair('Total', _money(order.total)),
+        _pair('Paid', _money(order.paid_amount)),
+        _pair('Change', _money(order.change_amount)),
+        _rule,
+        _header('Thank you'),
+    ]
+
+    return '\n'.join(lines) + '\n'
+
+
+def _pdf_escape(line):
+    return line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def render_pdf(order):
+    """Single-page PDF of the thermal receipt set in Courier; needs no PDF library."""
+    lines = render_text(order).splitlines()
+    font_size, leading, margin = 9, 11, 18
+    width = int(RECEIPT_WIDTH * font_size * 0.6) + 2 * margin
+    height = len(lines) * leading + 2 * margin
+
+    text = ''.join(f"({_pdf_escape(line)}) '\n" for line in lines)
+    content = f'BT /F1 {font_size} Tf {leading} TL {margin} {height - margin} Td\n{text}ET'.encode('latin-1', 'replace')
+
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width} {height}] '
+        f'/Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>'.encode(),
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Courier >>',
+        b'<< /Length %d >>\nstream\n%s\nendstream' % (len(content), content),
+    ]
+
+    pdf = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+
+    xref = len(pdf)
+    pdf += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    pdf += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    pdf += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+
+    return bytes(pdf)
+
+
+RENDERERS = {
+    TEXT: lambda order: render_text(order).encode(),
+    PDF: render_pdf,
+}
+
+
+def receipt_version(pk):
+    """
+    Everything printed on the receipt of order ``pk`` that can change after the order was saved, in one query: the
+    order, its customer and cashier, and the count and latest change of its items and their products. None when the
+    order does not exist.
+    """
+    return Order.objects.filter(pk=pk).annotate(
+        item_count=Count('order_items_by_order'),
+        items_updated_at=Max('order_items_by_order__updated_at'),
+        products_updated_at=Max('order_items_by_order__product__updated_at'),
+    ).values_list('updated_at', 'customer__updated_at', 'user__username', 'item_count', 'items_updated_at',
+                  'products_updated_at').first()
+
+
+def receipt_key(pk, fmt, version, prefix='receipt'):
+    return f'{prefix}:{pk}:{fmt}:{hashlib.md5(repr(version).encode()).hexdigest()}'
+
+
+def get_receipt(pk, fmt=TEXT, key_prefix='receipt'):
+    """
+    Return the receipt bytes for order ``pk``.
+
+    The cache key is a digest of receipt_version, so a reprint costs one indexed lookup and an order whose items,
+    customer or products were edited is re-rendered automatically instead of being invalidated by hand.
+    ``key_prefix`` keeps the entries of a caller (benchmark_receipts) apart from the ones served to users.
+    """
+    version = receipt_version(pk)
+    if version is None:
+        raise Http404('No Order matches the given query.')
+
+    key = receipt_key(pk, fmt, version, key_prefix)
+    receipt = cache.get(key)
+
+    if receipt is None:
+        receipt = RENDERERS[fmt](load_order(pk))
+        cache.set(key, receipt, RECEIPT_CACHE_TIMEOUT)
+
+    return receipt
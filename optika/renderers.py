@@ -0,0 +1,140 @@
+import os
+import re
+
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from rest_framework import renderers, parsers, status
+from rest_framework.exceptions import ParseError
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+def _default(obj):
+    # Datetimes, dates and times are passed through to here as well: orjson would format them itself (microseconds,
+    # offsets), while the DRF encoder decides how they look in the API. Everything else orjson does not know (Decimal,
+    # lazy strings, querysets, ...) goes through the same encoder too, so both code paths produce the same output.
+    return encoders.JSONEncoder().default(obj)
+
+
+def dumps(data, indent=False):
+    if orjson is not None:
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=_default, option=option)
+
+    return renderers.JSONRenderer().render(data, renderer_context={'indent': 2 if indent else None})
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    """
+    Drop-in replacement for DRF's JSONRenderer that encodes with orjson when it is installed and falls back to the
+    stdlib encoder otherwise.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        indent = self.get_indent(accepted_media_type, renderer_context)
+
+        return dumps(data, indent=bool(indent))
+
+
+class FastJSONParser(parsers.JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read())
+        except (orjson.JSONDecodeError, UnicodeDecodeError) as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _parse_range(header, size):
+    """
+    Return ``(start, end)`` (inclusive) for a single ``bytes=`` range, None to ignore it, or False if unsatisfiable.
+    """
+    match = _RANGE_RE.match(header.strip())
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+
+    first, last = match.groups()
+    if first == '':
+        # Suffix range: the last N bytes.
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+
+    if start >= size or start > end:
+        return False
+
+    return start, end
+
+
+class _FileSlice:
+    # File-like view of ``length`` bytes from ``start``, so FileResponse streams only the requested range.
+
+    def __init__(self, f, start, length):
+        f.seek(start)
+        self.f = f
+        self.left = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.left:
+            size = self.left
+        data = self.f.read(size)
+        self.left -= len(data)
+        return data
+
+    def close(self):
+        self.f.close()
+
+
+def ranged_file_response(request, path, etag, content_type, filename):
+    """
+    Serve ``path`` with a strong ``etag``: 304 for a matching If-None-Match, and 206 for a single byte range
+    (honouring If-Range), so clients can skip or resume downloads.
+    """
+    etag = f'"{etag}"'
+
+    if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+        return HttpResponseNotModified(headers={'ETag': etag})
+
+    size = os.path.getsize(path)
+    byte_range = None
+
+    if 'Range' in request.headers and request.headers.get('If-Range', etag) == etag:
+        byte_range = _parse_range(request.headers['Range'], size)
+
+    if byte_range is False:
+        return HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                            headers={'Content-Range': f'bytes */{size}', 'ETag': etag})
+
+    f = open(path, 'rb')
+
+    if byte_range is None:
+        response = FileResponse(f, content_type=content_type, as_attachment=True, filename=filename)
+    else:
+        start, end = byte_range
+        response = FileResponse(_FileSlice(f, start, end - start + 1), status=status.HTTP_206_PARTIAL_CONTENT,
+                                content_type=content_type, as_attachment=True, filename=filename)
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+
+    response['ETag'] = etag
+    response['Accept-Ranges'] = 'bytes'
+    return response
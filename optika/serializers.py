@@ -1,9 +1,20 @@
 from django.contrib.auth.models import User
 from django.db import transaction
 from rest_framework import serializers
-
-from optika.models import Product, Customer, StockMovement, OrderItem, Order, StockAdjustment, PurchaseItem, Purchase
-from optika.services import move_out_stock_by_order, initialize_stock_by_product, move_in_stock_by_purchasing
+from rest_framework.validators import UniqueValidator
+
+from optika.models import Product, Customer, StockMovement, OrderItem, Order, StockAdjustment, PurchaseItem, Purchase, \
+    Task, StockMovementArchive, Location, ProductStock, LowStockChange, LowStockProduct, CustomerStats, OrderSummary, \
+    CustomerGroup, PriceRule, AuditLog, ProductBarcode, PurchaseReceipt, PurchaseReceiptItem
+from optika.services import move_out_stock_by_order, initialize_stock_by_product, move_in_stock_by_purchasing, \
+    InsufficientStock, transfer_stock, record_customer_order, record_order_summary, receive_purchase_items, OverReceipt
+from optika.audit import record_create, record_update, snapshot
+from optika.lookup import MAX_CODES
+from optika.low_stock import sync_low_stock
+from optika.metrics import ORDERS_CREATED, PURCHASES_CREATED
+from optika.pricing import get_effective_prices, refresh_effective_prices, schedule_price_refresh
+from optika.stock_cache import get_product, invalidate
+from optika.tasks import enqueue, get_job
 
 
 class UserLoginSerializer(serializers.Serializer):
@@ -17,26 +28,105 @@ class UserPreviewSerializer(serializers.ModelSerializer):
         fields = ['username', 'email', 'is_active']
 
 
+class PriceRulePreviewSerializer(serializers.ModelSerializer):
+    user = serializers.StringRelatedField(many=False)
+
+    class Meta:
+        model = PriceRule
+        fields = ['id', 'product', 'group', 'min_quantity', 'price', 'discount_percent', 'starts_at', 'ends_at',
+                  'is_active', 'user', 'created_at', 'updated_at']
+
+
+class PriceRuleCreateSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = PriceRule
+        fields = ['product', 'group', 'min_quantity', 'price', 'discount_percent', 'starts_at', 'ends_at', 'is_active']
+
+    def validate(self, attrs):
+        price = attrs.get('price', getattr(self.instance, 'price', None))
+        discount_percent = attrs.get('discount_percent', getattr(self.instance, 'discount_percent', None))
+        starts_at = attrs.get('starts_at', getattr(self.instance, 'starts_at', None))
+        ends_at = attrs.get('ends_at', getattr(self.instance, 'ends_at', None))
+
+        if (price is None) == (discount_percent is None):
+            raise serializers.ValidationError("Set either price or discount_percent.")
+
+        if discount_percent is not None and not 0 < discount_percent <= 100:
+            raise serializers.ValidationError({"discount_percent": ["Discount must be between 1 and 100."]})
+
+        if attrs.get('min_quantity', 1) < 1:
+            raise serializers.ValidationError({"min_quantity": ["Minimum quantity must be at least 1."]})
+
+        if starts_at and ends_at and ends_at <= starts_at:
+            raise serializers.ValidationError({"ends_at": ["End must be after start."]})
+
+        return attrs
+
+    @transaction.atomic
+    def create(self, validated_data):
+        rule = super().create(validated_data)
+        refresh_effective_prices([rule.product_id])
+        schedule_price_refresh(rule.user)
+
+        return rule
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        old_product_id = instance.product_id
+        rule = super().update(instance, validated_data)
+        refresh_effective_prices({old_product_id, rule.product_id})
+        schedule_price_refresh(rule.user)
+
+        return rule
+
+
+class LocationPreviewSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Location
+        fields = ['id', 'code', 'name', 'address', 'created_at', 'updated_at']
+
+
+class LocationCreateSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Location
+        fields = ['code', 'name', 'address']
+
+
 class ProductPreviewSerializer(serializers.ModelSerializer):
     user = serializers.StringRelatedField(many=False)
 
     class Meta:
         model = Product
-        fields = ['id', 'name', 'unit', 'stock', 'price', 'user', 'created_at', 'updated_at']
+        fields = ['id', 'sku', 'name', 'unit', 'stock', 'price', 'reorder_point', 'user', 'created_at', 'updated_at']
 
 
 class ProductDetailSerializer(serializers.ModelSerializer):
     user = UserPreviewSerializer(many=False)
+    average_cost = serializers.ReadOnlyField()
+    barcodes = serializers.SlugRelatedField(many=True, read_only=True, slug_field='barcode',
+                                            source='barcodes_by_product')
 
     class Meta:
         model = Product
-        fields = ['id', 'name', 'unit', 'stock', 'price', 'user', 'created_at', 'updated_at']
+        fields = ['id', 'sku', 'name', 'unit', 'stock', 'price', 'reorder_point', 'inventory_value', 'average_cost',
+                  'barcodes', 'user', 'created_at', 'updated_at']
 
 
 class ProductCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
-        fields = ['name', 'unit', 'stock', 'price']
+        fields = ['sku', 'name', 'unit', 'stock', 'price', 'reorder_point']
+        # Deleted products keep their SKU until they are purged.
+        extra_kwargs = {'sku': {'validators': [UniqueValidator(queryset=Product.all_objects.all())]}}
+
+    def validate_sku(self, value):
+        if value and ProductBarcode.objects.filter(barcode=value).exists():
+            raise serializers.ValidationError('A product barcode already uses this code.')
+
+        return value or None
 
     def validate_price(self, value):
         if value <= 0:
@@ -50,9 +140,11 @@ class ProductCreateSerializer(serializers.ModelSerializer):
 
         return value
 
+    @transaction.atomic
     def create(self, validated_data):
         product = super().create(validated_data)
         initialize_stock_by_product(product)
+        record_create(product, product.user)
 
         return product
 
@@ -60,7 +152,73 @@ class ProductCreateSerializer(serializers.ModelSerializer):
 class ProductUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
-        fields = ['name', 'unit', 'price']
+        fields = ['sku', 'name', 'unit', 'price', 'reorder_point']
+        extra_kwargs = {'sku': {'validators': [UniqueValidator(queryset=Product.all_objects.all())]}}
+
+    def validate_sku(self, value):
+        if value and ProductBarcode.objects.filter(barcode=value).exists():
+            raise serializers.ValidationError('A product barcode already uses this code.')
+
+        return value or None
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        before = snapshot(instance)
+        product = super().update(instance, validated_data)
+        invalidate([product.pk])
+        sync_low_stock([product.pk])
+        record_update(product, before)
+
+        if product.price != before['price']:
+            # Percentage rules follow the base price.
+            refresh_effective_prices([product.pk])
+
+        return product
+
+
+class CustomerGroupPreviewSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = CustomerGroup
+        fields = ['id', 'code', 'name', 'created_at', 'updated_at']
+
+
+class CustomerGroupCreateSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = CustomerGroup
+        fields = ['code', 'name']
+
+
+class ProductBarcodePreviewSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ProductBarcode
+        fields = ['id', 'barcode', 'created_at']
+
+
+class ProductBarcodeCreateSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ProductBarcode
+        fields = ['barcode']
+
+    def validate_barcode(self, value):
+        if Product.all_objects.filter(sku=value).exists():
+            raise serializers.ValidationError('A product already uses this code as its SKU.')
+
+        return value
+
+    @transaction.atomic
+    def create(self, validated_data):
+        barcode = super().create(validated_data)
+        # Cached lookups of the product are stamped with its version; the bump makes them resolve again.
+        invalidate([barcode.product_id])
+
+        return barcode
+
+
+class ProductLookupSerializer(serializers.Serializer):
+    codes = serializers.ListField(child=serializers.CharField(max_length=64), allow_empty=False,
+                                  max_length=MAX_CODES)
 
 
 class CustomerPreviewSerializer(serializers.ModelSerializer):
@@ -68,51 +226,86 @@ class CustomerPreviewSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Customer
-        fields = ['id', 'name', 'phone', 'email', 'address', 'user', 'created_at', 'updated_at']
+        fields = ['id', 'name', 'phone', 'email', 'address', 'group', 'user', 'created_at', 'updated_at']
+
+
+class CustomerStatsPreviewSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = CustomerStats
+        fields = ['order_count', 'total_spent', 'last_order_date']
 
 
 class CustomerDetailSerializer(serializers.ModelSerializer):
     user = UserPreviewSerializer(many=False)
+    stats = CustomerStatsPreviewSerializer(many=False)
 
     class Meta:
         model = Customer
-        fields = ['id', 'name', 'phone', 'email', 'address', 'user', 'created_at', 'updated_at']
+        fields = ['id', 'name', 'phone', 'email', 'address', 'group', 'user', 'stats', 'created_at', 'updated_at']
 
 
 class CustomerCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Customer
-        fields = ['name', 'phone', 'email', 'address']
+        fields = ['name', 'phone', 'email', 'address', 'group']
+
+    @transaction.atomic
+    def create(self, validated_data):
+        customer = super().create(validated_data)
+        record_create(customer, customer.user)
+
+        return customer
 
 
 class CustomerUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Customer
-        fields = ['name', 'phone', 'email', 'address']
+        fields = ['name', 'phone', 'email', 'address', 'group']
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        before = snapshot(instance)
+        instance = super().update(instance, validated_data)
+        OrderSummary.objects.filter(customer=instance).exclude(customer_name=instance.name).update(
+            customer_name=instance.name)
+        record_update(instance, before)
+
+        return instance
+
+
+class CachedProductField(serializers.PrimaryKeyRelatedField):
+    # Resolves the product from the stock cache instead of one SELECT per order line. The product only carries name
+    # and price; stock is checked by the conditional UPDATE in move_out_stock_by_order, never against a cached copy.
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+        try:
+            return get_product(int(data))
+        except Product.DoesNotExist:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
 
 
 class OrderItemCreateSerializer(serializers.ModelSerializer):
+    product = CachedProductField(queryset=Product.objects.all())
 
     class Meta:
         model = OrderItem
         fields = ['product', 'quantity', 'price', 'subtotal']
 
     def validate(self, attrs):
-        product = attrs['product']
         quantity = attrs['quantity']
         price = attrs['price']
         subtotal = attrs['subtotal']
 
-        if product.stock < quantity:
-            raise serializers.ValidationError({"quantity": [
-                f"Quantity {quantity} large than product stock {product.stock}."]})
-
-        if product.price != price:
-            raise serializers.ValidationError({"price": [f"Invalid price {price}."]})
-
-        if product.price * quantity != subtotal:
+        if price * quantity != subtotal:
             raise serializers.ValidationError({"quantity": [f"Invalid subtotal {subtotal}."]})
 
+        # The price itself depends on the customer and is checked for all lines at once by OrderCreateSerializer.
         return attrs
 
 
@@ -121,7 +314,7 @@ class OrderItemPreviewSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = OrderItem
-        fields = ['product', 'quantity', 'price', 'subtotal', 'created_at', 'updated_at']
+        fields = ['product', 'quantity', 'price', 'subtotal', 'cogs', 'created_at', 'updated_at']
 
 
 class OrderPreviewSerializer(serializers.ModelSerializer):
@@ -134,12 +327,30 @@ class OrderPreviewSerializer(serializers.ModelSerializer):
                   'updated_at']
 
 
+class OrderSummaryPreviewSerializer(serializers.ModelSerializer):
+    customer = serializers.CharField(source='customer_name')
+    user = serializers.CharField(source='user_name')
+
+    class Meta:
+        model = OrderSummary
+        fields = ['order_number', 'date', 'customer', 'item_count', 'products', 'total', 'paid_amount',
+                  'change_amount', 'user', 'created_at', 'updated_at']
+
+
+class CustomerOrderPreviewSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Order
+        fields = ['order_number', 'date', 'total', 'paid_amount', 'change_amount', 'created_at']
+
+
 class OrderCreateSerializer(serializers.ModelSerializer):
     order_items = OrderItemCreateSerializer(many=True)
 
     class Meta:
         model = Order
-        fields = ['order_number', 'date', 'customer', 'total', 'paid_amount', 'change_amount', 'order_items']
+        fields = ['order_number', 'date', 'customer', 'total', 'paid_amount', 'change_amount', 'location',
+                  'order_items']
 
     def validate(self, attrs):
         order_items = attrs['order_items']
@@ -154,6 +365,18 @@ class OrderCreateSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError({"product": [f"Duplicate {product.name} product in order."]})
             seen.add(product.id)
 
+        # Base prices are read from the database here, not from the stock cache, which may lag in other workers.
+        prices = get_effective_prices({item['product'].id: item['quantity'] for item in order_items},
+                                      attrs['customer'].group_id)
+        for item in order_items:
+            product = item['product']
+            if product.id not in prices:
+                raise serializers.ValidationError({"product": [f"Product {product.id} does not exist."]})
+
+            if item['price'] != prices[product.id]:
+                raise serializers.ValidationError({"price": [
+                    f"Invalid price {item['price']} for {product.name}, expected {prices[product.id]}."]})
+
         calculated_total = sum([order_item['subtotal'] for order_item in order_items])
 
         if calculated_total != total:
@@ -178,7 +401,16 @@ class OrderCreateSerializer(serializers.ModelSerializer):
 
         order_items = OrderItem.objects.bulk_create(items)
 
-        move_out_stock_by_order(order, order_items)
+        try:
+            move_out_stock_by_order(order, order_items)
+        except InsufficientStock as exc:
+            raise serializers.ValidationError({"quantity": [
+                f"Quantity large than product stock {stock} for product {pk}." for pk, stock in exc.stocks.items()]})
+
+        record_customer_order(order)
+        record_order_summary(order, order_items)
+        record_create(order, order.user)
+        ORDERS_CREATED.inc_on_commit()
 
         return order
 
@@ -187,18 +419,19 @@ class OrderDetailingSerializer(serializers.ModelSerializer):
     order_items = OrderItemPreviewSerializer(many=True, source='order_items_by_order')
     user = serializers.StringRelatedField(many=False, source='user.email')
     customer = CustomerPreviewSerializer(many=False)
+    location = serializers.StringRelatedField(many=False)
 
     class Meta:
         model = Order
-        fields = ['order_number', 'date', 'customer', 'total', 'paid_amount', 'change_amount', 'user', 'created_at',
-                  'updated_at', 'order_items']
+        fields = ['order_number', 'date', 'customer', 'total', 'paid_amount', 'change_amount', 'location', 'user',
+                  'created_at', 'updated_at', 'order_items']
 
 
 class PurchaseItemCreateSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = PurchaseItem
-        fields = ['product', 'quantity',]
+        fields = ['product', 'quantity', 'unit_cost']
 
     def validate(self, attrs):
         quantity = attrs['quantity']
@@ -214,7 +447,8 @@ class PurchaseItemPreviewSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = PurchaseItem
-        fields = ['product', 'quantity', 'created_at', 'updated_at']
+        fields = ['id', 'product', 'quantity', 'received_quantity', 'outstanding_quantity', 'unit_cost', 'created_at',
+                  'updated_at']
 
 
 class PurchasePreviewSerializer(serializers.ModelSerializer):
@@ -222,15 +456,17 @@ class PurchasePreviewSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Purchase
-        fields = ['purchase_number', 'date', 'user', 'created_at', 'updated_at']
+        fields = ['purchase_number', 'date', 'status', 'user', 'created_at', 'updated_at']
 
 
 class PurchaseCreateSerializer(serializers.ModelSerializer):
     purchase_items = PurchaseItemCreateSerializer(many=True)
+    # Off for a purchase order whose goods arrive later through purchase receipts.
+    receive = serializers.BooleanField(default=True, write_only=True)
 
     class Meta:
         model = Purchase
-        fields = ['purchase_number', 'date', 'purchase_items']
+        fields = ['purchase_number', 'date', 'location', 'receive', 'purchase_items']
 
     def validate(self, attrs):
         purchase_items = attrs['purchase_items']
@@ -250,24 +486,122 @@ class PurchaseCreateSerializer(serializers.ModelSerializer):
     @transaction.atomic
     def create(self, validated_data):
         purchase_items = validated_data.pop('purchase_items')
-        purchase = Purchase.objects.create(**validated_data)
+        receive = validated_data.pop('receive')
+        purchase = Purchase.objects.create(status=Purchase.RECEIVED if receive else Purchase.ORDERED, **validated_data)
 
-        items = [PurchaseItem(purchase=purchase, **item) for item in purchase_items]
+        items = [PurchaseItem(purchase=purchase, received_quantity=item['quantity'] if receive else 0,
+                              outstanding_quantity=0 if receive else item['quantity'], **item)
+                 for item in purchase_items]
 
         purchase_items = PurchaseItem.objects.bulk_create(items)
 
-        move_in_stock_by_purchasing(purchase, purchase_items)
+        if receive:
+            move_in_stock_by_purchasing(purchase, purchase_items)
+        record_create(purchase, purchase.user)
+        PURCHASES_CREATED.inc_on_commit()
 
         return purchase
 
 
 class PurchaseDetailSerializer(serializers.ModelSerializer):
-    purchase_items = PurchaseItemPreviewSerializer(many=True, source='purchase_items_by_purchase')
+    purchase_items = PurchaseItemPreviewSerializer(many=True, source='purchase_items_by_order')
     user = serializers.StringRelatedField(many=False, source='user.email')
+    location = serializers.StringRelatedField(many=False)
 
     class Meta:
         model = Purchase
-        fields = ['purchase_number', 'date', 'user', 'purchase_items', 'created_at', 'updated_at']
+        fields = ['purchase_number', 'date', 'status', 'location', 'user', 'purchase_items', 'created_at',
+                  'updated_at']
+
+
+class PurchaseReceiptItemCreateSerializer(serializers.Serializer):
+    # A plain id: the whole receipt is checked against the outstanding quantities in one query.
+    purchase_item = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
+
+
+class PurchaseReceiptItemPreviewSerializer(serializers.ModelSerializer):
+    purchase_number = serializers.CharField(source='purchase_item.purchase.purchase_number')
+    product = serializers.StringRelatedField(source='purchase_item.product')
+
+    class Meta:
+        model = PurchaseReceiptItem
+        fields = ['purchase_item', 'purchase_number', 'product', 'quantity']
+
+
+class PurchaseReceiptPreviewSerializer(serializers.ModelSerializer):
+    user = serializers.StringRelatedField(many=False)
+
+    class Meta:
+        model = PurchaseReceipt
+        fields = ['receipt_number', 'date', 'note', 'user', 'created_at', 'updated_at']
+
+
+class PurchaseReceiptDetailSerializer(serializers.ModelSerializer):
+    receipt_items = PurchaseReceiptItemPreviewSerializer(many=True, source='receipt_items_by_receipt')
+    user = serializers.StringRelatedField(many=False, source='user.email')
+
+    class Meta:
+        model = PurchaseReceipt
+        fields = ['receipt_number', 'date', 'note', 'user', 'receipt_items', 'created_at', 'updated_at']
+
+
+class PurchaseReceiptCreateSerializer(serializers.ModelSerializer):
+    receipt_items = PurchaseReceiptItemCreateSerializer(many=True)
+
+    class Meta:
+        model = PurchaseReceipt
+        fields = ['receipt_number', 'date', 'note', 'receipt_items']
+
+    def validate(self, attrs):
+        receipt_items = attrs['receipt_items']
+
+        if not receipt_items:
+            raise serializers.ValidationError({"receipt_items": ["Receipt item is empty."]})
+
+        quantities = {}
+        for item in receipt_items:
+            if item['purchase_item'] in quantities:
+                raise serializers.ValidationError(
+                    {"purchase_item": [f"Duplicate purchase item {item['purchase_item']} in receipt."]})
+            quantities[item['purchase_item']] = item['quantity']
+
+        # Pre-check only; receive_purchase_items() guards the outstanding quantities again under the UPDATE.
+        outstanding = dict(PurchaseItem.objects.filter(id__in=quantities.keys())
+                           .values_list('id', 'outstanding_quantity'))
+
+        unknown = [pk for pk in quantities if pk not in outstanding]
+        if unknown:
+            raise serializers.ValidationError({"purchase_item": [f"Purchase item {pk} does not exist."
+                                                                 for pk in unknown]})
+
+        over = {pk: outstanding[pk] for pk, quantity in quantities.items() if quantity > outstanding[pk]}
+        if over:
+            raise serializers.ValidationError({"quantity": [
+                f"Quantity large than outstanding quantity {left} for purchase item {pk}."
+                for pk, left in over.items()]})
+
+        attrs['quantities'] = quantities
+
+        return attrs
+
+    @transaction.atomic
+    def create(self, validated_data):
+        quantities = validated_data.pop('quantities')
+        validated_data.pop('receipt_items')
+        receipt = PurchaseReceipt.objects.create(**validated_data)
+
+        try:
+            receive_purchase_items(receipt, quantities)
+        except OverReceipt as exc:
+            raise serializers.ValidationError({"quantity": [
+                f"Quantity large than outstanding quantity {left} for purchase item {pk}."
+                for pk, left in exc.outstanding.items()]})
+        except InsufficientStock as exc:
+            # Only possible when a product row is gone altogether; never let it surface as a server error.
+            raise serializers.ValidationError({"product": [f"Product {pk} does not exist." for pk in exc.stocks]})
+
+        return receipt
 
 
 class StockMovementPreviewSerializer(serializers.ModelSerializer):
@@ -290,6 +624,84 @@ class StockMovementDetailSerializer(serializers.ModelSerializer):
                   'updated_at']
 
 
+class ProductStockPreviewSerializer(serializers.ModelSerializer):
+    name = serializers.CharField(source='product.name')
+    unit = serializers.CharField(source='product.unit')
+
+    class Meta:
+        model = ProductStock
+        fields = ['product', 'name', 'unit', 'stock', 'updated_at']
+
+
+class LowStockProductPreviewSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='product.id')
+    sku = serializers.CharField(source='product.sku')
+    name = serializers.CharField(source='product.name')
+    stock = serializers.IntegerField(source='product.stock')
+    reorder_point = serializers.IntegerField(source='product.reorder_point')
+
+    class Meta:
+        model = LowStockProduct
+        fields = ['id', 'sku', 'name', 'stock', 'reorder_point', 'created_at']
+
+
+class LowStockChangePreviewSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = LowStockChange
+        fields = ['id', 'product', 'is_low', 'stock', 'reorder_point', 'created_at']
+
+
+class TransferItemCreateSerializer(serializers.Serializer):
+    product = serializers.PrimaryKeyRelatedField(queryset=Product.objects.all())
+    quantity = serializers.IntegerField(min_value=1)
+
+
+class TransferCreateSerializer(serializers.Serializer):
+    transfer_number = serializers.CharField(max_length=100)
+    from_location = serializers.PrimaryKeyRelatedField(queryset=Location.objects.all())
+    to_location = serializers.PrimaryKeyRelatedField(queryset=Location.objects.all())
+    transfer_items = TransferItemCreateSerializer(many=True)
+
+    def validate(self, attrs):
+        transfer_items = attrs['transfer_items']
+
+        if attrs['from_location'] == attrs['to_location']:
+            raise serializers.ValidationError({"to_location": ["Destination must differ from the source location."]})
+
+        if not transfer_items:
+            raise serializers.ValidationError({"transfer_items": ["Transfer item is empty."]})
+
+        seen = set()
+        for item in transfer_items:
+            product = item['product']
+            if product.id in seen:
+                raise serializers.ValidationError({"product": [f"Duplicate {product.name} product in transfer."]})
+            seen.add(product.id)
+
+        return attrs
+
+    def create(self, validated_data):
+        items = [(item['product'], item['quantity']) for item in validated_data['transfer_items']]
+
+        try:
+            return transfer_stock(validated_data['transfer_number'], validated_data['from_location'],
+                                  validated_data['to_location'], items, validated_data['user'])
+        except InsufficientStock as exc:
+            raise serializers.ValidationError({"quantity": [
+                f"Quantity large than location stock {stock} for product {pk}." for pk, stock in exc.stocks.items()]})
+
+
+class StockMovementArchivePreviewSerializer(serializers.ModelSerializer):
+    product = serializers.StringRelatedField()
+    user = serializers.StringRelatedField()
+
+    class Meta:
+        model = StockMovementArchive
+        fields = ['original_id', 'product', 'movement_type', 'quantity', 'source_doc', 'note', 'date', 'user',
+                  'created_at', 'updated_at', 'archived_at']
+
+
 class StockAdjustmentCreateSerializer(serializers.ModelSerializer):
 
     class Meta:
@@ -312,3 +724,71 @@ class StockAdjustmentDetailSerializer(serializers.ModelSerializer):
         # initialize_stock_by_product(product)
         return stock_adjustment
 
+
+class TaskPreviewSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Task
+        fields = ['id', 'name', 'kwargs', 'status', 'attempts', 'max_attempts', 'run_after', 'result', 'error',
+                  'created_at', 'updated_at']
+
+
+class TaskCreateSerializer(serializers.ModelSerializer):
+    kwargs = serializers.DictField(required=False, default=dict)
+
+    class Meta:
+        model = Task
+        fields = ['name', 'kwargs']
+
+    def validate_name(self, value):
+        try:
+            func = get_job(value)
+        except KeyError:
+            raise serializers.ValidationError(f'Unknown task {value}.')
+
+        if func.staff_only and not self.context['request'].user.is_staff:
+            raise serializers.ValidationError(f'Task {value} is restricted to staff.')
+
+        return value
+
+    def validate(self, attrs):
+        func = get_job(attrs['name'])
+        kwargs = attrs['kwargs']
+
+        if func.params is None:
+            if kwargs:
+                raise serializers.ValidationError({"kwargs": [f"Task {attrs['name']} takes no arguments."]})
+            return attrs
+
+        params = func.params(data=kwargs, context=self.context)
+        unknown = sorted(set(kwargs) - set(params.fields))
+        if unknown:
+            raise serializers.ValidationError({"kwargs": [f"Unknown argument {name}." for name in unknown]})
+
+        if not params.is_valid():
+            raise serializers.ValidationError({"kwargs": params.errors})
+
+        # The representation, so dates and the like are stored as JSON.
+        attrs['kwargs'] = params.data
+        return attrs
+
+    def create(self, validated_data):
+        return enqueue(validated_data['name'], validated_data['user'], validated_data['kwargs'])
+
+
+class AuditLogPreviewSerializer(serializers.ModelSerializer):
+    user = serializers.StringRelatedField(many=False)
+
+    class Meta:
+        model = AuditLog
+        fields = ['id', 'model', 'object_id', 'action', 'changes', 'user', 'created_at']
+
+
+class PriceQuoteItemSerializer(serializers.Serializer):
+    product = CachedProductField(queryset=Product.objects.all())
+    quantity = serializers.IntegerField(min_value=1)
+
+
+class PriceQuoteSerializer(serializers.Serializer):
+    customer = serializers.PrimaryKeyRelatedField(queryset=Customer.objects.all(), required=False, allow_null=True)
+    items = PriceQuoteItemSerializer(many=True)
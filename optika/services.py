@@ -1,48 +1,312 @@
-from django.db.models import Sum, Case, When, IntegerField, F
+import random
+import time
+
+from django.conf import settings
+from django.db import OperationalError, transaction
+from django.db.models import Sum, Case, When, IntegerField, F, Value, Exists, OuterRef
+from django.db.models.functions import Coalesce, Greatest
 from django.utils import timezone
 
-from optika.models import StockMovement, Product
+from optika.audit import record_update, snapshot
+from optika.metrics import STOCK_MOVEMENTS
+from optika.models import StockMovement, Product, StockChangeEvent, Location, ProductStock, CustomerStats, \
+    OrderSummary, OrderItem, PurchaseItem, Purchase, PurchaseReceiptItem
+from optika.low_stock import record_stock_crossings, sync_low_stock
+from optika.stock_cache import invalidate
+from optika.valuation import receive_stock, issue_stock
+
+
+class InsufficientStock(Exception):
+    def __init__(self, stocks):
+        # Product id -> stock left, for every product that could not cover its quantity.
+        self.stocks = stocks
+        super().__init__(f'Insufficient stock for products {sorted(stocks)}.')
+
+
+class OverReceipt(Exception):
+    def __init__(self, outstanding):
+        # Purchase item id -> quantity still outstanding, for every item the receipt would receive beyond its order.
+        self.outstanding = outstanding
+        super().__init__(f'Received more than ordered for purchase items {sorted(outstanding)}.')
+
+
+# MySQL deadlock / lock wait timeout, and the SQLSTATEs of PostgreSQL serialization failures and deadlocks.
+RETRYABLE_MYSQL_ERRORS = (1205, 1213)
+RETRYABLE_SQLSTATES = ('40001', '40P01')
+
+
+def is_retryable(exc):
+    """Whether ``exc`` rolled back a transaction that can simply run again (deadlock, lock timeout, busy SQLite)."""
+    if not isinstance(exc, OperationalError):
+        return False
+
+    cause = exc.__cause__
+    sqlstate = getattr(cause, 'sqlstate', None) or getattr(cause, 'pgcode', None)
+
+    return (bool(exc.args) and exc.args[0] in RETRYABLE_MYSQL_ERRORS) or sqlstate in RETRYABLE_SQLSTATES \
+        or 'database is locked' in str(exc)
+
+
+def run_with_retries(func, attempts=3, backoff=0.05, on_retry=None):
+    """
+    Call ``func``, which runs its own transaction, and call it again when the database rolled that transaction back
+    on a deadlock or serialization failure, with jittered exponential backoff.
+
+    Outside a transaction only: inside one, the rollback already spoiled the caller's transaction, so the error is
+    raised as is.
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            return func()
+        except OperationalError as exc:
+            if attempt == attempts or not is_retryable(exc) or transaction.get_connection().in_atomic_block:
+                raise
+
+            if on_retry is not None:
+                on_retry(exc)
+
+            time.sleep(backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+
+
+_default_location = None
+
+
+def get_default_location():
+    global _default_location
+
+    if _default_location is None:
+        _default_location, _ = Location.objects.get_or_create(code=settings.OPTIKA_DEFAULT_LOCATION,
+                                                               defaults={'name': settings.OPTIKA_DEFAULT_LOCATION})
+
+    return _default_location
+
+
+def signed_quantity(prefix=''):
+    return Case(
+        When(**{f'{prefix}movement_type': StockMovement.INIT}, then=F(f'{prefix}quantity')),
+        When(**{f'{prefix}movement_type': StockMovement.IN}, then=F(f'{prefix}quantity')),
+        When(**{f'{prefix}movement_type': StockMovement.OUT}, then=-1 * F(f'{prefix}quantity')),
+        When(**{f'{prefix}movement_type': StockMovement.ADJUSTMENT}, then=F(f'{prefix}quantity')),
+        When(**{f'{prefix}movement_type': StockMovement.OPENING}, then=F(f'{prefix}quantity')),
+        When(**{f'{prefix}movement_type': StockMovement.TRANSFER_IN}, then=F(f'{prefix}quantity')),
+        When(**{f'{prefix}movement_type': StockMovement.TRANSFER_OUT}, then=-1 * F(f'{prefix}quantity')),
+        output_field=IntegerField()
+    )
 
 
 def calculate_current_stock(product):
     queryset = StockMovement.objects.filter(product=product)
 
-    aggregation = queryset.aggregate(
-        stock=(
-            Sum(
-                Case(
-                    When(movement_type=StockMovement.INIT, then='quantity'),
-                    When(movement_type=StockMovement.IN, then='quantity'),
-                    When(movement_type=StockMovement.OUT, then=-1 * F('quantity')),
-                    When(movement_type=StockMovement.ADJUSTMENT, then='quantity'),
-                    output_field=IntegerField()
-                )
-            )
-        )
-    )
+    aggregation = queryset.aggregate(stock=Sum(signed_quantity()))
 
     return aggregation['stock'] or 0
 
 
-def initialize_stock_by_product(product):
-    movement_type = StockMovement.INIT
-    quantity = product.stock
-    source_doc = 'Initial Stock'
+def _stock_mismatches(products):
+    return products.annotate(
+        ledger_stock=Coalesce(Sum(signed_quantity('stock_movements_by_product__')), 0)
+    ).exclude(stock=F('ledger_stock')).order_by('id')
+
+
+def _location_mismatches(product_ids=None):
+    """
+    Per-location balances in ProductStock that disagree with the ledger of their location, as ``{product id:
+    [{location, stock, ledger_stock}]}`` in two grouped queries. Movements without a location count for the default one.
+    """
+    movements = StockMovement.objects.all()
+    balances = ProductStock.objects.all()
+    if product_ids is not None:
+        movements = movements.filter(product_id__in=product_ids)
+        balances = balances.filter(product_id__in=product_ids)
+
+    default_id = get_default_location().id
+    ledger = {}
+    for pk, location_id, stock in movements.order_by().values('product_id', 'location_id') \
+            .annotate(stock=Sum(signed_quantity())).values_list('product_id', 'location_id', 'stock'):
+        key = (pk, location_id or default_id)
+        ledger[key] = ledger.get(key, 0) + (stock or 0)
+
+    stocks = {(pk, location_id): stock for pk, location_id, stock
+              in balances.values_list('product_id', 'location_id', 'stock')}
+
+    mismatches = {}
+    for pk, location_id in sorted(ledger.keys() | stocks.keys()):
+        stock, ledger_stock = stocks.get((pk, location_id), 0), ledger.get((pk, location_id), 0)
+        if stock != ledger_stock:
+            mismatches.setdefault(pk, []).append({'location': location_id, 'stock': stock,
+                                                  'ledger_stock': ledger_stock})
+
+    return mismatches
+
+
+def _reconcile_report(product_ids=None):
+    products = Product.all_objects.all() if product_ids is None else Product.all_objects.filter(id__in=product_ids)
+    totals = {product.id: (product.stock, product.ledger_stock) for product in _stock_mismatches(products)}
+    locations = _location_mismatches(product_ids)
+
+    # A product whose total agrees with the ledger can still have its stock booked at the wrong location.
+    for pk, stock in Product.all_objects.filter(id__in=locations.keys() - totals.keys()).values_list('id', 'stock'):
+        totals[pk] = (stock, stock)
+
+    return [{'product': pk, 'stock': stock, 'ledger_stock': ledger_stock, 'locations': locations.get(pk, [])}
+            for pk, (stock, ledger_stock) in sorted(totals.items())]
+
+
+@transaction.atomic
+def reconcile_stock(fix=False):
+    """
+    Compare Product.stock and the per-location balances in ProductStock with the ledger for every product and return
+    the mismatches. With ``fix`` the ledger wins and both are overwritten.
+    """
+    mismatches = _reconcile_report()
+
+    if fix and mismatches:
+        # Lock only the mismatching rows, then re-read them so a concurrent order cannot slip in between. Stock moves
+        # lock the product before its location balance, so holding the products covers both.
+        ids = list(Product.all_objects.select_for_update().filter(id__in=[row['product'] for row in mismatches])
+                   .values_list('id', flat=True))
+        mismatches = _reconcile_report(ids)
+
+        totals = [row for row in mismatches if row['stock'] != row['ledger_stock']]
+        events = [StockChangeEvent(product_id=row['product'], movement_type=StockMovement.ADJUSTMENT,
+                                   quantity=row['ledger_stock'] - row['stock'], stock=row['ledger_stock'],
+                                   source_doc='Reconciliation')
+                  for row in totals]
+
+        if totals:
+            Product.all_objects.filter(id__in=[row['product'] for row in totals]).update(
+                stock=_quantity_case({row['product']: row['ledger_stock'] for row in totals}),
+                updated_at=timezone.now())
+
+        by_location = {}
+        for row in mismatches:
+            for balance in row['locations']:
+                by_location.setdefault(balance['location'], {})[row['product']] = balance['ledger_stock']
+
+        now = timezone.now()
+        for location_id, stocks in by_location.items():
+            ProductStock.objects.bulk_create([ProductStock(product_id=pk, location_id=location_id) for pk in stocks],
+                                             ignore_conflicts=True)
+            ProductStock.objects.filter(location_id=location_id, product_id__in=stocks.keys()).update(
+                stock=_quantity_case(stocks, 'product_id'), updated_at=now)
+
+        StockChangeEvent.objects.bulk_create(events)
+        sync_low_stock(ids)
+        invalidate(ids)
+
+    return mismatches
+
+
+def record_stock_change_events(stock_movements):
+    # Must run inside the transaction that changed the stock so the outbox never disagrees with Product.stock.
+    events = [StockChangeEvent(product=stock_movement.product, movement_type=stock_movement.movement_type,
+                               quantity=stock_movement.quantity, stock=stock_movement.product.stock,
+                               source_doc=stock_movement.source_doc, location=stock_movement.location)
+              for stock_movement in stock_movements]
+
+    StockChangeEvent.objects.bulk_create(events)
+
+    counts = {}
+    for stock_movement in stock_movements:
+        counts[stock_movement.movement_type] = counts.get(stock_movement.movement_type, 0) + 1
+    for movement_type, count in counts.items():
+        STOCK_MOVEMENTS.inc_on_commit(movement_type, amount=count)
+
+
+def initialize_stock_by_products(products, location=None):
+    """Write the INIT movement, location balance and outbox event of freshly created products in bulk."""
+    location = location or get_default_location()
     date = timezone.now()
-    user = product.user
-    note = f'Initial stock of product {product.name}'
 
-    StockMovement.objects.create(product=product, movement_type=movement_type, quantity=quantity, source_doc=source_doc,
-                                 date=date, note=note, user=user)
+    ProductStock.objects.bulk_create([
+        ProductStock(product=product, location=location, stock=product.stock) for product in products
+    ])
+    stock_movement_list = StockMovement.objects.bulk_create([
+        StockMovement(product=product, movement_type=StockMovement.INIT, quantity=product.stock,
+                      source_doc='Initial Stock', date=date, note=f'Initial stock of product {product.name}',
+                      user=product.user, location=location)
+        for product in products
+    ])
+    record_stock_change_events(stock_movement_list)
+    # Initial stock has no purchase cost; it enters valuation as a zero-cost layer.
+    receive_stock((product.id, product.stock, 0, None) for product in products)
+    sync_low_stock(product.id for product in products)
+
+
+def initialize_stock_by_product(product, location=None):
+    initialize_stock_by_products([product], location)
+
+
+def _quantity_case(quantities, field='id'):
+    return Case(*[When(**{field: pk}, then=Value(quantity)) for pk, quantity in quantities.items()],
+                output_field=IntegerField())
+
+
+def _move_location_stock(quantities, sign, location):
+    """Same as _move_stock() for the per-location balances in ProductStock; missing balance rows count as 0."""
+    delta = _quantity_case(quantities, 'product_id')
+    product_stocks = ProductStock.objects.filter(location=location, product_id__in=quantities.keys())
+    now = timezone.now()
+
+    if sign < 0:
+        updated = product_stocks.filter(stock__gte=delta).update(stock=F('stock') - delta, updated_at=now)
+
+        if updated != len(quantities):
+            stocks = dict(product_stocks.values_list('product_id', 'stock'))
+            raise InsufficientStock({pk: stocks.get(pk, 0) for pk, quantity in quantities.items()
+                                     if stocks.get(pk, 0) < quantity})
+    else:
+        ProductStock.objects.bulk_create([ProductStock(product_id=pk, location=location) for pk in quantities],
+                                         ignore_conflicts=True)
+        product_stocks.update(stock=F('stock') + delta, updated_at=now)
+
+
+def _move_stock(quantities, sign, location):
+    """
+    Apply ``sign * quantity`` to every product in one conditional UPDATE and return the new stock per product id.
+
+    Stock is changed relative to the row value in the database, never from the in-memory product, so concurrent orders
+    cannot overwrite each other. Outgoing moves only touch rows that still have enough stock; if any row is missing
+    from the update, InsufficientStock is raised and the caller's transaction rolls back. The location balance is
+    moved the same way right after the product total, so locks are always taken in the same order.
+
+    Soft-deleted products are included: they keep their stock and value, and open purchases may still deliver them.
+    Checkout rejects them during validation, before any stock moves.
+    """
+    delta = _quantity_case(quantities)
+    products = Product.all_objects.filter(id__in=quantities.keys())
+    # updated_at moves with the stock so /products/changes/ and catalog snapshots hand the new stock to terminals.
+    now = timezone.now()
+
+    if sign < 0:
+        updated = products.filter(stock__gte=delta).update(stock=F('stock') - delta, updated_at=now)
+    else:
+        updated = products.update(stock=F('stock') + delta, updated_at=now)
+
+    rows = list(Product.all_objects.filter(id__in=quantities.keys()).values_list('id', 'stock', 'reorder_point'))
+    reorder_points = {pk: reorder_point for pk, _, reorder_point in rows}
+    stocks = {pk: stock for pk, stock, _ in rows}
+
+    if updated != len(quantities):
+        raise InsufficientStock({pk: stocks.get(pk, 0) for pk, quantity in quantities.items()
+                                 if stocks.get(pk, 0) < quantity})
+
+    _move_location_stock(quantities, sign, location)
+    record_stock_crossings((pk, stock - sign * quantities[pk], stock, reorder_points[pk])
+                           for pk, stock in stocks.items())
+    invalidate(quantities.keys())
+
+    return stocks
 
 
 def move_out_stock_by_order(order, order_items):
     stock_movement_list = []
-    products_to_update = []
+    quantities = {}
     date = timezone.now()
     source_doc = order.order_number
     note = f'Order Number #{source_doc}'
     user = order.user
+    location = order.location or get_default_location()
     movement_type = StockMovement.OUT
 
     for order_item in order_items:
@@ -50,22 +314,33 @@ def move_out_stock_by_order(order, order_items):
         quantity = order_item.quantity
 
         stock_movement_list.append(StockMovement(product=product, movement_type=movement_type, source_doc=source_doc,
-                                                 date=date, note=note, user=user, quantity=quantity))
+                                                 date=date, note=note, user=user, quantity=quantity,
+                                                 location=location))
+
+        quantities[product.id] = quantity
 
-        product.stock = product.stock - quantity
-        products_to_update.append(product)
+    stocks = _move_stock(quantities, -1, location)
+    for stock_movement in stock_movement_list:
+        stock_movement.product.stock = stocks[stock_movement.product.id]
 
     StockMovement.objects.bulk_create(stock_movement_list)
-    Product.objects.bulk_update(products_to_update, ['stock'])
+    record_stock_change_events(stock_movement_list)
+
+    costs = issue_stock(quantities)
+    for order_item in order_items:
+        order_item.cogs = costs[order_item.product.id]
+    # Matched on (order, product), which is unique, because bulk_create() leaves the item ids unset on MySQL.
+    OrderItem.objects.filter(order=order).update(cogs=_quantity_case(costs, 'product_id'))
 
 
 def move_in_stock_by_purchasing(purchase, purchase_items):
     stock_movement_list = []
-    products_to_update = []
+    quantities = {}
     date = timezone.now()
     source_doc = purchase.purchase_number
     note = f'Purchase Number #{source_doc}'
     user = purchase.user
+    location = purchase.location or get_default_location()
     movement_type = StockMovement.IN
 
     for purchase_item in purchase_items:
@@ -73,13 +348,180 @@ def move_in_stock_by_purchasing(purchase, purchase_items):
         quantity = purchase_item.quantity
 
         stock_movement_list.append(StockMovement(product=product, movement_type=movement_type, source_doc=source_doc,
-                                                 date=date, note=note, user=user, quantity=quantity))
+                                                 date=date, note=note, user=user, quantity=quantity,
+                                                 location=location))
+
+        quantities[product.id] = quantity
 
-        product.stock = product.stock + quantity
-        products_to_update.append(product)
+    stocks = _move_stock(quantities, 1, location)
+    for stock_movement in stock_movement_list:
+        stock_movement.product.stock = stocks[stock_movement.product.id]
 
     StockMovement.objects.bulk_create(stock_movement_list)
-    Product.objects.bulk_update(products_to_update, ['stock'])
+    record_stock_change_events(stock_movement_list)
+
+    # Same as above: the purchase item ids are looked up by (purchase, product) instead of relying on bulk_create().
+    item_ids = dict(PurchaseItem.objects.filter(purchase=purchase).values_list('product_id', 'id'))
+    receive_stock((item.product.id, item.quantity, item.unit_cost, item_ids.get(item.product.id))
+                  for item in purchase_items)
+
+
+def receive_purchase_items(receipt, quantities):
+    """
+    Post ``quantities`` (purchase item id -> quantity) of ``receipt``, which may span many purchases.
+
+    The outstanding quantities go down in one conditional UPDATE that only touches items with enough left on order, the
+    same way _move_stock() guards stock; if any item is missing from the update, OverReceipt is raised and the caller's
+    transaction rolls back. Stock then moves in with one UPDATE per location and the movements, cost layers and
+    purchase statuses are written in bulk. Items of products deleted since they were ordered are received like any
+    other: the goods still arrive. The quantity and status changes land in the audit trail under the receipt's user.
+    """
+    delta = _quantity_case(quantities)
+    purchase_items = PurchaseItem.objects.filter(id__in=quantities.keys())
+    updated = purchase_items.filter(outstanding_quantity__gte=delta).update(
+        outstanding_quantity=F('outstanding_quantity') - delta,
+        received_quantity=F('received_quantity') + delta,
+        updated_at=timezone.now(),
+    )
+
+    if updated != len(quantities):
+        outstanding = dict(purchase_items.values_list('id', 'outstanding_quantity'))
+        raise OverReceipt({pk: outstanding.get(pk, 0) for pk, quantity in quantities.items()
+                           if outstanding.get(pk, 0) < quantity})
+
+    purchase_items = list(purchase_items.select_related('purchase__location', 'product').order_by('id'))
+    date = timezone.now()
+    by_location = {}
+
+    for purchase_item in purchase_items:
+        location = purchase_item.purchase.location or get_default_location()
+        by_location.setdefault(location, []).append(purchase_item)
+
+    stock_movement_list = []
+    for location, location_items in by_location.items():
+        location_quantities = {}
+        for purchase_item in location_items:
+            location_quantities[purchase_item.product_id] = (location_quantities.get(purchase_item.product_id, 0)
+                                                             + quantities[purchase_item.id])
+
+        stocks = _move_stock(location_quantities, 1, location)
+
+        # Every movement carries the stock right after it, also when one product arrives for several purchases.
+        running = {pk: stocks[pk] - quantity for pk, quantity in location_quantities.items()}
+        for purchase_item in location_items:
+            product = purchase_item.product
+            running[product.id] += quantities[purchase_item.id]
+            product.stock = running[product.id]
+
+            purchase_number = purchase_item.purchase.purchase_number
+            stock_movement_list.append(StockMovement(
+                product=product, movement_type=StockMovement.IN, source_doc=purchase_number, date=date,
+                note=f'Receipt #{receipt.receipt_number} for Purchase Number #{purchase_number}', user=receipt.user,
+                quantity=quantities[purchase_item.id], location=location))
+
+    StockMovement.objects.bulk_create(stock_movement_list)
+    record_stock_change_events(stock_movement_list)
+
+    receive_stock((item.product_id, quantities[item.id], item.unit_cost, item.id) for item in purchase_items)
+    PurchaseReceiptItem.objects.bulk_create([
+        PurchaseReceiptItem(receipt=receipt, purchase_item_id=pk, quantity=quantity)
+        for pk, quantity in quantities.items()
+    ])
+
+    # Everything touched received something, so it is either done or partial now.
+    open_items = PurchaseItem.objects.filter(purchase=OuterRef('pk'), outstanding_quantity__gt=0)
+    purchases = Purchase.objects.filter(id__in={item.purchase_id for item in purchase_items})
+    purchases.update(
+        status=Case(When(Exists(open_items), then=Value(Purchase.PARTIAL)), default=Value(Purchase.RECEIVED)),
+        updated_at=date,
+    )
+
+    # The rows were read after the quantity UPDATE and before the status one.
+    for purchase_item in purchase_items:
+        quantity = quantities[purchase_item.id]
+        record_update(purchase_item, {**snapshot(purchase_item),
+                                      'received_quantity': purchase_item.received_quantity - quantity,
+                                      'outstanding_quantity': purchase_item.outstanding_quantity + quantity},
+                      receipt.user)
+
+    statuses = {item.purchase_id: item.purchase.status for item in purchase_items}
+    for purchase in purchases:
+        record_update(purchase, {**snapshot(purchase), 'status': statuses[purchase.id]}, receipt.user)
+
+
+def record_customer_order(order):
+    """Add ``order`` to its customer's lifetime totals with one relative UPDATE."""
+    CustomerStats.objects.bulk_create([CustomerStats(customer_id=order.customer_id)], ignore_conflicts=True)
+    CustomerStats.objects.filter(customer_id=order.customer_id).update(
+        order_count=F('order_count') + 1,
+        total_spent=F('total_spent') + order.total,
+        last_order_date=Greatest(Coalesce(F('last_order_date'), Value(order.date)), Value(order.date)),
+        updated_at=timezone.now(),
+    )
+
+
+def summarize_products(names, limit=3, max_length=255):
+    """The first ``limit`` product names of an order, e.g. ``'Lens A, Frame B, Case C +2'``."""
+    summary = ', '.join(names[:limit])
+    if len(names) > limit:
+        summary += f' +{len(names) - limit}'
+
+    return summary[:max_length]
+
+
+def record_order_summary(order, order_items):
+    """Write the order list row of ``order``; call it in the transaction that created the order."""
+    return OrderSummary.objects.create(
+        order=order,
+        order_number=order.order_number,
+        date=order.date,
+        customer_id=order.customer_id,
+        customer_name=order.customer.name,
+        user_name=order.user.username,
+        item_count=len(order_items),
+        products=summarize_products([item.product.name for item in order_items]),
+        total=order.total,
+        paid_amount=order.paid_amount,
+        change_amount=order.change_amount,
+        created_at=order.created_at,
+        updated_at=order.updated_at,
+    )
+
+
+@transaction.atomic
+def transfer_stock(transfer_number, from_location, to_location, items, user):
+    """
+    Move ``items`` (product, quantity pairs) between two locations in one transaction. Product.stock is unchanged;
+    the ledger gets a TRANSFER_OUT and a TRANSFER_IN movement per product.
+    """
+    quantities = {product.id: quantity for product, quantity in items}
+    date = timezone.now()
+    note = f'Transfer #{transfer_number} from {from_location.code} to {to_location.code}'
+
+    # Balances are always locked in location id order, so two opposite transfers cannot deadlock each other.
+    if from_location.id < to_location.id:
+        _move_location_stock(quantities, -1, from_location)
+        _move_location_stock(quantities, 1, to_location)
+    else:
+        _move_location_stock(quantities, 1, to_location)
+        _move_location_stock(quantities, -1, from_location)
+
+    stocks = dict(Product.all_objects.filter(id__in=quantities.keys()).values_list('id', 'stock'))
+
+    stock_movement_list = []
+    for product, quantity in items:
+        product.stock = stocks[product.id]
+        stock_movement_list += [
+            StockMovement(product=product, movement_type=StockMovement.TRANSFER_OUT, source_doc=transfer_number,
+                          date=date, note=note, user=user, quantity=quantity, location=from_location),
+            StockMovement(product=product, movement_type=StockMovement.TRANSFER_IN, source_doc=transfer_number,
+                          date=date, note=note, user=user, quantity=quantity, location=to_location),
+        ]
+
+    StockMovement.objects.bulk_create(stock_movement_list)
+    record_stock_change_events(stock_movement_list)
+
+    return stock_movement_list
 
 
 def create_stock_adjustment(product):
@@ -0,0 +1,80 @@
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from optika.audit import record_delete
+from optika.low_stock import sync_low_stock
+from optika.models import Customer, Order, OrderItem, Product, PurchaseItem, Tombstone
+from optika.pricing import refresh_effective_prices
+from optika.stock_cache import invalidate
+
+PURGE_BATCH_SIZE = 100
+
+
+@transaction.atomic
+def soft_delete(instance):
+    """
+    Hide ``instance`` from the default manager and leave a tombstone for sync clients.
+
+    Only the row itself is written: nothing cascades, so orders, purchases and the stock ledger keep pointing at it.
+    """
+    now = timezone.now()
+    type(instance).all_objects.filter(pk=instance.pk).update(deleted_at=now, updated_at=now)
+    Tombstone.objects.create(model=instance._meta.model_name, object_id=instance.pk)
+    instance.deleted_at = instance.updated_at = now
+    record_delete(instance)
+
+
+@transaction.atomic
+def delete_product(product):
+    soft_delete(product)
+    # A deleted product is never low on stock, can't be sold and has no price of its own any more.
+    sync_low_stock([product.pk])
+    refresh_effective_prices([product.pk])
+    invalidate([product.pk])
+
+
+def purgeable_products(cutoff):
+    """Products deleted before ``cutoff`` that no order or purchase refers to."""
+    return (Product.all_objects.filter(deleted_at__lt=cutoff)
+            .exclude(Exists(OrderItem.objects.filter(product=OuterRef('pk'))))
+            .exclude(Exists(PurchaseItem.objects.filter(product=OuterRef('pk')))))
+
+
+def purgeable_customers(cutoff):
+    """Customers deleted before ``cutoff`` without orders."""
+    return Customer.all_objects.filter(deleted_at__lt=cutoff).exclude(
+        Exists(Order.objects.filter(customer=OuterRef('pk'))))
+
+
+@transaction.atomic
+def _purge_batch(queryset, ids):
+    # Checked again under the transaction, so a row restored or referenced meanwhile is left alone.
+    _, deleted = queryset.filter(id__in=ids).delete()
+    return deleted.get(queryset.model._meta.label, 0)
+
+
+def _purge(queryset, batch_size):
+    last_id = 0
+    purged = 0
+
+    while True:
+        ids = list(queryset.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return purged
+
+        purged += _purge_batch(queryset, ids)
+        last_id = ids[-1]
+
+
+def purge_deleted(cutoff, batch_size=PURGE_BATCH_SIZE):
+    """
+    Hard-delete soft-deleted products and customers older than ``cutoff``, ``batch_size`` rows per short transaction.
+
+    Rows still referenced by orders or purchases are kept for good: they are part of the document history. The
+    tombstones were written at soft delete time, so sync clients already dropped the rows.
+    """
+    return {
+        'products': _purge(purgeable_products(cutoff), batch_size),
+        'customers': _purge(purgeable_customers(cutoff), batch_size),
+    }
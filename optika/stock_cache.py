@@ -0,0 +1,90 @@
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+
+from optika.metrics import STOCK_CACHE
+from optika.models import Product
+
+STOCK_CACHE_TIMEOUT = 60 * 5
+
+
+def _version_key(pk):
+    return f'product-stock-version:{pk}'
+
+
+def _entry_key(pk, version):
+    # Entries hold (name, price); the prefix changed when stock was dropped from them.
+    return f'product-entry:{pk}:{version}'
+
+
+def get_stats():
+    """Hits are database reads the cache saved; misses fell through to the database."""
+    values = STOCK_CACHE.values()
+    hits, misses = values.get(('hit',), 0), values.get(('miss',), 0)
+    return {'hits': hits, 'misses': misses, 'db_reads_saved': hits}
+
+
+def _new_version():
+    # Random rather than counted: a version key the cache evicted comes back as a value no entry was written under,
+    # where a counter would restart at 0 and make entries of the old version 0 valid again.
+    return uuid.uuid4().hex
+
+
+def get_versions(ids):
+    """Current cache version per product id, in one cache round trip when all are known; a bump changes it."""
+    keys = {_version_key(pk): pk for pk in ids}
+    found = cache.get_many(keys.keys())
+
+    missing = [key for key in keys if key not in found]
+    if missing:
+        # add() keeps the version another worker may have set meanwhile; read back whichever won.
+        for key in missing:
+            cache.add(key, _new_version(), None)
+        found.update(cache.get_many(missing))
+
+    # A key evicted again right away still gets a version nothing is cached under.
+    return {pk: found.get(key) or _new_version() for key, pk in keys.items()}
+
+
+def _to_product(pk, entry):
+    name, price = entry
+    return Product(id=pk, name=name, price=price)
+
+
+def get_product(pk):
+    """
+    Return a Product carrying only name and price, to resolve order lines without a query each.
+
+    The values may lag behind the database by one in-flight transaction, and, unless CACHES points every worker at a
+    shared cache, by changes other workers made in the last STOCK_CACHE_TIMEOUT seconds. Nothing is rejected on them:
+    prices are validated against the database, and stock by the conditional UPDATE in optika.services. Stock is not
+    cached at all, since it changes with every sale.
+    """
+    version = get_versions([pk])[pk]
+    entry = cache.get(_entry_key(pk, version))
+
+    if entry is not None:
+        STOCK_CACHE.inc('hit')
+        return _to_product(pk, entry)
+
+    STOCK_CACHE.inc('miss')
+    product = Product.objects.only('id', 'name', 'price').get(pk=pk)
+    cache.set(_entry_key(pk, version), (product.name, product.price), STOCK_CACHE_TIMEOUT)
+
+    return product
+
+
+def _bump_versions(ids):
+    cache.set_many({_version_key(pk): _new_version() for pk in ids}, None)
+
+
+def invalidate(ids):
+    """
+    Retire the cached entries of ``ids`` once the current transaction commits.
+
+    Entries are keyed by a per-product version, so a reader that loaded the row before the commit can only write into
+    the retired version and never resurrects the old value.
+    """
+    ids = list(ids)
+    transaction.on_commit(lambda: _bump_versions(ids))
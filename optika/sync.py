@@ -0,0 +1,73 @@
+import base64
+import json
+from datetime import datetime, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from optika.models import Tombstone
+
+SYNC_BATCH_SIZE = 1000
+SYNC_MAX_BATCH_SIZE = 5000
+
+# Rows are only handed out once they are this old. updated_at is set before the saving transaction commits, so a
+# slow transaction could otherwise commit a row "behind" a watermark that a client already received.
+SYNC_SETTLE_TIME = timedelta(seconds=5)
+
+
+def encode_watermark(updated_at, pk, tombstone_id):
+    raw = json.dumps({'u': updated_at.isoformat() if updated_at else None, 'i': pk, 't': tombstone_id})
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_watermark(watermark):
+    if not watermark:
+        return None, 0, 0
+
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(watermark.encode()))
+        updated_at = datetime.fromisoformat(raw['u']) if raw['u'] else None
+        return updated_at, int(raw['i']), int(raw['t'])
+    except (ValueError, KeyError, TypeError):
+        raise ValidationError({'since': ['Invalid watermark.']})
+
+
+def get_batch_size(request):
+    try:
+        batch_size = int(request.GET.get('limit', SYNC_BATCH_SIZE))
+    except ValueError:
+        raise ValidationError({'limit': ['A valid integer is required.']})
+
+    return max(1, min(batch_size, SYNC_MAX_BATCH_SIZE))
+
+
+def changes_since(queryset, model, watermark, batch_size):
+    """
+    Return (changed rows, deleted ids, next watermark, has_more) for rows changed after ``watermark``.
+
+    Both scans walk an index in key order: (updated_at, id) on the model and (model, id) on Tombstone.
+    """
+    updated_at, pk, tombstone_id = decode_watermark(watermark)
+    settled = timezone.now() - SYNC_SETTLE_TIME
+
+    rows = queryset.filter(updated_at__lt=settled)
+    if updated_at is not None:
+        rows = rows.filter(Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=pk))
+    rows = list(rows.order_by('updated_at', 'id')[:batch_size + 1])
+
+    tombstones = list(Tombstone.objects.filter(model=model, id__gt=tombstone_id, created_at__lt=settled)
+                      .order_by('id').values_list('id', 'object_id')[:batch_size + 1])
+
+    has_more = len(rows) > batch_size or len(tombstones) > batch_size
+    rows = rows[:batch_size]
+    tombstones = tombstones[:batch_size]
+
+    if rows:
+        updated_at, pk = rows[-1].updated_at, rows[-1].id
+    if tombstones:
+        tombstone_id = tombstones[-1][0]
+
+    deleted = [object_id for _, object_id in tombstones]
+
+    return rows, deleted, encode_watermark(updated_at, pk, tombstone_id), has_more
@@ -0,0 +1,123 @@
+import logging
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait
+from datetime import timedelta
+
+import django
+from django.db import transaction, close_old_connections
+from django.utils import timezone
+
+from optika.models import Task
+
+logger = logging.getLogger(__name__)
+
+JOBS = {}
+
+RETRY_BACKOFF = timedelta(seconds=30)
+STALE_AFTER = timedelta(minutes=30)
+
+
+def job(name, params=None, staff_only=False):
+    """
+    Register a function as a queue job under ``name``; it is called with the task's kwargs.
+
+    ``params`` is the serializer kwargs sent by API clients are validated with (without one, clients can pass none),
+    and ``staff_only`` keeps jobs that rewrite or delete data away from non-staff users.
+    """
+    def decorator(func):
+        func.params = params
+        func.staff_only = staff_only
+        JOBS[name] = func
+        return func
+
+    return decorator
+
+
+def get_job(name):
+    import optika.jobs  # noqa: F401  registers the built-in jobs on first use
+
+    return JOBS[name]
+
+
+def enqueue(name, user, kwargs=None, max_attempts=3, run_after=None):
+    get_job(name)
+    return Task.objects.create(name=name, kwargs=kwargs or {}, user=user, max_attempts=max_attempts,
+                               run_after=run_after or timezone.now())
+
+
+def claim_tasks(limit):
+    """Atomically move up to ``limit`` due tasks to RUNNING and return their ids."""
+    with transaction.atomic():
+        ids = list(Task.objects.select_for_update(skip_locked=True)
+                   .filter(status=Task.PENDING, run_after__lte=timezone.now())
+                   .order_by('run_after', 'id').values_list('id', flat=True)[:limit])
+
+        Task.objects.filter(id__in=ids).update(status=Task.RUNNING, updated_at=timezone.now())
+
+    return ids
+
+
+def requeue_stale_tasks():
+    """Put back tasks whose worker died while running them."""
+    return Task.objects.filter(status=Task.RUNNING, updated_at__lt=timezone.now() - STALE_AFTER) \
+        .update(status=Task.PENDING)
+
+
+def run_task(task_id):
+    close_old_connections()
+    task = Task.objects.get(pk=task_id)
+    task.attempts += 1
+
+    try:
+        task.result = get_job(task.name)(**task.kwargs)
+        task.status = Task.DONE
+        task.error = ''
+    except Exception:
+        task.error = traceback.format_exc()
+        logger.warning('Task %s attempt %s failed', task, task.attempts)
+
+        if task.attempts >= task.max_attempts:
+            task.status = Task.FAILED
+        else:
+            task.status = Task.PENDING
+            task.run_after = timezone.now() + RETRY_BACKOFF * 2 ** (task.attempts - 1)
+
+    task.save(update_fields=['attempts', 'result', 'status', 'error', 'run_after', 'updated_at'])
+    close_old_connections()
+
+    return task.status
+
+
+def _setup_process():
+    django.setup()
+
+
+def run_worker(workers=4, pool='thread', once=False, poll_interval=1.0, stop_event=None):
+    """Claim due tasks and run them on a thread or process pool until stopped (or drained when ``once``)."""
+    if pool == 'process':
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_setup_process)
+    else:
+        executor = ThreadPoolExecutor(max_workers=workers)
+
+    requeue_stale_tasks()
+    processed = 0
+
+    with executor:
+        while stop_event is None or not stop_event.is_set():
+            ids = claim_tasks(workers)
+
+            if ids:
+                wait([executor.submit(run_task, task_id) for task_id in ids])
+                processed += len(ids)
+                continue
+
+            if once:
+                break
+
+            if stop_event is not None:
+                stop_event.wait(poll_interval)
+            else:
+                time.sleep(poll_interval)
+
+    return processed
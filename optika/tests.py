@@ -1,3 +1,354 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import re
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from itertools import combinations
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django_filters import rest_framework as filters
+from rest_framework.test import APIClient
+
+from optika.archive import archive_stock_movements
+from optika.catalog import get_snapshot
+from optika.imports import import_products
+from optika.filters import StockMovementFilter, OrderFilter, PurchaseFilter
+from optika.receipts import TEXT, get_receipt, receipt_key, receipt_version
+from optika.models import Customer, IdempotencyKey, Order, OrderItem, Product, ProductStock, Purchase, PurchaseItem, \
+    StockChangeEvent, StockMovement, StockMovementArchive, Task
+from optika.services import calculate_current_stock
+from optika.tasks import run_task
+
+# Filter sets checked, with the ordering their list view applies.
+FILTERSETS = [
+    (StockMovementFilter, ('-updated_at', '-id')),
+    (OrderFilter, ('-updated_at', '-id')),
+    (PurchaseFilter, ('-updated_at', '-id')),
+]
+
+
+def sample_value(field):
+    if isinstance(field, filters.DateFilter):
+        return timezone.localdate().isoformat()
+    if isinstance(field, filters.NumberFilter):
+        return '1'
+    if isinstance(field, filters.ChoiceFilter):
+        return str(field.extra['choices'][0][0])
+
+    return 'x'
+
+
+def unindexed(queryset, filtered):
+    """
+    Return the plan of ``queryset`` and whether it reads its table without looking up an index. A filtered queryset
+    has to look its rows up by the filtered column; walking a whole index (the list ordering) reads the table as much
+    as a scan does. Only the first page of an unfiltered list may walk the ordering index.
+    """
+    table = queryset.model._meta.db_table
+
+    if connection.vendor == 'mysql':
+        plan = queryset.explain(format='json')
+        access = re.findall(rf'"table_name": "{table}",\s*"access_type": "(\w+)"', plan)
+        allowed = {'const', 'eq_ref', 'ref', 'range'} if filtered else {'const', 'eq_ref', 'ref', 'range', 'index'}
+        return plan, not access or not set(access) <= allowed
+
+    plan = queryset.explain()
+
+    if connection.vendor == 'postgresql':
+        return plan, f'Seq Scan on {table}' in plan or (filtered and 'Index Cond' not in plan)
+
+    # SQLite: "SEARCH <table> USING INDEX name (column=?)" looks rows up; "SCAN <table>" walks the table or, with
+    # "USING INDEX", a whole index.
+    lines = [line for line in plan.splitlines() if re.search(rf'\b(SCAN|SEARCH) {table}\b', line)]
+    lookup = rf'\bSEARCH {table} USING (COVERING )?INDEX \w+ \(' if filtered else rf'\b(SCAN|SEARCH) {table} USING '
+    return plan, not lines or not all(re.search(lookup, line) for line in lines)
+
+
+class FilterPlanTests(TestCase):
+    """Every single and paired filter of the list FilterSets must be served by an index."""
+
+    def test_filters_use_an_index(self):
+        for filterset_class, ordering in FILTERSETS:
+            names = list(filterset_class.base_filters)
+            queryset = filterset_class._meta.model.objects.order_by(*ordering)
+
+            for params in [{}] + [dict.fromkeys(combo) for size in (1, 2) for combo in combinations(names, size)]:
+                data = {name: sample_value(filterset_class.base_filters[name]) for name in params}
+
+                with self.subTest(filterset=filterset_class.__name__, data=data):
+                    filterset = filterset_class(data, queryset=queryset)
+                    self.assertTrue(filterset.is_valid(), filterset.errors)
+
+                    # Unfiltered lists are paginated, so only their first page is planned.
+                    plan, scan = unindexed(filterset.qs if data else filterset.qs[:5], filtered=bool(data))
+                    self.assertFalse(scan, plan)
+
+
+class AdminQueryCountTests(TestCase):
+    """
+    Query counts of the optika admin pages. Every list and document holds several rows, so a count that grows with
+    the rows (an N+1 on a related object) breaks the expected number.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('staff', password='secret', is_staff=True, is_superuser=True)
+        products = [Product.objects.create(name=f'Lens {i}', unit='pcs', stock=10, price=100, user=cls.user)
+                    for i in range(3)]
+        customer = Customer.objects.create(name='Budi', phone='1', email='budi@example.com', address='Jl. Merdeka 1',
+                                           user=cls.user)
+
+        for n in range(3):
+            order = Order.objects.create(order_number=f'O{n}', date=timezone.localdate(), customer=customer,
+                                         total=300, paid_amount=300, change_amount=0, user=cls.user)
+            OrderItem.objects.bulk_create(
+                OrderItem(order=order, product=product, quantity=1, price=100, subtotal=100) for product in products)
+
+            purchase = Purchase.objects.create(purchase_number=f'P{n}', date=timezone.localdate(), user=cls.user)
+            PurchaseItem.objects.bulk_create(
+                PurchaseItem(purchase=purchase, product=product, quantity=1, outstanding_quantity=1)
+                for product in products)
+
+        cls.product, cls.customer, cls.order, cls.purchase = products[0], customer, order, purchase
+
+    def setUp(self):
+        self.assertTrue(self.client.login(username='staff', password='secret'))
+
+    def assertPageQueries(self, num, url):
+        with self.assertNumQueries(num):
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_changelists(self):
+        # EstimatedCountPaginator asks MySQL and PostgreSQL for the table estimate first; SQLite keeps none.
+        estimate = 0 if connection.vendor == 'sqlite' else 1
+
+        for model, num in [(Product, 5), (Customer, 4), (Order, 4), (Purchase, 4)]:
+            with self.subTest(model=model.__name__):
+                self.assertPageQueries(num + estimate, reverse(f'admin:optika_{model._meta.model_name}_changelist'))
+
+    def test_change_pages(self):
+        for obj, num in [(self.product, 5), (self.customer, 6), (self.order, 8), (self.purchase, 7)]:
+            with self.subTest(model=type(obj).__name__):
+                self.assertPageQueries(num, reverse(f'admin:optika_{obj._meta.model_name}_change', args=[obj.pk]))
+
+
+class CheckoutTestCase(TestCase):
+    """A product and a customer created through the API, as a terminal would see them."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('cashier')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        self.product = self.client.post(reverse('optika:product_list_view'), {
+            'name': 'Lens', 'unit': 'pcs', 'stock': 10, 'price': 100}, format='json').json()
+        self.customer = self.client.post(reverse('optika:customer_list_view'), {
+            'name': 'Budi', 'phone': '1', 'email': 'budi@example.com', 'address': 'Jl. Merdeka 1',
+        }, format='json').json()
+
+        # Rows are handed out once settled; the tests do not wait for that.
+        for module in ('optika.sync', 'optika.catalog'):
+            patcher = mock.patch(f'{module}.SYNC_SETTLE_TIME', timedelta(0))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def sell(self, quantity, order_number='O1', expected_status=201, **extra):
+        response = self.client.post(reverse('optika:order_list_view'), {
+            'order_number': order_number, 'date': timezone.localdate().isoformat(), 'customer': self.customer['id'],
+            'total': 100 * quantity, 'paid_amount': 100 * quantity, 'change_amount': 0,
+            'order_items': [{'product': self.product['id'], 'quantity': quantity, 'price': 100,
+                             'subtotal': 100 * quantity}],
+        }, format='json', **extra)
+        self.assertEqual(response.status_code, expected_status, response.content)
+        return response
+
+    def changes(self, since):
+        response = self.client.get(reverse('optika:product_change_list_view'), {'since': since})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+
+class ProductChangeFeedTests(CheckoutTestCase):
+
+    def test_order_reports_new_stock(self):
+        since = self.changes('')['since']
+
+        self.sell(2)
+
+        results = self.changes(since)['results']
+        self.assertEqual([(row['id'], row['stock']) for row in results], [(self.product['id'], 8)])
+
+
+class CatalogSnapshotTests(CheckoutTestCase):
+
+    def test_stock_change_after_snapshot_reaches_delta(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(OPTIKA_CATALOG_DIR=directory):
+            path, version = get_snapshot()
+            with gzip.open(path) as f:
+                header = json.loads(f.readline())
+
+        self.sell(2)
+
+        results = self.changes(header['since'])['results']
+        self.assertIn((self.product['id'], 8), [(row['id'], row['stock']) for row in results])
+
+
+class IdempotencyTests(CheckoutTestCase):
+
+    def test_retry_takes_over_key_of_dead_request(self):
+        # What a worker killed mid-request leaves behind: a pending row that never gets an outcome.
+        IdempotencyKey.objects.create(key='k1', user=self.user, path=reverse('optika:order_list_view'),
+                                      fingerprint='', expires_at=timezone.now() + timedelta(hours=1))
+        IdempotencyKey.objects.filter(key='k1').update(created_at=timezone.now() - timedelta(minutes=5))
+
+        response = self.sell(2, HTTP_IDEMPOTENCY_KEY='k1')
+        self.assertNotIn('Idempotent-Replayed', response.headers)
+        self.assertEqual(Order.objects.count(), 1)
+
+        replay = self.sell(2, HTTP_IDEMPOTENCY_KEY='k1')
+        self.assertEqual(replay.headers['Idempotent-Replayed'], 'true')
+        self.assertEqual(replay.json(), response.json())
+        self.assertEqual(Order.objects.count(), 1)
+
+
+class CheckoutStockTests(CheckoutTestCase):
+
+    def test_stock_is_checked_against_the_database(self):
+        self.sell(2)
+
+        # Goods received by another worker: the stock cache of this one is not told.
+        Product.objects.filter(pk=self.product['id']).update(stock=20)
+        ProductStock.objects.filter(product_id=self.product['id']).update(stock=20)
+
+        self.sell(15, order_number='O2')
+        response = self.sell(6, order_number='O3', expected_status=400)
+        self.assertIn('quantity', response.json())
+
+
+class BenchmarkReceiptsTests(CheckoutTestCase):
+
+    def test_keeps_the_cache_of_the_app(self):
+        self.sell(2)
+        order = Order.objects.get()
+        get_receipt(order.pk)
+        served = receipt_key(order.pk, TEXT, receipt_version(order.pk))
+
+        with mock.patch('uuid.uuid4', return_value=mock.Mock(hex='run')):
+            call_command('benchmark_receipts', stdout=StringIO())
+
+        self.assertIsNotNone(cache.get(served))
+        self.assertIsNone(cache.get(receipt_key(order.pk, TEXT, receipt_version(order.pk), 'benchmark-receipt:run')))
+
+
+class FlakySink:
+    """Rejects its first batch, then accepts every batch."""
+
+    sent = []
+
+    def __init__(self, **options):
+        self.failed = False
+
+    def send(self, payloads):
+        if not self.failed:
+            self.failed = True
+            raise IOError('sink unavailable')
+
+        self.sent.extend(payloads)
+
+
+class StopRelay(Exception):
+    pass
+
+
+class RelayStockEventsTests(CheckoutTestCase):
+
+    @override_settings(OPTIKA_OUTBOX_CLAIM_TIMEOUT=timedelta(0))
+    def test_loop_survives_a_failing_batch(self):
+        self.sell(2)
+        pending = StockChangeEvent.objects.filter(delivered_at__isnull=True).count()
+        self.assertGreater(pending, 0)
+        FlakySink.sent = []
+
+        # The first sleep is the back-off after the failure, the second one finds the outbox drained.
+        with mock.patch.dict('optika.outbox.SINKS', {'flaky': FlakySink}), \
+                mock.patch('time.sleep', side_effect=[None, StopRelay]) as sleep, \
+                self.assertLogs('optika', 'ERROR'), \
+                self.assertRaises(StopRelay):
+            call_command('relay_stock_events', sink='flaky', loop=True, stdout=StringIO())
+
+        self.assertEqual(sleep.call_args_list[0], mock.call(2.0))
+        self.assertEqual(len(FlakySink.sent), pending)
+        self.assertFalse(StockChangeEvent.objects.filter(delivered_at__isnull=True).exists())
+        self.assertEqual(set(StockChangeEvent.objects.values_list('attempts', flat=True)), {2})
+
+
+class ArchiveTests(CheckoutTestCase):
+
+    def test_batches_carry_the_opening_balance(self):
+        for n in range(3):
+            self.sell(n + 1, order_number=f'O{n}')
+
+        product = Product.objects.get(pk=self.product['id'])
+        movements = StockMovement.objects.filter(product=product).count()
+        self.assertEqual(calculate_current_stock(product), 4)
+
+        archived = archive_stock_movements(timezone.now() + timedelta(minutes=1), batch_size=2)
+
+        self.assertEqual(archived, movements)
+        self.assertEqual(StockMovementArchive.objects.count(), movements)
+        self.assertEqual(list(StockMovement.objects.filter(product=product).values_list('movement_type', 'quantity')),
+                         [(StockMovement.OPENING, 4)])
+        self.assertEqual(calculate_current_stock(product), 4)
+
+
+class ProductImportTests(CheckoutTestCase):
+    ROW = {'sku': 'L-1', 'name': 'Lens 1', 'unit': 'pcs', 'stock': '5', 'price': '100'}
+
+    def test_upload_is_imported_by_a_task(self):
+        upload = SimpleUploadedFile('products.csv', b'sku,name,unit,stock,price\nL-1,Lens 1,pcs,5,100\n')
+
+        with tempfile.TemporaryDirectory() as directory, override_settings(OPTIKA_IMPORT_DIR=directory):
+            response = self.client.post(reverse('optika:product_import_view'), {'file': upload})
+            self.assertEqual(response.status_code, 202, response.content)
+            self.assertFalse(Product.objects.filter(sku='L-1').exists())
+
+            self.assertEqual(run_task(response.json()['id']), Task.DONE)
+            self.assertEqual(os.listdir(directory), [])
+
+        report = Task.objects.get(pk=response.json()['id']).result
+        self.assertEqual((report['created'], report['updated'], report['failed']), (1, 0, 0))
+        self.assertEqual(Product.objects.get(sku='L-1').stock, 5)
+
+    def test_sku_inserted_by_a_concurrent_import_counts_as_updated(self):
+        atomic = transaction.atomic
+        raced = []
+
+        def concurrent_import(*args, **kwargs):
+            # The other import commits the SKU between the locked read and the insert of this one.
+            if not raced:
+                raced.append(True)
+                import_products([{**self.ROW, 'name': 'Other'}], self.user)
+            return atomic(*args, **kwargs)
+
+        with mock.patch('optika.imports.transaction', mock.Mock(atomic=concurrent_import)):
+            report = import_products([self.ROW], self.user)
+
+        self.assertEqual((report['created'], report['updated']), (0, 1))
+        product = Product.objects.get(sku='L-1')
+        self.assertEqual((product.name, product.stock), ('Lens 1', 5))
+        self.assertEqual(StockMovement.objects.filter(product=product).count(), 1)
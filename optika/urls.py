@@ -6,13 +6,43 @@ app_name = 'optika'
 
 urlpatterns = [
     path("products/", views.product_list_view, name='product_list_view'),
+    path("products/import/", views.product_import_view, name='product_import_view'),
+    path("products/changes/", views.product_change_list_view, name='product_change_list_view'),
+    path("products/snapshot/", views.product_snapshot_view, name='product_snapshot_view'),
+    path("products/lookup/", views.product_lookup_view, name='product_lookup_view'),
     path("products/<int:pk>/", views.product_detail_view, name='product_detail_view'),
+    path("products/<int:pk>/barcodes/", views.product_barcode_list_view, name='product_barcode_list_view'),
+    path("products/<int:pk>/barcodes/<int:barcode_pk>/", views.product_barcode_detail_view,
+         name='product_barcode_detail_view'),
+    path("low-stock/", views.low_stock_list_view, name='low_stock_list_view'),
+    path("low-stock/changes/", views.low_stock_change_list_view, name='low_stock_change_list_view'),
+    path("low-stock/suggested-purchases/", views.suggested_purchase_list_view, name='suggested_purchase_list_view'),
+    path("valuation/", views.valuation_view, name='valuation_view'),
     path("customers/", views.customer_list_view, name='customer_list_view'),
+    path("customers/changes/", views.customer_change_list_view, name='customer_change_list_view'),
     path("customers/<int:pk>/", views.customer_detail_view, name='customer_detail_view'),
+    path("customers/<int:pk>/history/", views.customer_history_view, name='customer_history_view'),
+    path("customer-groups/", views.customer_group_list_view, name='customer_group_list_view'),
+    path("price-rules/", views.price_rule_list_view, name='price_rule_list_view'),
+    path("price-rules/<int:pk>/", views.price_rule_detail_view, name='price_rule_detail_view'),
+    path("prices/quote/", views.price_quote_view, name='price_quote_view'),
     path("orders/", views.order_list_view, name='order_list_view'),
     path("orders/<str:order_number>/", views.order_detail_view, name='order_detail_view'),
     path("purchases/", views.purchase_list_view, name='purchase_list_view'),
     path("purchases/<str:purchase_number>/", views.purchase_detail_view, name='purchase_detail_view'),
+    path("purchase-items/outstanding/", views.outstanding_purchase_item_list_view,
+         name='outstanding_purchase_item_list_view'),
+    path("purchase-receipts/", views.purchase_receipt_list_view, name='purchase_receipt_list_view'),
+    path("purchase-receipts/<str:receipt_number>/", views.purchase_receipt_detail_view,
+         name='purchase_receipt_detail_view'),
     path("stock-movements/", views.stock_movement_list_view, name='stock_movement_list_view'),
+    path("stock-movements/archive/", views.stock_movement_archive_list_view, name='stock_movement_archive_list_view'),
     path("stock-movements/<int:pk>/", views.stock_movement_detail_view, name='stock_movement_detail_view'),
+    path("locations/", views.location_list_view, name='location_list_view'),
+    path("locations/<int:pk>/stock/", views.location_stock_list_view, name='location_stock_list_view'),
+    path("transfers/", views.transfer_create_view, name='transfer_create_view'),
+    path("audit-logs/", views.audit_log_list_view, name='audit_log_list_view'),
+    path("tasks/", views.task_list_view, name='task_list_view'),
+    path("tasks/<int:pk>/", views.task_detail_view, name='task_detail_view'),
+    path("tasks/<int:pk>/download/", views.task_download_view, name='task_download_view'),
 ]
\ No newline at end of file
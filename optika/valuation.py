@@ -0,0 +1,96 @@
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import BigIntegerField, Case, F, Sum, Value, When
+
+from optika.models import CostLayer, Product
+
+AVERAGE = 'AVERAGE'
+FIFO = 'FIFO'
+METHODS = (AVERAGE, FIFO)
+
+
+def get_method():
+    method = getattr(settings, 'OPTIKA_VALUATION_METHOD', AVERAGE)
+    if method not in METHODS:
+        raise ImproperlyConfigured(f'OPTIKA_VALUATION_METHOD must be one of {", ".join(METHODS)}, not {method!r}.')
+
+    return method
+
+
+def _add_inventory_values(deltas):
+    """Add ``deltas`` (product id -> signed amount) to Product.inventory_value in one relative UPDATE."""
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    Product.all_objects.filter(id__in=deltas.keys()).update(inventory_value=F('inventory_value') + Case(
+        *[When(id=pk, then=Value(delta)) for pk, delta in deltas.items()], output_field=BigIntegerField()))
+
+
+def receive_stock(lines):
+    """
+    Open a cost layer per ``(product_id, quantity, unit_cost, purchase_item_id)`` line and add its cost to the product's
+    inventory value. Call it in the transaction that moved the stock in.
+    """
+    layers = [
+        CostLayer(product_id=product_id, purchase_item_id=purchase_item_id, unit_cost=unit_cost, quantity=quantity,
+                  remaining=quantity)
+        for product_id, quantity, unit_cost, purchase_item_id in lines if quantity
+    ]
+    CostLayer.objects.bulk_create(layers)
+
+    deltas = {}
+    for layer in layers:
+        deltas[layer.product_id] = deltas.get(layer.product_id, 0) + layer.quantity * layer.unit_cost
+
+    _add_inventory_values(deltas)
+
+
+def issue_stock(quantities):
+    """
+    Take ``quantities`` (product id -> quantity) out of valuation and return the cost of goods sold per product id.
+
+    Must run after the stock UPDATE of the same transaction, which already holds the product row locks, so the
+    inventory values read here cannot change underneath. Open layers are consumed oldest first whatever the method;
+    quantity no layer covers (stock that was adjusted in) is costed at 0 under FIFO.
+    """
+    layers = (CostLayer.objects.select_for_update().filter(product_id__in=quantities.keys(), remaining__gt=0)
+              .order_by('product_id', 'id'))
+    left = dict(quantities)
+    fifo_costs = dict.fromkeys(quantities, 0)
+    consumed = []
+
+    for layer in layers:
+        taken = min(layer.remaining, left[layer.product_id])
+        if not taken:
+            continue
+
+        layer.remaining -= taken
+        left[layer.product_id] -= taken
+        fifo_costs[layer.product_id] += taken * layer.unit_cost
+        consumed.append(layer)
+
+    CostLayer.objects.bulk_update(consumed, ['remaining'])
+
+    if get_method() == FIFO:
+        costs = fifo_costs
+    else:
+        costs = {}
+        rows = Product.all_objects.filter(id__in=quantities.keys()).values_list('id', 'stock', 'inventory_value')
+        for pk, stock, value in rows:
+            before = stock + quantities[pk]
+            # The last unit out takes whatever value is left, so rounding never strands value on an empty product.
+            costs[pk] = value if not stock else (value * quantities[pk] + before // 2) // before
+
+    costs = {pk: max(cost, 0) for pk, cost in costs.items()}
+    _add_inventory_values({pk: -cost for pk, cost in costs.items()})
+
+    return costs
+
+
+def get_inventory_value():
+    """
+    Total inventory value, summed from the per-product running values instead of replaying the ledger. Soft-deleted
+    products count too: deleting a product hides it, its stock is still on the shelf.
+    """
+    return Product.all_objects.aggregate(value=Sum('inventory_value'))['value'] or 0
@@ -1,15 +1,47 @@
+import os
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import FileResponse, Http404
+from django.utils.dateparse import parse_date
+from django_filters.utils import translate_validation
 from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 
-from optika.models import Product, Customer, Order, StockMovement, Purchase
-from optika.paginations import CustomPagination
+from optika.models import Product, Customer, Order, StockMovement, Purchase, Task, Location, ProductStock, \
+    LowStockProduct, LowStockChange, CustomerStats, OrderSummary, CustomerGroup, PriceRule, AuditLog, ProductBarcode, \
+    PurchaseItem, PurchaseReceipt, PurchaseReceiptItem
+from optika.archive import archived_stock_movements
+from optika.catalog import get_snapshot
+from optika.filters import StockMovementFilter, OrderFilter, PurchaseFilter, AuditLogFilter, PurchaseItemFilter
+from optika.idempotency import idempotent
+from optika.lookup import lookup_products
+from optika.low_stock import suggest_purchases
+from optika.imports import save_upload, READERS, CSV, JSONL
+from optika.paginations import CustomPagination, KeysetPagination
+from optika.pricing import quote_prices, refresh_effective_prices
+from optika.renderers import ranged_file_response
+from optika.services import run_with_retries
+from optika.stock_cache import invalidate
+from optika.soft_delete import soft_delete, delete_product
+from optika.sync import changes_since, get_batch_size
+from optika.tasks import enqueue
+from optika.valuation import get_method, get_inventory_value
 from optika.serializers import ProductPreviewSerializer, CustomerPreviewSerializer, ProductCreateSerializer, \
     ProductDetailSerializer, ProductUpdateSerializer, CustomerCreateSerializer, CustomerDetailSerializer, \
-    CustomerUpdateSerializer, OrderPreviewSerializer, OrderCreateSerializer, OrderDetailingSerializer, \
+    CustomerUpdateSerializer, OrderCreateSerializer, OrderDetailingSerializer, \
     StockMovementPreviewSerializer, StockMovementDetailSerializer, PurchasePreviewSerializer, PurchaseCreateSerializer, \
-    PurchaseDetailSerializer
+    PurchaseDetailSerializer, TaskPreviewSerializer, TaskCreateSerializer, StockMovementArchivePreviewSerializer, \
+    LocationPreviewSerializer, LocationCreateSerializer, ProductStockPreviewSerializer, TransferCreateSerializer, \
+    LowStockProductPreviewSerializer, LowStockChangePreviewSerializer, CustomerOrderPreviewSerializer, \
+    CustomerStatsPreviewSerializer, OrderSummaryPreviewSerializer, CustomerGroupPreviewSerializer, \
+    CustomerGroupCreateSerializer, PriceRulePreviewSerializer, PriceRuleCreateSerializer, PriceQuoteSerializer, \
+    AuditLogPreviewSerializer, ProductBarcodePreviewSerializer, ProductBarcodeCreateSerializer, \
+    ProductLookupSerializer, PurchaseItemPreviewSerializer, PurchaseReceiptPreviewSerializer, \
+    PurchaseReceiptCreateSerializer, PurchaseReceiptDetailSerializer
 
 
 @api_view(['GET', 'POST'])
@@ -67,10 +99,154 @@ def product_detail_view(request, pk):
         return Response(serializer_input.errors, status=status.HTTP_400_BAD_REQUEST)
 
     elif request.method == 'DELETE':
-        product.delete()
+        delete_product(product)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+@api_view(['GET', 'POST'])
+def product_barcode_list_view(request, pk):
+    product = get_object_or_404(Product, pk=pk)
+
+    if request.method == 'GET':
+        barcodes = product.barcodes_by_product.order_by('id')
+        serializer_output = ProductBarcodePreviewSerializer(barcodes, many=True)
+
+        return Response(serializer_output.data, status=status.HTTP_200_OK)
+
+    if request.method == 'POST':
+        serializer_input = ProductBarcodeCreateSerializer(data=request.data)
+
+        if serializer_input.is_valid():
+            instance = serializer_input.save(product=product)
+            serializer_output = ProductBarcodePreviewSerializer(instance)
+
+            return Response(serializer_output.data, status=status.HTTP_201_CREATED)
+
+        return Response(serializer_input.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['DELETE'])
+def product_barcode_detail_view(request, pk, barcode_pk):
+    barcode = get_object_or_404(ProductBarcode, pk=barcode_pk, product_id=pk)
+
+    with transaction.atomic():
+        barcode.delete()
+        invalidate([pk])
+
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@api_view(['GET', 'POST'])
+def product_lookup_view(request):
+    # Checkout scanning: GET resolves one SKU or barcode, POST a whole basket of them in one round trip.
+    if request.method == 'GET':
+        code = request.GET.get('code')
+
+        if not code:
+            return Response({'code': ['This field is required.']}, status=status.HTTP_400_BAD_REQUEST)
+
+        row = lookup_products([code]).get(code)
+
+        if row is None:
+            return Response({'detail': f'No product with code {code}.'}, status=status.HTTP_404_NOT_FOUND)
+
+        return Response({'code': code, **row}, status=status.HTTP_200_OK)
+
+    if request.method == 'POST':
+        serializer_input = ProductLookupSerializer(data=request.data)
+
+        if not serializer_input.is_valid():
+            return Response(serializer_input.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        codes = serializer_input.validated_data['codes']
+        rows = lookup_products(codes)
+
+        return Response({
+            'results': [{'code': code, **rows[code]} for code in dict.fromkeys(codes) if code in rows],
+            'missing': [code for code in dict.fromkeys(codes) if code not in rows],
+        }, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+def product_import_view(request):
+    upload = request.FILES.get('file')
+
+    if upload is None:
+        return Response({'file': ['This field is required.']}, status=status.HTTP_400_BAD_REQUEST)
+
+    fmt = request.data.get('format') or (JSONL if upload.name.endswith(('.jsonl', '.ndjson')) else CSV)
+
+    if fmt not in READERS:
+        return Response({'format': [f'Unknown format {fmt}.']}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Imported by a task worker: a large catalog would outlast the request, and the task result holds the report.
+    task = enqueue('import_products', request.user, {'file': save_upload(upload, fmt), 'format': fmt,
+                                                     'user_id': request.user.id})
+    serializer_output = TaskPreviewSerializer(task)
+
+    return Response(serializer_output.data, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+def product_change_list_view(request):
+    products = Product.objects.select_related('user')
+    rows, deleted, since, has_more = changes_since(products, 'product', request.GET.get('since'),
+                                                   get_batch_size(request))
+
+    serializer_output = ProductPreviewSerializer(rows, many=True)
+
+    return Response({'since': since, 'has_more': has_more, 'results': serializer_output.data, 'deleted': deleted},
+                    status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+def product_snapshot_view(request):
+    path, version = get_snapshot()
+    return ranged_file_response(request, path, version, 'application/gzip', f'catalog-{version}.ndjson.gz')
+
+
+@api_view(['GET'])
+def low_stock_list_view(request):
+    low_stock_products = LowStockProduct.objects.select_related('product').order_by('product_id')
+
+    paginator = CustomPagination()
+    paginated_qs = paginator.paginate_queryset(low_stock_products, request)
+
+    serializer_output = LowStockProductPreviewSerializer(paginated_qs, many=True)
+
+    return paginator.get_paginated_response(serializer_output.data)
+
+
+@api_view(['GET'])
+def low_stock_change_list_view(request):
+    try:
+        since = int(request.GET.get('since', 0))
+    except ValueError:
+        return Response({'since': ['A valid integer is required.']}, status=status.HTTP_400_BAD_REQUEST)
+
+    changes = list(LowStockChange.objects.filter(id__gt=since).order_by('id')[:get_batch_size(request)])
+    serializer_output = LowStockChangePreviewSerializer(changes, many=True)
+
+    return Response({'since': changes[-1].id if changes else since, 'results': serializer_output.data},
+                    status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+def suggested_purchase_list_view(request):
+    try:
+        days = max(1, int(request.GET.get('days', 30)))
+        cover_days = max(0, int(request.GET.get('cover_days', 14)))
+    except ValueError:
+        return Response({'detail': 'days and cover_days must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(suggest_purchases(days, cover_days), status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+def valuation_view(request):
+    return Response({'method': get_method(), 'inventory_value': get_inventory_value()}, status=status.HTTP_200_OK)
+
+
 @api_view(['GET', 'POST'])
 def customer_list_view(request):
     if request.method == 'GET':
@@ -101,7 +277,7 @@ def customer_list_view(request):
 
 @api_view(['GET', 'PUT', 'DELETE'])
 def customer_detail_view(request, pk):
-    customer = get_object_or_404(Customer, pk=pk)
+    customer = get_object_or_404(Customer.objects.select_related('user', 'stats'), pk=pk)
 
     if request.method == 'GET':
         serializer_output = CustomerDetailSerializer(customer)
@@ -119,23 +295,164 @@ def customer_detail_view(request, pk):
         return Response(serializer_input.errors, status=status.HTTP_400_BAD_REQUEST)
 
     elif request.method == 'DELETE':
-        customer.delete()
+        soft_delete(customer)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+@api_view(['GET'])
+def customer_history_view(request, pk):
+    customer = get_object_or_404(Customer.objects.select_related('stats'), pk=pk)
+    # Walks the customer_id index (which ends in the primary key) backwards; no Order rows are aggregated.
+    orders = Order.objects.filter(customer=customer)
+
+    paginator = KeysetPagination()
+    paginated_qs = paginator.paginate_queryset(orders, request)
+
+    serializer_output = CustomerOrderPreviewSerializer(paginated_qs, many=True)
+    stats = customer.stats if hasattr(customer, 'stats') else CustomerStats(order_count=0, total_spent=0)
+
+    return paginator.get_paginated_response(serializer_output.data,
+                                            stats=CustomerStatsPreviewSerializer(stats).data)
+
+
+@api_view(['GET'])
+def customer_change_list_view(request):
+    customers = Customer.objects.select_related('user')
+    rows, deleted, since, has_more = changes_since(customers, 'customer', request.GET.get('since'),
+                                                   get_batch_size(request))
+
+    serializer_output = CustomerPreviewSerializer(rows, many=True)
+
+    return Response({'since': since, 'has_more': has_more, 'results': serializer_output.data, 'deleted': deleted},
+                    status=status.HTTP_200_OK)
+
+
 @api_view(['GET', 'POST'])
+def customer_group_list_view(request):
+    if request.method == 'GET':
+        customer_groups = CustomerGroup.objects.all().order_by('code')
+
+        paginator = CustomPagination()
+        paginated_qs = paginator.paginate_queryset(customer_groups, request)
+
+        serializer_output = CustomerGroupPreviewSerializer(paginated_qs, many=True)
+
+        return paginator.get_paginated_response(serializer_output.data)
+
+    if request.method == 'POST':
+        serializer_input = CustomerGroupCreateSerializer(data=request.data)
+
+        if serializer_input.is_valid():
+            instance = serializer_input.save()
+            serializer_output = CustomerGroupPreviewSerializer(instance)
+
+            return Response(serializer_output.data, status=status.HTTP_201_CREATED)
+
+        return Response(serializer_input.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['GET', 'POST'])
+def price_rule_list_view(request):
+    if request.method == 'GET':
+        price_rules = PriceRule.objects.select_related('user').order_by('-updated_at', '-id')
+        product = request.GET.get('product')
+
+        if product:
+            price_rules = price_rules.filter(product_id=product)
+
+        paginator = CustomPagination()
+        paginated_qs = paginator.paginate_queryset(price_rules, request)
+
+        serializer_output = PriceRulePreviewSerializer(paginated_qs, many=True)
+
+        return paginator.get_paginated_response(serializer_output.data)
+
+    if request.method == 'POST':
+        serializer_input = PriceRuleCreateSerializer(data=request.data)
+
+        if serializer_input.is_valid():
+            instance = serializer_input.save(user=request.user)
+            serializer_output = PriceRulePreviewSerializer(instance)
+
+            return Response(serializer_output.data, status=status.HTTP_201_CREATED)
+
+        return Response(serializer_input.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['GET', 'PUT', 'DELETE'])
+def price_rule_detail_view(request, pk):
+    price_rule = get_object_or_404(PriceRule.objects.select_related('user'), pk=pk)
+
+    if request.method == 'GET':
+        serializer_output = PriceRulePreviewSerializer(price_rule)
+        return Response(serializer_output.data, status=status.HTTP_200_OK)
+
+    elif request.method == 'PUT':
+        serializer_input = PriceRuleCreateSerializer(price_rule, data=request.data)
+
+        if serializer_input.is_valid():
+            instance = serializer_input.save()
+            serializer_output = PriceRulePreviewSerializer(instance)
+
+            return Response(serializer_output.data, status=status.HTTP_200_OK)
+
+        return Response(serializer_input.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    elif request.method == 'DELETE':
+        with transaction.atomic():
+            price_rule.delete()
+            refresh_effective_prices([price_rule.product_id])
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@api_view(['POST'])
+def price_quote_view(request):
+    serializer_input = PriceQuoteSerializer(data=request.data)
+
+    if not serializer_input.is_valid():
+        return Response(serializer_input.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    customer = serializer_input.validated_data.get('customer')
+    items = serializer_input.validated_data['items']
+    # One query for the whole cart, the same prices checkout validates against.
+    prices = quote_prices({item['product'].id: item['quantity'] for item in items},
+                          customer.group_id if customer else None)
+
+    missing = [item['product'].id for item in items if item['product'].id not in prices]
+    if missing:
+        return Response({'items': [f'Product {pk} does not exist.' for pk in missing]},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({
+        'items': [{'product': item['product'].id, 'quantity': item['quantity'],
+                   'base_price': prices[item['product'].id][0], 'price': prices[item['product'].id][1],
+                   'subtotal': prices[item['product'].id][1] * item['quantity']} for item in items],
+        'total': sum(prices[item['product'].id][1] * item['quantity'] for item in items),
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['GET', 'POST'])
+@idempotent
 def order_list_view(request):
     if request.method == 'GET':
-        orders = Order.objects.all().order_by('-updated_at')
+        # Reads only the OrderSummary table: customer, user and item summary are already resolved per row.
+        orders = OrderSummary.objects.all().order_by('-updated_at', '-id')
         search = request.GET.get('search')
 
         if search:
             orders = orders.filter(order_number__contains=search)
 
+        filterset = OrderFilter(request.GET, queryset=orders)
+        if not filterset.is_valid():
+            return Response(translate_validation(filterset.errors).detail, status=status.HTTP_400_BAD_REQUEST)
+
+        orders = filterset.qs
+
         paginator = CustomPagination()
         paginated_qs = paginator.paginate_queryset(orders, request)
 
-        serializer_output = OrderPreviewSerializer(paginated_qs, many=True)
+        serializer_output = OrderSummaryPreviewSerializer(paginated_qs, many=True)
 
         return paginator.get_paginated_response(serializer_output.data)
 
@@ -143,7 +460,7 @@ def order_list_view(request):
         serializer_input = OrderCreateSerializer(data=request.data)
 
         if serializer_input.is_valid():
-            instance = serializer_input.save(user=request.user)
+            instance = run_with_retries(lambda: serializer_input.save(user=request.user))
             serializer_output = OrderDetailingSerializer(instance)
 
             return Response(serializer_output.data, status=status.HTTP_201_CREATED)
@@ -162,13 +479,20 @@ def order_detail_view(request, order_number):
 # purchase
 
 @api_view(['GET', 'POST'])
+@idempotent
 def purchase_list_view(request):
     if request.method == 'GET':
-        purchases = Purchase.objects.all().order_by('-updated_at')
+        purchases = Purchase.objects.all().order_by('-updated_at', '-id')
         search = request.GET.get('search')
 
         if search:
-            orders = purchases.filter(order_number__contains=search)
+            purchases = purchases.filter(purchase_number__contains=search)
+
+        filterset = PurchaseFilter(request.GET, queryset=purchases)
+        if not filterset.is_valid():
+            return Response(translate_validation(filterset.errors).detail, status=status.HTTP_400_BAD_REQUEST)
+
+        purchases = filterset.qs
 
         paginator = CustomPagination()
         paginated_qs = paginator.paginate_queryset(purchases, request)
@@ -181,7 +505,7 @@ def purchase_list_view(request):
         serializer_input = PurchaseCreateSerializer(data=request.data)
 
         if serializer_input.is_valid():
-            instance = serializer_input.save(user=request.user)
+            instance = run_with_retries(lambda: serializer_input.save(user=request.user))
             serializer_output = PurchaseDetailSerializer(instance)
 
             return Response(serializer_output.data, status=status.HTTP_201_CREATED)
@@ -191,20 +515,85 @@ def purchase_list_view(request):
 
 @api_view(['GET'])
 def purchase_detail_view(request, purchase_number):
-    purchase = get_object_or_404(Order, purchase_number=purchase_number)
+    purchases = Purchase.objects.select_related('location', 'user').prefetch_related(
+        Prefetch('purchase_items_by_order', queryset=PurchaseItem.objects.select_related('product').order_by('id')))
+    purchase = get_object_or_404(purchases, purchase_number=purchase_number)
 
     serializer_output = PurchaseDetailSerializer(purchase)
     return Response(serializer_output.data, status=status.HTTP_200_OK)
 
 
+@api_view(['GET'])
+def outstanding_purchase_item_list_view(request):
+    # What is still on order, read from the outstanding_quantity column; receipts are never summed.
+    purchase_items = PurchaseItem.objects.filter(outstanding_quantity__gt=0).select_related('product')
+
+    filterset = PurchaseItemFilter(request.GET, queryset=purchase_items)
+    if not filterset.is_valid():
+        return Response(translate_validation(filterset.errors).detail, status=status.HTTP_400_BAD_REQUEST)
+
+    paginator = KeysetPagination()
+    paginated_qs = paginator.paginate_queryset(filterset.qs, request)
+
+    serializer_output = PurchaseItemPreviewSerializer(paginated_qs, many=True)
+
+    return paginator.get_paginated_response(serializer_output.data)
+
+
+@api_view(['GET', 'POST'])
+@idempotent
+def purchase_receipt_list_view(request):
+    if request.method == 'GET':
+        receipts = PurchaseReceipt.objects.select_related('user').order_by('-id')
+        search = request.GET.get('search')
+
+        if search:
+            receipts = receipts.filter(receipt_number__contains=search)
+
+        paginator = CustomPagination()
+        paginated_qs = paginator.paginate_queryset(receipts, request)
+
+        serializer_output = PurchaseReceiptPreviewSerializer(paginated_qs, many=True)
+
+        return paginator.get_paginated_response(serializer_output.data)
+
+    if request.method == 'POST':
+        serializer_input = PurchaseReceiptCreateSerializer(data=request.data)
+
+        if serializer_input.is_valid():
+            instance = run_with_retries(lambda: serializer_input.save(user=request.user))
+            serializer_output = PurchaseReceiptPreviewSerializer(instance)
+
+            return Response(serializer_output.data, status=status.HTTP_201_CREATED)
+
+        return Response(serializer_input.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['GET'])
+def purchase_receipt_detail_view(request, receipt_number):
+    receipts = PurchaseReceipt.objects.select_related('user').prefetch_related(
+        Prefetch('receipt_items_by_receipt', queryset=PurchaseReceiptItem.objects.select_related(
+            'purchase_item__purchase', 'purchase_item__product').order_by('id')))
+    receipt = get_object_or_404(receipts, receipt_number=receipt_number)
+
+    serializer_output = PurchaseReceiptDetailSerializer(receipt)
+    return Response(serializer_output.data, status=status.HTTP_200_OK)
+
+
 @api_view(['GET'])
 def stock_movement_list_view(request):
-    stock_movements = StockMovement.objects.all().order_by('-updated_at')
+    stock_movements = StockMovement.objects.all().order_by('-updated_at', '-id')
     search = request.GET.get('search')
 
     if search:
         stock_movements = stock_movements.filter(product__name__contains=search)
 
+    filterset = StockMovementFilter(request.GET, queryset=stock_movements)
+    if not filterset.is_valid():
+        return Response(translate_validation(filterset.errors).detail, status=status.HTTP_400_BAD_REQUEST)
+
+    stock_movements = filterset.qs
+
     paginator = CustomPagination()
     paginated_qs = paginator.paginate_queryset(stock_movements, request)
 
@@ -213,6 +602,30 @@ def stock_movement_list_view(request):
     return paginator.get_paginated_response(serializer_output.data)
 
 
+@api_view(['GET'])
+def stock_movement_archive_list_view(request):
+    try:
+        date_from = parse_date(request.GET.get('date_from') or '')
+        date_to = parse_date(request.GET.get('date_to') or '')
+    except ValueError:
+        # Well formed but impossible, e.g. 2024-02-30.
+        date_from = date_to = None
+
+    if not date_from or not date_to:
+        return Response({'detail': 'date_from and date_to (YYYY-MM-DD) are required.'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    stock_movements = archived_stock_movements(date_from, date_to).select_related('product', 'user').order_by('-date',
+                                                                                                             '-id')
+
+    paginator = CustomPagination()
+    paginated_qs = paginator.paginate_queryset(stock_movements, request)
+
+    serializer_output = StockMovementArchivePreviewSerializer(paginated_qs, many=True)
+
+    return paginator.get_paginated_response(serializer_output.data)
+
+
 @api_view(['GET'])
 def stock_movement_detail_view(request, pk):
     stock_movement = get_object_or_404(StockMovement, pk=pk)
@@ -221,3 +634,123 @@ def stock_movement_detail_view(request, pk):
 
 # #############################################################################
 
+
+@api_view(['GET', 'POST'])
+def location_list_view(request):
+    if request.method == 'GET':
+        locations = Location.objects.all().order_by('code')
+
+        paginator = CustomPagination()
+        paginated_qs = paginator.paginate_queryset(locations, request)
+
+        serializer_output = LocationPreviewSerializer(paginated_qs, many=True)
+
+        return paginator.get_paginated_response(serializer_output.data)
+
+    if request.method == 'POST':
+        serializer_input = LocationCreateSerializer(data=request.data)
+
+        if serializer_input.is_valid():
+            instance = serializer_input.save()
+            serializer_output = LocationPreviewSerializer(instance)
+
+            return Response(serializer_output.data, status=status.HTTP_201_CREATED)
+
+        return Response(serializer_input.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['GET'])
+def location_stock_list_view(request, pk):
+    location = get_object_or_404(Location, pk=pk)
+    # Reads the balance table on its (location, product) index; the ledger is never aggregated here.
+    product_stocks = ProductStock.objects.filter(location=location).select_related('product').order_by('product_id')
+    search = request.GET.get('search')
+
+    if search:
+        product_stocks = product_stocks.filter(product__name__icontains=search)
+
+    paginator = CustomPagination()
+    paginated_qs = paginator.paginate_queryset(product_stocks, request)
+
+    serializer_output = ProductStockPreviewSerializer(paginated_qs, many=True)
+
+    return paginator.get_paginated_response(serializer_output.data)
+
+
+@api_view(['POST'])
+def transfer_create_view(request):
+    serializer_input = TransferCreateSerializer(data=request.data)
+
+    if serializer_input.is_valid():
+        stock_movements = serializer_input.save(user=request.user)
+        serializer_output = StockMovementPreviewSerializer(stock_movements, many=True)
+
+        return Response(serializer_output.data, status=status.HTTP_201_CREATED)
+
+    return Response(serializer_input.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['GET', 'POST'])
+def task_list_view(request):
+    if request.method == 'GET':
+        tasks = Task.objects.filter(user=request.user).order_by('-id')
+
+        paginator = CustomPagination()
+        paginated_qs = paginator.paginate_queryset(tasks, request)
+
+        serializer_output = TaskPreviewSerializer(paginated_qs, many=True)
+
+        return paginator.get_paginated_response(serializer_output.data)
+
+    if request.method == 'POST':
+        serializer_input = TaskCreateSerializer(data=request.data, context={'request': request})
+
+        if serializer_input.is_valid():
+            instance = serializer_input.save(user=request.user)
+            serializer_output = TaskPreviewSerializer(instance)
+
+            return Response(serializer_output.data, status=status.HTTP_202_ACCEPTED)
+
+        return Response(serializer_input.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['GET'])
+def task_detail_view(request, pk):
+    task = get_object_or_404(Task, pk=pk, user=request.user)
+    serializer_output = TaskPreviewSerializer(task)
+    return Response(serializer_output.data, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+def task_download_view(request, pk):
+    task = get_object_or_404(Task, pk=pk, user=request.user, status=Task.DONE)
+    filename = (task.result or {}).get('file')
+
+    if not filename:
+        raise Http404
+
+    path = os.path.join(settings.OPTIKA_EXPORT_DIR, os.path.basename(filename))
+
+    try:
+        export = open(path, 'rb')
+    except FileNotFoundError:
+        # Exports are pruned from disk; the task row outlives its file.
+        raise Http404
+
+    return FileResponse(export, as_attachment=True, filename=os.path.basename(filename))
+
+
+@api_view(['GET'])
+def audit_log_list_view(request):
+    audit_logs = AuditLog.objects.select_related('user')
+
+    filterset = AuditLogFilter(request.GET, queryset=audit_logs)
+    if not filterset.is_valid():
+        return Response(translate_validation(filterset.errors).detail, status=status.HTTP_400_BAD_REQUEST)
+
+    paginator = KeysetPagination()
+    paginated_qs = paginator.paginate_queryset(filterset.qs, request)
+
+    serializer_output = AuditLogPreviewSerializer(paginated_qs, many=True)
+
+    return paginator.get_paginated_response(serializer_output.data)